@@ -1,25 +1,19 @@
 import asyncio
-from typing import Union
+from typing import AsyncIterator, Iterator, TypeVar
 
 import streamlit as st
-from aiohttp import ClientSession
+from langchain_core.messages import HumanMessage
 
-from oracle_search import ExMachina
+from oracle_search import ExMachina, Shared
 from oracle_search.chain.base import get_refined_request, get_search_query
-from oracle_search.models.documents import WebContent, YoutubeTranscript
-from oracle_search.tools.web_tools import answer_with_contents
-from oracle_search.web_loader.search import aget_search_full_contents
-from oracle_search.web_loader.web_loader import WebContentExtractor
+from oracle_search.tools.web_tools import astream_answer_with_contents
+from oracle_search.web_loader.search import astream_search_full_contents
+from oracle_search.web_loader.web_loader import fetch_url_content
 
 # Bootstrap the application
 ExMachina.bootstrap()
 
-
-async def fetch_url_content(url: str) -> Union[WebContent, YoutubeTranscript]:
-    async with ClientSession() as session:
-        extractor = WebContentExtractor(url, session)
-        content = await extractor.afetch()
-        return content
+T = TypeVar("T")
 
 
 def get_bot_response(user_input, content, request):
@@ -27,15 +21,94 @@ def get_bot_response(user_input, content, request):
     return f"Based on the request '{request}' and the fetched content, here's a response: {content[:200]}..."
 
 
+def iterate_async(agen: AsyncIterator[T]) -> Iterator[T]:
+    """
+    Streamlit 스크립트는 동기 코드이므로, 이벤트 루프 하나에서 async generator 를 한 단계씩 진행하며
+    각 단계 사이에 화면을 갱신할 수 있게 합니다.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+def run_pipeline(url: str, request: str) -> dict:
+    """
+    요청 정제, 검색, fetch, 답변 생성을 실행하면서 진행 상황과 답변 토큰을 화면에 바로 표시합니다.
+    """
+    result = {"url": url, "content": None, "request": request, "queries": [], "search_results": [], "answer": ""}
+
+    with st.status("Working on your request...", expanded=True) as status:
+        if url:
+            status.update(label=f"Fetching {url}...")
+            result["content"] = asyncio.run(fetch_url_content(url))
+            result["request"] = get_refined_request(result["content"], request).redefined_request
+            st.write(f"Refined request: {result['request']}")
+
+        status.update(label="Generating search queries...")
+        query_res = get_search_query([HumanMessage(content=result["request"], additional_kwargs={"name": "HUMAN"})])
+        result["queries"] = query_res["parsed"].queries
+        st.write("Queries: " + ", ".join(query.query for query in result["queries"]))
+
+        status.update(label="Searching...")
+        events = astream_search_full_contents(
+            result["queries"], timeout=Shared.web_fetch.search_timeout, request=result["request"]
+        )
+        for event in iterate_async(events):
+            if event["event"] == "search_results":
+                st.write(f"Found {len(event['results'])} search results")
+                status.update(label=f"Fetching {len(event['results'])} search results...")
+            elif event["event"] == "document":
+                content = event["content"]
+                result["search_results"].append(content)
+                st.write(f"Fetched: {content.metadata.get('title') or content.source}")
+            elif event["event"] == "timeout":
+                st.write(f"Deadline reached, skipped {event['unfinished']} unfinished pages")
+
+        status.update(label="Reading fetched contents...")
+        answer_placeholder = st.empty()
+        for event in iterate_async(astream_answer_with_contents(result["search_results"], result["request"])):
+            if event["event"] == "web_qa":
+                st.write(f"Read: {event['content'].metadata.get('title') or event['content'].source}")
+            elif event["event"] == "token":
+                status.update(label="Answering...")
+                result["answer"] += event["text"]
+                answer_placeholder.markdown(result["answer"])
+        answer_placeholder.empty()
+        status.update(label="Done", state="complete", expanded=False)
+
+    return result
+
+
+def render_result(result: dict):
+    if result["content"]:
+        with st.expander("View URL, Request, and Fetched Content", expanded=False):
+            st.write(f"Fetched content from: {result['url']}")
+            st.text_area("Fetched Content:", value=result["content"].page_content, height=200)
+    st.write(result["request"])
+    with st.expander(f"{len(result['search_results'])} fetched web contents", expanded=False):
+        for content in result["search_results"]:
+            st.write(f"- [{content.metadata.get('title') or content.source}]({content.source})")
+    st.markdown(result["answer"])
+
+
 def main():
     st.set_page_config(page_title="URL Content Fetcher and Chat", layout="wide")
     st.title("URL Content Fetcher and Chat")
 
     # Initialize session state
-    if "content" not in st.session_state:
-        st.session_state.content = None
-    if "request" not in st.session_state:
-        st.session_state.request = None
+    if "results" not in st.session_state:
+        # (url, request) 별로 끝난 파이프라인 결과를 보관하여 rerun 마다 검색과 답변을 다시 하지 않습니다.
+        st.session_state.results = {}
+    if "active" not in st.session_state:
+        st.session_state.active = None
     if "messages" not in st.session_state:
         st.session_state.messages = []
 
@@ -45,30 +118,19 @@ def main():
         request = st.text_area(label="Enter your request")
         submit_button = st.form_submit_button(label="Submit")
 
-    # Fetch content when URL and Request are submitted
     if submit_button and request:
         st.success("Submitted!")
-        if url:
-            content = asyncio.run(fetch_url_content(url))
-            st.session_state.content = content
-            st.session_state.request = get_refined_request(content, request).redefined_request
-
-            # Display URL, Request, and fetched content in a folded box
-            with st.expander("View URL, Request, and Fetched Content", expanded=False):
-                st.write(f"Fetched content from: {url}")
-                if st.session_state.content:
-                    st.text_area("Fetched Content:", value=st.session_state.content, height=200)
-        else:
-            st.session_state.request = request
-
-    # Chat interface (only shown after content is fetched)
-    if st.session_state.request:
-        st.write(st.session_state.request)
-        queries = get_search_query(st.session_state.request)
-        st.write(queries)
-        search_results = asyncio.run(aget_search_full_contents(queries.queries))
-
-        st.write(answer_with_contents(search_results, st.session_state.request))
+        key = (url, request)
+        if key not in st.session_state.results:
+            st.session_state.results[key] = run_pipeline(url, request)
+        if key != st.session_state.active:
+            st.session_state.messages = []
+        st.session_state.active = key
+
+    # Chat interface (only shown after the pipeline is done)
+    if st.session_state.active:
+        result = st.session_state.results[st.session_state.active]
+        render_result(result)
 
         for message in st.session_state.messages:
             with st.chat_message(message["role"]):
@@ -81,7 +143,8 @@ def main():
             st.session_state.messages.append({"role": "user", "content": prompt})
 
             # Get and display bot response
-            response = get_bot_response(prompt, st.session_state.content, st.session_state.request)
+            content = result["content"].page_content if result["content"] else result["answer"]
+            response = get_bot_response(prompt, content, result["request"])
             with st.chat_message("assistant"):
                 st.markdown(response)
             st.session_state.messages.append({"role": "assistant", "content": response})
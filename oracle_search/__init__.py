@@ -1,14 +1,100 @@
-from oracle_search.conf.conf import GPT, Shared, OpenAI, TMDB, DiskCache, GoogleSearch
+from typing import Any, Dict, Optional
+
+from oracle_search.conf.conf import (
+    GPT,
+    Shared,
+    OpenAI,
+    TMDB,
+    DiskCache,
+    CacheWriter,
+    GoogleSearch,
+    WebFetch,
+    DocumentFetch,
+    Rerank,
+    Worker,
+    Checkpoint,
+    Search,
+    FanOut,
+    NamuWiki,
+    YouTube,
+    Logging,
+    Metrics,
+    Server,
+    LLMScheduler,
+    ModelRouter,
+    BrowserSupervisor,
+)
 from oracle_search.conf.env import Environment
 
+# Shared 속성 이름 -> (설정 섹션 이름, 설정 클래스, 필수 여부)
+SECTIONS = {
+    "gpt": ("gpt", GPT, True),
+    "disk_cache": ("disk_cache", DiskCache, True),
+    "cache_writer": ("cache_writer", CacheWriter, False),
+    "google_search": ("google_search", GoogleSearch, True),
+    "web_fetch": ("web_fetch", WebFetch, False),
+    "document_fetch": ("document_fetch", DocumentFetch, False),
+    "rerank": ("rerank", Rerank, False),
+    "worker": ("worker", Worker, False),
+    "checkpoint": ("checkpoint", Checkpoint, False),
+    "search": ("search", Search, False),
+    "fan_out": ("fan_out", FanOut, False),
+    "namu_wiki": ("namu_wiki", NamuWiki, False),
+    "youtube": ("youtube", YouTube, False),
+    "logging": ("logging", Logging, False),
+    "metrics": ("metrics", Metrics, False),
+    "server": ("server", Server, False),
+    "llm_scheduler": ("llm_scheduler", LLMScheduler, False),
+    "model_router": ("model_router", ModelRouter, False),
+    "browser_supervisor": ("browser_supervisor", BrowserSupervisor, False),
+}
+
 
 class ExMachina:
+    _applied: Dict[str, Any] = {}
+
     @classmethod
-    def bootstrap(cls):
-        config = Environment().config
+    def bootstrap(cls, overrides: Optional[Dict[str, Any]] = None, watch: bool = False):
+        """
+        설정을 읽어 Shared 를 채웁니다.
+
+        Args:
+            overrides (Optional[Dict[str, Any]]): 설정 파일과 환경 변수 위에 덮어쓸 값.
+            watch (bool): True 이면 설정 파일 변경을 감시하여 바뀐 섹션만 다시 적용합니다.
+        """
+        environment = Environment()
+        if overrides:
+            environment.override(overrides)
 
-        Shared.gpt = GPT(config["gpt"])
         Shared.open_ai = OpenAI()
         Shared.tmdb = TMDB()
-        Shared.disk_cache = DiskCache(config["disk_cache"])
-        Shared.google_search = GoogleSearch(config["google_search"])
+        cls.configure(environment.config)
+
+        if cls.configure not in environment.listeners:
+            environment.subscribe(cls.configure)
+        if watch:
+            environment.watch()
+
+    @classmethod
+    def configure(cls, config: Dict[str, Any]):
+        """
+        바뀐 설정 섹션에 해당하는 Shared 속성만 새로 만들어 교체하고, Shared.subscribe 로 등록된 구독자에게 알립니다.
+        """
+        for name, (section, conf_class, required) in SECTIONS.items():
+            section_config = config[section] if required else config.get(section, {})
+            if name in cls._applied and cls._applied[name] == section_config:
+                continue
+            cls._applied[name] = section_config
+            Shared.replace(name, conf_class(section_config))
+
+
+def _retire_disk_cache(old: Optional[DiskCache], new: DiskCache):
+    # 설정 감시 스레드에서 호출되므로, 진행 중인 읽기와 write-behind 쓰기가 끝난 뒤 각 스레드의 연결을 닫습니다.
+    if old is None or "web_cache" not in old.__dict__:
+        return
+    from oracle_search.async_cache import async_cache
+
+    async_cache.retire(old.web_cache)
+
+
+Shared.subscribe("disk_cache", _retire_disk_cache)
@@ -0,0 +1,366 @@
+"""
+이벤트 루프를 막지 않고 공유 디스크 캐시(Shared.disk_cache.web_cache)를 읽고 쓰는 facade 입니다.
+
+- 읽기(aget)는 전용 스레드 풀에서 실행합니다.
+- 쓰기(set, aset)는 메모리의 write-behind 버퍼에 넣고 바로 반환하며, writer 스레드가 버퍼를 batch_size 개씩
+  한 트랜잭션으로 기록합니다. 같은 키를 다시 쓰면 버퍼의 값을 바꾸므로 마지막 값만 기록됩니다.
+- 버퍼에 있는 값은 get, aget, peek 에서 바로 보이므로 같은 프로세스에서는 쓴 값을 곧바로 읽을 수 있습니다.
+- 쓰기는 버퍼에 들어온 뒤 cache_writer.max_lag 초 안에 기록되고, 프로세스가 끝날 때 shutdown_timeout 초까지 남은 쓰기를 기록합니다.
+- 버퍼가 max_pending 개 또는 max_pending_bytes 를 넘으면 aset 은 writer 가 자리를 비울 때까지 기다립니다.
+  동기 함수인 set 은 기다리지 않으므로 큰 값은 aset 으로 씁니다.
+
+worker.mode 가 multi 이면 aset 은 기본적으로 값이 기록될 때까지 기다립니다.
+다른 워커는 lease 가 풀린 뒤 디스크에서 결과를 읽으므로 lease 를 풀기 전에 기록이 끝나야 합니다.
+"""
+import asyncio
+import atexit
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from oracle_search import Shared
+from oracle_search.metrics import registry
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+MISSING = object()
+
+CACHE_WRITES = registry.counter(
+    "oracle_search_cache_writes", "write-behind 캐시 쓰기 수 (queued, coalesced, written, failed, direct)", ("result",)
+)
+CACHE_WRITE_BATCH = registry.histogram(
+    "oracle_search_cache_write_batch_size", "한 트랜잭션으로 기록한 쓰기 수", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+CACHE_WRITE_SECONDS = registry.histogram("oracle_search_cache_write_seconds", "write-behind 트랜잭션 하나를 기록하는 데 걸린 시간")
+
+
+@dataclass
+class _PendingWrite:
+    cache: Any
+    value: Any
+    expire: Optional[float]
+    size: int
+    queued_at: float = field(default_factory=time.monotonic)
+    # aset(durable=True) 로 기록을 기다리는 호출자들
+    waiters: List[Future] = field(default_factory=list)
+
+
+def _resolve(future: Future, error: Optional[BaseException] = None):
+    # 기다리던 코루틴이 취소되면 wrap_future 가 Future 도 취소하므로 이미 끝난 Future 는 건너뜁니다.
+    try:
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        pass
+
+
+def _size_of(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class AsyncCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._pending: "OrderedDict[str, _PendingWrite]" = OrderedDict()
+        self._pending_bytes = 0
+        # writer 가 지금 기록하고 있는 쓰기 수
+        self._writing = 0
+        # flush 를 기다리는 호출자 수. 0 보다 크면 writer 는 max_lag 를 기다리지 않고 바로 기록합니다.
+        self._flushing = 0
+        self._space_waiters: List[Future] = []
+        self._writer: Optional[threading.Thread] = None
+        self._stopping = False
+        # 설정 변경으로 교체되어 writer 스레드가 자신의 연결을 닫아야 하는 디스크 캐시들
+        self._retired: List[Any] = []
+        self._read_pool: Optional[ThreadPoolExecutor] = None
+        atexit.register(self.close)
+
+    @property
+    def _conf(self):
+        return Shared.cache_writer
+
+    def read_pool(self) -> ThreadPoolExecutor:
+        if self._read_pool is None:
+            self._read_pool = ThreadPoolExecutor(max_workers=self._conf.read_workers, thread_name_prefix="cache-read")
+        return self._read_pool
+
+    def peek(self, key: str) -> Any:
+        """
+        아직 기록되지 않은 key 의 값을 반환합니다. 버퍼에 없으면 MISSING 을 반환합니다.
+        """
+        with self._lock:
+            write = self._pending.get(key)
+            return MISSING if write is None else write.value
+
+    def pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def get(self, key: str, default: Any = None, **kwargs) -> Any:
+        """
+        버퍼에 있는 값을 먼저 확인하고 없으면 디스크 캐시에서 읽습니다. 호출한 스레드에서 바로 읽으므로 이벤트 루프에서는 aget 을 사용합니다.
+        """
+        if (value := self.peek(key)) is not MISSING:
+            return value
+        return Shared.disk_cache.web_cache.get(key, default, **kwargs)
+
+    async def aget(self, key: str, default: Any = None, **kwargs) -> Any:
+        if (value := self.peek(key)) is not MISSING:
+            return value
+        cache = Shared.disk_cache.web_cache
+        return await asyncio.get_running_loop().run_in_executor(
+            self.read_pool(), lambda: cache.get(key, default, **kwargs)
+        )
+
+    def set(self, key: str, value: Any, expire: Optional[float] = None) -> Optional[Future]:
+        """
+        값을 버퍼에 넣고 바로 반환합니다. cache_writer.enabled 가 False 이면 바로 기록합니다.
+
+        Returns:
+            버퍼에 넣었으면 기록이 끝나면 완료되는 Future, 바로 기록했으면 None.
+        """
+        cache = Shared.disk_cache.web_cache
+        if not self._conf.enabled:
+            cache.set(key, value, expire=expire)
+            CACHE_WRITES.inc(result="direct")
+            return None
+
+        future = Future()
+        with self._lock:
+            previous = self._pending.pop(key, None)
+            write = _PendingWrite(cache, value, expire, _size_of(value))
+            if previous is not None:
+                # 덮어쓴 값의 대기자도 새 값이 기록될 때 함께 완료합니다.
+                # 기록 순서(e.g. 문단 다음 인덱스)를 지키기 위해 맨 뒤로 옮기되, max_lag 는 처음 들어온 시각부터 셉니다.
+                self._pending_bytes -= previous.size
+                write.queued_at = previous.queued_at
+                write.waiters = previous.waiters
+                CACHE_WRITES.inc(result="coalesced")
+            else:
+                CACHE_WRITES.inc(result="queued")
+            write.waiters.append(future)
+            self._pending[key] = write
+            self._pending_bytes += write.size
+            # 버퍼가 비어 있어 잠든 writer 를 깨우거나, 한 batch 가 찼으면 max_lag 를 기다리지 않고 기록하게 합니다.
+            if len(self._pending) == 1 or len(self._pending) >= self._conf.batch_size or self._full():
+                self._changed.notify_all()
+        self._start_writer()
+        return future
+
+    async def aset(self, key: str, value: Any, expire: Optional[float] = None, durable: Optional[bool] = None):
+        """
+        버퍼에 자리가 날 때까지 기다린 뒤 값을 넣습니다.
+
+        Args:
+            durable: True 이면 값이 디스크에 기록될 때까지 기다립니다. None 이면 worker.mode 가 multi 일 때 기다립니다.
+        """
+        if durable is None:
+            durable = Shared.worker is not None and Shared.worker.is_multi
+        if not self._conf.enabled:
+            cache = Shared.disk_cache.web_cache
+            await asyncio.get_running_loop().run_in_executor(
+                self.read_pool(), lambda: cache.set(key, value, expire=expire)
+            )
+            CACHE_WRITES.inc(result="direct")
+            return
+
+        while True:
+            with self._lock:
+                if not self._full():
+                    break
+                space = Future()
+                self._space_waiters.append(space)
+                self._changed.notify_all()
+            await asyncio.wrap_future(space)
+
+        future = self.set(key, value, expire)
+        if durable and future is not None:
+            # 기다리는 호출자가 있으면 max_lag 를 기다리지 않고 바로 기록하게 합니다.
+            with self._changed:
+                self._flushing += 1
+                self._changed.notify_all()
+            try:
+                await asyncio.wrap_future(future)
+            finally:
+                with self._changed:
+                    self._flushing -= 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        지금까지 버퍼에 들어온 쓰기가 모두 기록될 때까지 기다립니다. timeout 안에 끝나지 않으면 False 를 반환합니다.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            if not self._pending and not self._writing:
+                return True
+            self._flushing += 1
+            self._changed.notify_all()
+            try:
+                while self._pending or self._writing:
+                    if self._writer is None or not self._writer.is_alive():
+                        return False
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._changed.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+
+    async def aflush(self, timeout: Optional[float] = None) -> bool:
+        return await asyncio.get_running_loop().run_in_executor(None, self.flush, timeout)
+
+    def close(self):
+        """
+        남은 쓰기를 shutdown_timeout 초까지 기록하고 writer 를 멈춥니다. 프로세스가 끝날 때 atexit 으로 호출됩니다.
+        """
+        if self._writer is not None:
+            timeout = self._conf.shutdown_timeout if self._conf is not None else None
+            if not self.flush(timeout):
+                logger.warning(f"Dropped {len(self._pending)} cache writes that were not flushed in time")
+            with self._changed:
+                self._stopping = True
+                self._changed.notify_all()
+            self._writer.join(timeout)
+            self._writer = None
+            self._stopping = False
+        if self._read_pool is not None:
+            self._read_pool.shutdown(wait=False)
+            self._read_pool = None
+
+    def retire(self, cache):
+        """
+        설정 변경으로 교체된 디스크 캐시를 닫습니다. Shared.subscribe("disk_cache") 구독자가 설정 감시 스레드에서 호출합니다.
+
+        diskcache 는 스레드마다 따로 연결을 열므로, 버퍼에 남은 쓰기를 먼저 기록한 뒤 writer 스레드의 연결은 writer 가 닫고,
+        읽기 스레드 풀은 진행 중인 읽기가 끝나면 스레드와 함께 연결이 정리되도록 새 풀로 바꿉니다.
+        교체 뒤에 들어온 읽기와 쓰기는 새 캐시를 사용합니다.
+        """
+        timeout = self._conf.shutdown_timeout if self._conf is not None else None
+        if not self.flush(timeout):
+            logger.warning("Closing a replaced disk cache with cache writes still pending")
+        with self._changed:
+            pool, self._read_pool = self._read_pool, None
+            if self._writer is not None and self._writer.is_alive():
+                self._retired.append(cache)
+                self._changed.notify_all()
+        if pool is not None:
+            pool.shutdown(wait=False)
+        cache.close()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            oldest = min((write.queued_at for write in self._pending.values()), default=None)
+            return {
+                "depth": len(self._pending),
+                "bytes": self._pending_bytes,
+                "lag": time.monotonic() - oldest if oldest is not None else 0.0,
+            }
+
+    def _full(self) -> bool:
+        conf = self._conf
+        return len(self._pending) >= conf.max_pending or self._pending_bytes >= conf.max_pending_bytes
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            self._writer = threading.Thread(target=self._run_writer, name="cache-writer", daemon=True)
+            self._writer.start()
+
+    def _next_batch(self) -> Optional[List[Tuple[str, _PendingWrite]]]:
+        """
+        기록할 때가 될 때까지 기다린 뒤 버퍼 앞쪽에서 batch_size 개를 꺼냅니다. writer 를 멈춰야 하면 None 을 반환합니다.
+        """
+        with self._changed:
+            while True:
+                if self._retired:
+                    return []
+                conf = self._conf
+                if self._pending:
+                    oldest = min(write.queued_at for write in self._pending.values())
+                    wait = conf.max_lag - (time.monotonic() - oldest)
+                    if wait <= 0 or self._flushing or self._stopping or self._full() or len(self._pending) >= conf.batch_size:
+                        break
+                    self._changed.wait(wait)
+                elif self._stopping:
+                    return None
+                else:
+                    self._changed.wait()
+
+            batch = []
+            while self._pending and len(batch) < conf.batch_size:
+                key, write = self._pending.popitem(last=False)
+                self._pending_bytes -= write.size
+                batch.append((key, write))
+            self._writing = len(batch)
+            space_waiters, self._space_waiters = self._space_waiters, []
+        for space in space_waiters:
+            _resolve(space)
+        return batch
+
+    def _write(self, batch: List[Tuple[str, _PendingWrite]]):
+        started = time.perf_counter()
+        # 설정 변경으로 디스크 캐시가 바뀌었을 수 있으므로 쓰기를 넣을 때의 캐시별로 나누어 기록합니다.
+        by_cache: Dict[int, List[Tuple[str, _PendingWrite]]] = {}
+        for key, write in batch:
+            by_cache.setdefault(id(write.cache), []).append((key, write))
+        for writes in by_cache.values():
+            cache = writes[0][1].cache
+            error = None
+            try:
+                with cache.transact():
+                    for key, write in writes:
+                        cache.set(key, write.value, expire=write.expire)
+                CACHE_WRITES.inc(len(writes), result="written")
+            except Exception as e:
+                error = e
+                CACHE_WRITES.inc(len(writes), result="failed")
+                logger.error(f"Failed to write {len(writes)} cache entries: {e}", exception=True)
+            for _, write in writes:
+                for waiter in write.waiters:
+                    _resolve(waiter, error)
+        CACHE_WRITE_BATCH.observe(len(batch))
+        CACHE_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+    def _run_writer(self):
+        while (batch := self._next_batch()) is not None:
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                with self._changed:
+                    self._writing = 0
+                    retired, self._retired = self._retired, []
+                    self._changed.notify_all()
+            for cache in retired:
+                cache.close()
+
+
+async_cache = AsyncCache()
+
+
+def _resize_read_pool(old, new):
+    if async_cache._read_pool is not None and (old is None or old.read_workers != new.read_workers):
+        async_cache._read_pool.shutdown(wait=False)
+        async_cache._read_pool = None
+
+
+Shared.subscribe("cache_writer", _resize_read_pool)
+
+for _name, _documentation, _key in (
+    ("oracle_search_cache_write_queue_depth", "기록을 기다리는 캐시 쓰기 수", "depth"),
+    ("oracle_search_cache_write_queue_bytes", "기록을 기다리는 캐시 쓰기의 크기 합계", "bytes"),
+    ("oracle_search_cache_write_lag_seconds", "기록을 기다리는 가장 오래된 캐시 쓰기의 대기 시간", "lag"),
+):
+    registry.gauge(_name, _documentation).set_function(lambda key=_key: {(): async_cache.stats()[key]})
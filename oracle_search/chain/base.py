@@ -1,35 +1,63 @@
 from datetime import datetime
 from textwrap import dedent
-from typing import Union, List
+from typing import Any, Dict, Tuple, Union, List, TYPE_CHECKING
 
-from langchain_core.messages import BaseMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-
-from oracle_search import Shared
+from oracle_search.chain.model_router import route
+from oracle_search.chain.scheduler import INTERACTIVE, scheduled
+from oracle_search.metrics import llm_metrics_callback
 from oracle_search.models.base import RedefinedRequest, GeneratedQuery
 from oracle_search.models.documents import WebContent, YoutubeTranscript
 
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_core.runnables import Runnable
+
+# langchain_openai 와 langchain_core 의 prompt 모듈은 import 비용이 크므로 chain 을 처음 만들 때 import 합니다.
+
 
 def get_current_datetime_string() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-def get_refined_request(content: Union[WebContent, YoutubeTranscript], request: str) -> RedefinedRequest:
+def _refined_request_chain(
+    content: Union[WebContent, YoutubeTranscript], request: str
+) -> Tuple["Runnable", Dict[str, Any]]:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_openai import ChatOpenAI
+
     prompt = dedent("""\
         You are given Content and Request. You are tasked with redefine the request to be specific to avoid ambiguity and provide a clear and concise question from the given content and request.
         Use the content as background information to refine the request. The refined request should be self-contained and clear.
         Current datetime is: {datetime}
         """)
 
-    llm = ChatOpenAI(model=Shared.gpt.gpt_4o, temperature=0.5)
+    inputs = {"content": content.model_dump(), "request": request, "datetime": get_current_datetime_string()}
+    model = route("refine_request", inputs).model
+    # 재시도는 llm_scheduler 가 429 를 보고 처리하므로 클라이언트 자체 재시도는 끕니다.
+    llm = ChatOpenAI(model=model, temperature=0.5, max_retries=0)
     template = ChatPromptTemplate.from_messages(
         [("system", prompt), ("human", "Content: {content}\n\nHere is the Request you need to redefine: {request}")])
-    chain = template | llm.with_structured_output(RedefinedRequest, method="json_schema")
-    return chain.invoke({"content": content.model_dump(), "request": request, "datetime": get_current_datetime_string()})
+    chain = scheduled(template | llm.with_structured_output(RedefinedRequest, method="json_schema"), model, INTERACTIVE)
+    return chain, inputs
+
+
+def get_refined_request(content: Union[WebContent, YoutubeTranscript], request: str) -> RedefinedRequest:
+    chain, inputs = _refined_request_chain(content, request)
+    return chain.invoke(inputs, config={"callbacks": [llm_metrics_callback("refine_request")]})
 
 
-def get_search_query(chat_history: List[BaseMessage]) -> GeneratedQuery:
+async def aget_refined_request(content: Union[WebContent, YoutubeTranscript], request: str) -> RedefinedRequest:
+    """
+    get_refined_request 의 async 버전입니다. LLM 응답을 기다리는 동안 이벤트 루프를 막지 않습니다.
+    """
+    chain, inputs = _refined_request_chain(content, request)
+    return await chain.ainvoke(inputs, config={"callbacks": [llm_metrics_callback("refine_request")]})
+
+
+def _search_query_chain(chat_history: List["BaseMessage"]) -> "Runnable":
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_openai import ChatOpenAI
+
     prompt = dedent("""\
         You are given a refined request from 'HUMAN'. Your task is to generate a list of search queries based on the Request. The search queries should be specific and relevant to the request.
         You should use relevant language and terms to ensure the search queries are effective in retrieving accurate information.
@@ -50,8 +78,24 @@ def get_search_query(chat_history: List[BaseMessage]) -> GeneratedQuery:
         Now, list the languages that are most likely relevant to the result and generate search queries based on the Request.
         """)
 
-    llm = ChatOpenAI(model=Shared.gpt.gpt_4o, temperature=0.5)
+    model = route("search_query", chat_history).model
+    llm = ChatOpenAI(model=model, temperature=0.5, max_retries=0)
     template = ChatPromptTemplate.from_messages(
         [("system", prompt), MessagesPlaceholder(variable_name='chat_history')])
-    chain = template | llm.with_structured_output(GeneratedQuery, method="json_schema", include_raw=True)
-    return chain.invoke({'chat_history': chat_history})
+    return scheduled(
+        template | llm.with_structured_output(GeneratedQuery, method="json_schema", include_raw=True),
+        model,
+        INTERACTIVE,
+    )
+
+
+def get_search_query(chat_history: List["BaseMessage"]) -> GeneratedQuery:
+    chain = _search_query_chain(chat_history)
+    return chain.invoke({'chat_history': chat_history}, config={"callbacks": [llm_metrics_callback("search_query")]})
+
+
+async def aget_search_query(chat_history: List["BaseMessage"]) -> GeneratedQuery:
+    chain = _search_query_chain(chat_history)
+    return await chain.ainvoke(
+        {'chat_history': chat_history}, config={"callbacks": [llm_metrics_callback("search_query")]}
+    )
@@ -0,0 +1,194 @@
+"""
+LLM 호출마다 Shared.gpt 의 모델 중 하나를 고르는 라우터입니다.
+
+작업(task)마다 model_router.tasks 에 좋은 순서대로 후보 tier(GPT 의 속성 이름: gpt_4o, gpt_4o_mini, gpt_4, gpt_35)를 두고,
+앞에서부터 다음 조건을 모두 만족하는 첫 모델을 고릅니다.
+
+- 입력 토큰과 예상 출력 토큰이 모델의 context window 안에 들어갑니다.
+- 예상 비용이 호출당 한도(max_cost_per_call)와 실행(run)의 남은 예산을 넘지 않습니다.
+- llm_scheduler 에서 허가를 기다릴 예상 시간이 우선순위별 max_queue_seconds 를 넘지 않고,
+  대기 시간과 최근 호출 시간의 합이 실행의 남은 시간 안에 들어갑니다.
+- 입력이 작업의 small_input_tokens 보다 작으면(단순한 요청) 가장 싼 후보를 바로 고릅니다.
+
+조건을 만족하는 모델이 없으면 예상 비용이 가장 낮은 후보를 사용합니다. model_router.hard_cost_limit 를 켜면
+가장 싼 후보도 비용 한도를 넘을 때 호출하지 않고 BudgetExceededError 를 발생시킵니다. 모든 결정은 로그와 메트릭으로 남깁니다.
+
+실행 단위 예산은 그래프 노드가 run_budget_scope 로 지정합니다. 사용한 비용은 OracleState.total_cost 에서 시작하여
+노드 안에서 라우팅한 호출의 예상 비용만큼 늘어나고, 다음 노드에서 실제 비용(total_cost)으로 다시 맞춰집니다.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, List, Mapping, Optional
+
+from oracle_search import Shared
+from oracle_search.chain.scheduler import INTERACTIVE, approximate_tokens, llm_scheduler
+from oracle_search.metrics import registry
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+ROUTING_DECISIONS = registry.counter(
+    "oracle_search_model_routing", "작업별로 라우터가 고른 모델과 이유", ("task", "model", "reason")
+)
+
+
+class BudgetExceededError(Exception):
+    pass
+
+
+@dataclass
+class RunBudget:
+    """
+    그래프 실행 하나의 비용(USD)과 시간(초) 한도입니다. 한도가 None 이면 제한하지 않습니다.
+    """
+
+    max_cost: Optional[float] = None
+    deadline: Optional[float] = None
+    spent: float = 0.0
+
+    @property
+    def remaining_cost(self) -> Optional[float]:
+        return None if self.max_cost is None else self.max_cost - self.spent
+
+    @property
+    def remaining_seconds(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+
+_run_budget: ContextVar[Optional[RunBudget]] = ContextVar("run_budget", default=None)
+
+
+def current_run_budget() -> Optional[RunBudget]:
+    return _run_budget.get()
+
+
+@contextmanager
+def run_budget_scope(state: Mapping[str, Any], config: Optional[Mapping[str, Any]] = None) -> Iterator[RunBudget]:
+    """
+    그래프 노드 안에서 실행 단위 예산을 지정합니다.
+    한도는 config["configurable"] 의 max_cost / max_seconds(실행 시작 시각 started_at 기준)를, 없으면 model_router 설정을 사용합니다.
+
+    Args:
+        state: total_cost 가 들어 있는 그래프 상태(OracleState).
+        config: 노드가 받은 RunnableConfig.
+    """
+    conf = Shared.model_router
+    configurable = (config or {}).get("configurable", {})
+    max_cost = configurable.get("max_cost", conf.max_cost_per_run)
+    max_seconds = configurable.get("max_seconds", conf.max_seconds_per_run)
+    started_at = configurable.get("started_at")
+    deadline = started_at + max_seconds if started_at is not None and max_seconds is not None else None
+    token = _run_budget.set(RunBudget(max_cost=max_cost, deadline=deadline, spent=state.get("total_cost") or 0.0))
+    try:
+        yield _run_budget.get()
+    finally:
+        _run_budget.reset(token)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """
+    get_openai_callback 의 total_cost 와 같은 가격표로 예상 비용(USD)을 계산합니다. 가격표에 없는 모델은 model_router.prices 를 사용합니다.
+    """
+    from langchain_community.callbacks.openai_info import get_openai_token_cost_for_model
+
+    try:
+        return get_openai_token_cost_for_model(model, input_tokens) + get_openai_token_cost_for_model(
+            model, output_tokens, is_completion=True
+        )
+    except ValueError:
+        price = Shared.model_router.prices.get(model, {})
+        return (input_tokens * price.get("input", 0.0) + output_tokens * price.get("output", 0.0)) / 1000
+
+
+@dataclass
+class RoutingDecision:
+    task: str
+    model: str
+    reason: str
+    input_tokens: int
+    estimated_cost: float
+    queue_seconds: float
+    skipped: List[str] = field(default_factory=list)
+
+
+def route(task: str, input: Any, priority: str = INTERACTIVE) -> RoutingDecision:
+    """
+    task 의 후보 중 input 을 보낼 모델을 고릅니다.
+
+    Args:
+        task (str): model_router.tasks 의 작업 이름. (refine_request, search_query, web_qa, answer)
+        input: LLM 에 보낼 입력. 토큰 수를 추정하는 데 사용합니다.
+        priority (str): llm_scheduler 우선순위. 대기 시간 한도를 고르는 데 사용합니다.
+
+    Raises:
+        BudgetExceededError: model_router.hard_cost_limit 가 켜져 있고 고른 모델의 예상 비용이 호출당 한도나 실행의 남은 예산을 넘는 경우.
+    """
+    conf = Shared.model_router
+    task_conf = conf.task(task)
+    models = [getattr(Shared.gpt, tier) for tier in task_conf["tiers"]]
+    input_tokens = approximate_tokens(input)
+    output_tokens = task_conf.get("completion_tokens", Shared.llm_scheduler.completion_tokens)
+    budget = current_run_budget()
+
+    candidates = []
+    for model in models:
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        wait, call_seconds = llm_scheduler.estimate_latency(model, input_tokens + output_tokens, priority)
+        candidates.append((model, cost, wait, call_seconds))
+
+    skipped = []
+    max_queue_seconds = conf.max_queue_seconds.get(priority)
+    remaining_cost = budget.remaining_cost if budget is not None else None
+    remaining_seconds = budget.remaining_seconds if budget is not None else None
+
+    def decide(model: str, cost: float, wait: float, reason: str) -> RoutingDecision:
+        if conf.hard_cost_limit and (
+            (conf.max_cost_per_call is not None and cost > conf.max_cost_per_call)
+            or (remaining_cost is not None and cost > remaining_cost)
+        ):
+            ROUTING_DECISIONS.inc(task=task, model=model, reason="over_budget")
+            raise BudgetExceededError(
+                f"No model for {task} fits the budget: cheapest {model} costs ~${cost:.4f}, "
+                f"call limit {conf.max_cost_per_call}, run budget left {remaining_cost}"
+            )
+        decision = RoutingDecision(task, model, reason, input_tokens, cost, wait, skipped)
+        if budget is not None:
+            budget.spent += cost
+        ROUTING_DECISIONS.inc(task=task, model=model, reason=reason)
+        logger.info(
+            f"Routed {task} to {model} ({reason}): ~{input_tokens} input tokens, est ${cost:.4f}, "
+            f"queue {wait:.1f}s" + (f", skipped {', '.join(skipped)}" if skipped else "")
+        )
+        return decision
+
+    fitting = []
+    for candidate in candidates:
+        if conf.context_window(candidate[0]) >= input_tokens + output_tokens:
+            fitting.append(candidate)
+        else:
+            skipped.append(f"{candidate[0]}: context")
+    if not fitting:
+        # 어떤 모델에도 들어가지 않으면 가장 큰 context window 의 모델로 보내 API 가 판단하게 합니다.
+        model, cost, wait, _ = max(candidates, key=lambda candidate: conf.context_window(candidate[0]))
+        return decide(model, cost, wait, "largest_context")
+
+    if input_tokens < task_conf.get("small_input_tokens", 0):
+        model, cost, wait, _ = min(fitting, key=lambda candidate: candidate[1])
+        return decide(model, cost, wait, "small_input")
+
+    for model, cost, wait, call_seconds in fitting:
+        if conf.max_cost_per_call is not None and cost > conf.max_cost_per_call:
+            skipped.append(f"{model}: call cost")
+        elif remaining_cost is not None and cost > remaining_cost:
+            skipped.append(f"{model}: run budget")
+        elif max_queue_seconds is not None and wait > max_queue_seconds:
+            skipped.append(f"{model}: queue {wait:.1f}s")
+        elif remaining_seconds is not None and wait + (call_seconds or 0.0) > remaining_seconds:
+            skipped.append(f"{model}: run deadline")
+        else:
+            return decide(model, cost, wait, "preferred" if not skipped else "fallback")
+
+    model, cost, wait, _ = min(fitting, key=lambda candidate: candidate[1])
+    return decide(model, cost, wait, "cheapest_over_limits")
@@ -0,0 +1,468 @@
+"""
+프로세스 전체의 LLM 호출을 모델별 RPM/TPM 한도 안에서 순서대로 내보내는 스케줄러입니다.
+
+- 모델마다 요청 수(RPM)와 토큰 수(TPM) token bucket 을 두고, 두 bucket 에 여유가 있을 때만 호출을 허가합니다.
+- 우선순위는 interactive(사용자가 기다리는 호출)와 bulk(web_qa 처럼 한 번에 많이 나가는 호출) 두 가지입니다.
+  interactive 를 먼저 허가하되, bulk_max_wait 초 넘게 기다린 bulk 호출은 interactive 와 같이 취급합니다.
+- 같은 우선순위 안에서는 client 별로 돌아가며 허가하여 한 사용자의 큰 fan-out 이 다른 사용자를 막지 않게 합니다.
+  client 는 호출에 직접 넘기거나 task_context.client_scope 로 설정하며(서버는 요청의 client ID 로 설정합니다), 없으면 모두 "default" 입니다.
+- 429 응답을 받으면 해당 모델의 허가를 retry-after(없으면 지수 backoff) 동안 멈추고 같은 호출을 다시 대기열에 넣습니다.
+- 5xx, 408/409, 연결 오류, 시간 초과처럼 일시적인 오류는 모델 전체를 멈추지 않고 그 호출만 같은 지수 backoff 뒤 다시 대기열에 넣습니다.
+  LLM 클라이언트의 자체 재시도는 끄고 사용하므로 이 재시도가 그 역할을 대신합니다.
+
+허가는 별도 daemon 스레드가 내리므로 여러 스레드와 여러 이벤트 루프에서 동시에 사용할 수 있습니다.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from oracle_search import Shared
+from oracle_search.metrics import registry
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.task_context import current_client
+
+logger = setup_logger()
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+QUEUE_SECONDS = registry.histogram(
+    "oracle_search_llm_queue_seconds", "LLM 스케줄러에서 허가를 기다린 시간", ("model", "priority")
+)
+QUEUE_DEPTH = registry.gauge("oracle_search_llm_queue_depth", "LLM 스케줄러에서 기다리는 호출 수", ("model", "priority"))
+CALL_SECONDS_ALPHA = 0.2
+
+RATE_LIMITED = registry.counter("oracle_search_llm_rate_limited", "LLM 호출이 429 로 거절된 횟수", ("model",))
+TRANSIENT_ERRORS = registry.counter(
+    "oracle_search_llm_transient_errors", "LLM 호출이 일시적인 오류(5xx, 연결 오류, 시간 초과)로 실패한 횟수", ("model",)
+)
+
+# openai SDK 가 자체 재시도하는 것과 같은 오류들입니다. APITimeoutError 는 APIConnectionError 의 하위 클래스입니다.
+TRANSIENT_ERROR_NAMES = frozenset({"APIConnectionError", "APITimeoutError", "InternalServerError"})
+TRANSIENT_STATUS_CODES = frozenset({408, 409})
+
+
+def approximate_tokens(value: Any) -> int:
+    return len(str(value).encode("utf-8")) // 4
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return getattr(error, "status_code", None) == 429 or error.__class__.__name__ == "RateLimitError"
+
+
+def is_transient_error(error: BaseException) -> bool:
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int) and (status in TRANSIENT_STATUS_CODES or status >= 500):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+def backoff_seconds(failures: int) -> float:
+    """
+    failures 번째 연속 실패 뒤 기다릴 시간입니다. base_backoff 에서 두 배씩 늘어나며 max_backoff 를 넘지 않고, 25% 까지 jitter 를 더합니다.
+    """
+    conf = Shared.llm_scheduler
+    return min(conf.max_backoff, conf.base_backoff * 2 ** (failures - 1)) * (1 + random.random() * 0.25)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+class _Bucket:
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        # 한 번에 capacity 보다 큰 호출은 bucket 이 가득 찼을 때 허가합니다.
+        needed = min(amount, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+
+class Ticket:
+    """
+    허가된 호출 하나입니다. 호출이 끝나면 settle 로 실제 사용한 토큰 수를 알려 추정치와의 차이를 bucket 에 반영합니다.
+    """
+
+    def __init__(self, scheduler: "RequestScheduler", model: str, tokens: int, priority: str, client: str):
+        self.scheduler = scheduler
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.client = client
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.notify: Callable[[], None] = lambda: None
+
+    def settle(self, used_tokens: Optional[int]):
+        if used_tokens is not None:
+            self.scheduler._adjust(self.model, used_tokens - self.tokens)
+
+
+class _ModelQueue:
+    def __init__(self, model: str):
+        conf = Shared.llm_scheduler
+        limits = conf.limits_for(model)
+        self.requests = _Bucket(limits["rpm"], conf.burst_seconds)
+        self.tokens = _Bucket(limits["tpm"], conf.burst_seconds)
+        self.blocked_until = 0.0
+        self.failures = 0
+        # 성공한 호출 시간의 지수 이동 평균(초). 아직 호출이 없으면 None 입니다.
+        self.call_seconds: Optional[float] = None
+        # 우선순위 -> client -> 대기 중인 Ticket
+        self.waiting: Dict[str, "OrderedDict[str, Deque[Ticket]]"] = {priority: OrderedDict() for priority in PRIORITIES}
+
+    def depth(self, priority: str) -> int:
+        return sum(len(tickets) for tickets in self.waiting[priority].values())
+
+    def _head(self, priority: str) -> Optional[Ticket]:
+        clients = self.waiting[priority]
+        while clients:
+            client, tickets = next(iter(clients.items()))
+            while tickets and tickets[0].cancelled:
+                tickets.popleft()
+            if tickets:
+                return tickets[0]
+            del clients[client]
+        return None
+
+    def next_ticket(self, now: float, bulk_max_wait: float) -> Optional[Ticket]:
+        interactive, bulk = self._head(INTERACTIVE), self._head(BULK)
+        if bulk is not None and (interactive is None or now - bulk.enqueued_at >= bulk_max_wait):
+            return bulk
+        return interactive
+
+    def pop(self, ticket: Ticket):
+        clients = self.waiting[ticket.priority]
+        clients[ticket.client].popleft()
+        # 허가를 받은 client 는 맨 뒤로 보내 같은 우선순위의 다른 client 와 번갈아 허가받게 합니다.
+        clients.move_to_end(ticket.client)
+        if not clients[ticket.client]:
+            del clients[ticket.client]
+
+
+class RequestScheduler:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self._queues:
+            self._queues[model] = _ModelQueue(model)
+        return self._queues[model]
+
+    def reset(self):
+        """
+        설정이 바뀌면 모델별 bucket 을 새 한도로 다시 만듭니다.
+        기다리던 호출과 429 로 멈춘 시각, 연속 실패 횟수, 호출 시간 평균은 새 queue 로 옮겨지므로 설정을 바꿔도 backoff 가 풀리지 않습니다.
+        """
+        with self._condition:
+            old_queues, self._queues = self._queues, {}
+            for model, old in old_queues.items():
+                queue = self._queue(model)
+                queue.waiting = old.waiting
+                queue.blocked_until = old.blocked_until
+                queue.failures = old.failures
+                queue.call_seconds = old.call_seconds
+            self._condition.notify()
+
+    def _ensure_dispatcher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="llm-scheduler", daemon=True)
+            self._thread.start()
+
+    def _submit(self, ticket: Ticket):
+        with self._condition:
+            self._ensure_dispatcher()
+            queue = self._queue(ticket.model)
+            queue.waiting[ticket.priority].setdefault(ticket.client, deque()).append(ticket)
+            QUEUE_DEPTH.set(queue.depth(ticket.priority), model=ticket.model, priority=ticket.priority)
+            self._condition.notify()
+
+    def _run(self):
+        with self._condition:
+            while True:
+                self._condition.wait(self._dispatch())
+
+    def _dispatch(self) -> Optional[float]:
+        """
+        허가할 수 있는 호출을 모두 허가하고, 다음 허가를 시도할 때까지 기다릴 시간을 반환합니다.
+        """
+        now = time.monotonic()
+        bulk_max_wait = Shared.llm_scheduler.bulk_max_wait
+        waits = []
+        for model, queue in self._queues.items():
+            queue.requests.refill(now)
+            queue.tokens.refill(now)
+            while (ticket := queue.next_ticket(now, bulk_max_wait)) is not None:
+                wait = max(
+                    queue.blocked_until - now, queue.requests.wait_time(1), queue.tokens.wait_time(ticket.tokens)
+                )
+                if wait > 0:
+                    waits.append(wait)
+                    break
+                queue.pop(ticket)
+                queue.requests.tokens -= 1
+                queue.tokens.tokens -= ticket.tokens
+                ticket.granted = True
+                QUEUE_SECONDS.observe(now - ticket.enqueued_at, model=model, priority=ticket.priority)
+                QUEUE_DEPTH.set(queue.depth(ticket.priority), model=model, priority=ticket.priority)
+                ticket.notify()
+            # interactive 뒤에서 기다리는 bulk 호출이 bulk_max_wait 에 도달하는 시점에도 순서를 다시 정합니다.
+            bulk = queue._head(BULK)
+            if bulk is not None and queue._head(INTERACTIVE) is not None and now - bulk.enqueued_at < bulk_max_wait:
+                waits.append(bulk_max_wait - (now - bulk.enqueued_at))
+        return min(waits) if waits else None
+
+    def _adjust(self, model: str, delta: int):
+        with self._condition:
+            queue = self._queue(model)
+            queue.tokens.tokens -= delta
+            self._condition.notify()
+
+    def _cancel(self, ticket: Ticket):
+        with self._condition:
+            ticket.cancelled = True
+            if ticket.granted:
+                # 허가 후 호출하지 못했으므로 사용하지 않은 몫을 돌려줍니다.
+                queue = self._queue(ticket.model)
+                queue.requests.tokens += 1
+                queue.tokens.tokens += ticket.tokens
+            self._condition.notify()
+
+    def report_rate_limit(self, model: str, retry_after: Optional[float]) -> float:
+        """
+        429 를 받은 모델의 허가를 멈추고, 멈춘 시간(초)을 반환합니다.
+        """
+        with self._condition:
+            queue = self._queue(model)
+            queue.failures += 1
+            if retry_after is None:
+                retry_after = backoff_seconds(queue.failures)
+            queue.blocked_until = max(queue.blocked_until, time.monotonic() + retry_after)
+            # 한도가 실제보다 넉넉하게 설정된 경우이므로 모아 둔 여유를 비웁니다.
+            queue.requests.tokens = min(queue.requests.tokens, 0)
+            queue.tokens.tokens = min(queue.tokens.tokens, 0)
+            self._condition.notify()
+        RATE_LIMITED.inc(model=model)
+        logger.warning(f"Rate limited on {model}, pausing for {retry_after:.1f}s")
+        return retry_after
+
+    def report_success(self, model: str, seconds: Optional[float] = None):
+        with self._condition:
+            queue = self._queue(model)
+            queue.failures = 0
+            if seconds is not None:
+                previous = queue.call_seconds
+                queue.call_seconds = seconds if previous is None else previous + CALL_SECONDS_ALPHA * (seconds - previous)
+
+    def estimate_latency(self, model: str, tokens: int, priority: str = INTERACTIVE) -> Tuple[float, Optional[float]]:
+        """
+        지금 model 로 tokens 크기의 호출을 보내면 허가까지 기다릴 시간(초)과 호출 자체에 걸릴 시간(초)을 추정합니다.
+        앞에 기다리는 호출(bulk 는 interactive 까지 포함)이 모두 허가된 뒤에 허가된다고 가정합니다.
+        """
+        with self._condition:
+            queue = self._queues.get(model)
+            if queue is None:
+                return 0.0, None
+            now = time.monotonic()
+            priorities = (INTERACTIVE,) if priority == INTERACTIVE else PRIORITIES
+            ahead = [
+                ticket
+                for waiting in priorities
+                for tickets in queue.waiting[waiting].values()
+                for ticket in tickets
+                if not ticket.cancelled
+            ]
+            waits = [queue.blocked_until - now]
+            for bucket, amount in (
+                (queue.requests, len(ahead) + 1),
+                (queue.tokens, sum(ticket.tokens for ticket in ahead) + min(tokens, queue.tokens.capacity)),
+            ):
+                available = min(bucket.capacity, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                waits.append((amount - available) / bucket.rate)
+            return max(0.0, *waits), queue.call_seconds
+
+    def _ticket(self, model: str, tokens: int, priority: str, client: Optional[str]) -> Ticket:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority}")
+        return Ticket(self, model, tokens, priority, client or current_client() or "default")
+
+    def acquire(self, model: str, tokens: int, priority: str = INTERACTIVE, client: Optional[str] = None) -> Ticket:
+        """
+        호출 허가를 받을 때까지 현재 스레드를 멈춥니다. 이벤트 루프 안에서는 aacquire 를 사용합니다.
+        """
+        ticket = self._ticket(model, tokens, priority, client)
+        event = threading.Event()
+        ticket.notify = event.set
+        self._submit(ticket)
+        event.wait()
+        return ticket
+
+    async def aacquire(
+        self, model: str, tokens: int, priority: str = INTERACTIVE, client: Optional[str] = None
+    ) -> Ticket:
+        ticket = self._ticket(model, tokens, priority, client)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        ticket.notify = notify
+        self._submit(ticket)
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._cancel(ticket)
+            raise
+        return ticket
+
+
+llm_scheduler = RequestScheduler()
+Shared.subscribe("llm_scheduler", lambda old, new: llm_scheduler.reset())
+
+
+def _used_tokens(result: Any) -> Optional[int]:
+    """
+    결과에 들어 있는 실제 토큰 사용량입니다. 구조화된 출력처럼 사용량을 알 수 없으면 None 을 반환합니다.
+    """
+    message = result.get("raw") if isinstance(result, dict) else result
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class _Call:
+    """
+    스케줄러를 거쳐 실행하는 호출 하나의 재시도 상태입니다.
+    """
+
+    def __init__(self, model: str, tokens: int, priority: str):
+        self.model = model
+        self.tokens = tokens
+        self.priority = priority
+        self.attempt = 0
+
+    def retry_delay(self, error: BaseException) -> Optional[float]:
+        """
+        error 로 실패한 호출을 다시 시도할지 정합니다. 재시도하지 않으면 None, 재시도하면 다시 허가를 받기 전에 기다릴 시간(초)을 반환합니다.
+        429 는 스케줄러가 모델 전체의 허가를 멈추므로 따로 기다리지 않습니다.
+        """
+        if self.attempt >= Shared.llm_scheduler.max_retries:
+            return None
+        if is_rate_limit_error(error):
+            self.attempt += 1
+            llm_scheduler.report_rate_limit(self.model, retry_after_seconds(error))
+            return 0.0
+        if is_transient_error(error):
+            self.attempt += 1
+            delay = backoff_seconds(self.attempt)
+            TRANSIENT_ERRORS.inc(model=self.model)
+            logger.warning(f"Transient error from {self.model} ({error!r}), retrying in {delay:.1f}s")
+            return delay
+        return None
+
+
+def _estimate(input: Any) -> int:
+    return approximate_tokens(input) + Shared.llm_scheduler.completion_tokens
+
+
+def scheduled(runnable, model: str, priority: str = INTERACTIVE):
+    """
+    runnable 의 invoke / ainvoke 가 llm_scheduler 의 허가를 받은 뒤 실행되도록 감쌉니다.
+    429 나 일시적인 오류로 실패하면 backoff 후 다시 허가를 받아 재시도합니다. runnable 안의 LLM 은 자체 재시도를 끄고 사용합니다.
+
+    Args:
+        runnable: prompt | llm 형태의 LangChain Runnable.
+        model (str): 한도를 적용할 모델 이름.
+        priority (str): INTERACTIVE 또는 BULK.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    def invoke(input, config):
+        call = _Call(model, _estimate(input), priority)
+        while True:
+            ticket = llm_scheduler.acquire(model, call.tokens, priority)
+            started = time.monotonic()
+            try:
+                result = runnable.invoke(input, config)
+            except Exception as e:
+                ticket.settle(0)
+                if (delay := call.retry_delay(e)) is None:
+                    raise
+                time.sleep(delay)
+                continue
+            llm_scheduler.report_success(model, time.monotonic() - started)
+            ticket.settle(_used_tokens(result))
+            return result
+
+    async def ainvoke(input, config):
+        call = _Call(model, _estimate(input), priority)
+        while True:
+            ticket = await llm_scheduler.aacquire(model, call.tokens, priority)
+            started = time.monotonic()
+            try:
+                result = await runnable.ainvoke(input, config)
+            except Exception as e:
+                ticket.settle(0)
+                if (delay := call.retry_delay(e)) is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            llm_scheduler.report_success(model, time.monotonic() - started)
+            ticket.settle(_used_tokens(result))
+            return result
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=getattr(runnable, "name", None) or "scheduled")
+
+
+async def astream_scheduled(runnable, input: Any, model: str, priority: str = INTERACTIVE) -> AsyncIterator[Any]:
+    """
+    runnable.astream 을 스케줄러의 허가를 받은 뒤 실행합니다. 첫 조각을 받기 전에 429 나 일시적인 오류로 실패한 경우에만 재시도합니다.
+    """
+    call = _Call(model, _estimate(input), priority)
+    while True:
+        ticket = await llm_scheduler.aacquire(model, call.tokens, priority)
+        started_at = time.monotonic()
+        started = False
+        used = None
+        try:
+            async for chunk in runnable.astream(input):
+                started = True
+                if getattr(chunk, "usage_metadata", None):
+                    used = chunk.usage_metadata.get("total_tokens")
+                yield chunk
+        except Exception as e:
+            ticket.settle(0 if not started else used)
+            if started or (delay := call.retry_delay(e)) is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        llm_scheduler.report_success(model, time.monotonic() - started_at)
+        ticket.settle(used)
+        return
+
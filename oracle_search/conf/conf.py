@@ -1,9 +1,7 @@
 import os
+from collections import defaultdict
 from functools import cached_property
-from typing import Optional
-
-from diskcache import Cache
-from langchain_google_community import GoogleSearchAPIWrapper
+from typing import Any, Callable, Optional
 
 
 class GPT:
@@ -34,13 +32,47 @@ class TMDB:
 
 class DiskCache:
     cache_dir: str
+    body_ttl: float
+    eviction_policy: str
 
     def __init__(self, config: dict[str, any]):
         self.cache_dir = config["cache_dir"]
+        self.body_ttl = config.get("body_ttl", 7 * 24 * 60 * 60)
+        # diskcache 의 eviction policy. least-recently-used / least-frequently-used 는 읽을 때마다 접근 시각 / 횟수를 기록하므로
+        # 읽기가 조금 느려지는 대신 devtools.cache_tool export 가 실제로 많이 읽힌 항목을 고를 수 있습니다.
+        self.eviction_policy = config.get("eviction_policy", "least-recently-stored")
 
     @cached_property
     def web_cache(self):
-        return Cache(self.cache_dir)
+        from diskcache import Cache
+
+        return Cache(self.cache_dir, eviction_policy=self.eviction_policy)
+
+    def close(self):
+        if "web_cache" in self.__dict__:
+            self.web_cache.close()
+
+
+class CacheWriter:
+    enabled: bool
+    max_lag: float
+    batch_size: int
+    max_pending: int
+    max_pending_bytes: int
+    read_workers: int
+    shutdown_timeout: float
+
+    def __init__(self, config: dict[str, any]):
+        # False 이면 쓰기를 버퍼에 모으지 않고 호출한 스레드에서 바로 기록합니다.
+        self.enabled = config.get("enabled", True)
+        # 버퍼에 들어온 쓰기가 기록되기까지 기다리는 최대 시간(초). 프로세스가 죽으면 이만큼의 쓰기를 잃을 수 있습니다.
+        self.max_lag = config.get("max_lag", 1.0)
+        self.batch_size = config.get("batch_size", 100)
+        # 버퍼가 이 크기를 넘으면 aset 은 자리가 날 때까지 기다립니다.
+        self.max_pending = config.get("max_pending", 1000)
+        self.max_pending_bytes = config.get("max_pending_bytes", 64 * 1024 * 1024)
+        self.read_workers = config.get("read_workers", 4)
+        self.shutdown_timeout = config.get("shutdown_timeout", 10)
 
 class GoogleSearch:
     google_api_key: str
@@ -52,11 +84,388 @@ class GoogleSearch:
 
     @cached_property
     def search_engine(self):
+        from langchain_google_community import GoogleSearchAPIWrapper
+
         return GoogleSearchAPIWrapper(google_api_key=self.google_api_key, google_cse_id=self.custom_search_engine_id)
 
+class WebFetch:
+    max_bytes: dict[str, int]
+    default_max_bytes: int
+    chunk_size: int
+    fetcher_timeouts: dict[str, float]
+    search_timeout: Optional[float]
+    deadline_grace: float
+
+    def __init__(self, config: dict[str, any]):
+        self.max_bytes = {
+            "text/html": 5 * 1024 * 1024,
+            "application/xhtml+xml": 5 * 1024 * 1024,
+            "text/plain": 2 * 1024 * 1024,
+            "application/pdf": 50 * 1024 * 1024,
+            "application/vnd.openxmlformats-officedocument.wordprocessingml.document": 30 * 1024 * 1024,
+            "application/vnd.openxmlformats-officedocument.presentationml.presentation": 30 * 1024 * 1024,
+            **config.get("max_bytes", {}),
+        }
+        self.default_max_bytes = config.get("default_max_bytes", 2 * 1024 * 1024)
+        self.chunk_size = config.get("chunk_size", 64 * 1024)
+        self.fetcher_timeouts = config.get("fetcher_timeouts", {})
+        self.search_timeout = config.get("search_timeout", 60)
+        self.deadline_grace = config.get("deadline_grace", 1.0)
+
+    def max_bytes_for(self, content_type: str) -> int:
+        return self.max_bytes.get(content_type, self.default_max_bytes)
+
+    def timeout_for(self, fetcher_name: str, default: float) -> float:
+        return self.fetcher_timeouts.get(fetcher_name, default)
+
+
+class DocumentFetch:
+    max_pages: int
+    max_tokens: int
+    pages_per_task: int
+    max_workers: int
+
+    def __init__(self, config: dict[str, any]):
+        self.max_pages = config.get("max_pages", 50)
+        self.max_tokens = config.get("max_tokens", 30000)
+        self.pages_per_task = config.get("pages_per_task", 4)
+        self.max_workers = config.get("max_workers", 2)
+
+
+class Rerank:
+    enabled: bool
+    top_n: int
+    max_distance: int
+
+    def __init__(self, config: dict[str, any]):
+        self.enabled = config.get("enabled", True)
+        self.top_n = config.get("top_n", 8)
+        self.max_distance = config.get("max_distance", 3)
+
+
+class Worker:
+    mode: str
+    lease_ttl: float
+    poll_interval: float
+    wait_timeout: float
+    browser_pool_socket: Optional[str]
+    stats_interval: float
+
+    def __init__(self, config: dict[str, any]):
+        self.mode = config.get("mode", "single")
+        self.lease_ttl = config.get("lease_ttl", 120)
+        self.poll_interval = config.get("poll_interval", 0.2)
+        self.wait_timeout = config.get("wait_timeout", 60)
+        self.browser_pool_socket = config.get("browser_pool_socket")
+        self.stats_interval = config.get("stats_interval", 10)
+
+    @property
+    def is_multi(self) -> bool:
+        return self.mode == "multi"
+
+
+class Search:
+    providers: list[str]
+    hedge_delay: float
+    cooldown: float
+    daily_quotas: dict[str, int]
+    provider_timeout: float
+    searxng_url: Optional[str]
+    local_refresh_interval: float
+    local_min_score: float
+
+    def __init__(self, config: dict[str, any]):
+        # 시도할 순서. google, searxng, local_cache 중에서 고릅니다.
+        self.providers = config.get("providers", ["google"])
+        # 앞선 제공자가 이 시간(초) 안에 결과를 내지 못하면 다음 제공자를 함께 실행합니다.
+        self.hedge_delay = config.get("hedge_delay", 2.0)
+        # 오류를 낸 제공자를 건너뛰는 시간(초).
+        self.cooldown = config.get("cooldown", 60)
+        # 제공자 이름 -> 하루 최대 검색 수. 없으면 제한하지 않습니다.
+        self.daily_quotas = config.get("daily_quotas", {})
+        self.provider_timeout = config.get("provider_timeout", 10)
+        self.searxng_url = config.get("searxng_url")
+        self.local_refresh_interval = config.get("local_refresh_interval", 10 * 60)
+        self.local_min_score = config.get("local_min_score", 2.0)
+
+
+class FanOut:
+    enabled: bool
+    max_queries: int
+    max_links: int
+    merge_threshold: float
+    target_documents: int
+
+    def __init__(self, config: dict[str, any]):
+        self.enabled = config.get("enabled", True)
+        self.max_queries = config.get("max_queries", 6)
+        self.max_links = config.get("max_links", 12)
+        self.merge_threshold = config.get("merge_threshold", 0.7)
+        self.target_documents = config.get("target_documents", 8)
+
+
+class NamuWiki:
+    max_sections: int
+    max_table_rows: int
+    section_ttl: float
+
+    def __init__(self, config: dict[str, any]):
+        self.max_sections = config.get("max_sections", 6)
+        self.max_table_rows = config.get("max_table_rows", 30)
+        self.section_ttl = config.get("section_ttl", 24 * 60 * 60)
+
+
+class YouTube:
+    languages: list[str]
+    max_workers: int
+    transcript_ttl: float
+    missing_ttl: float
+    chunk_seconds: float
+    chunk_chars: int
+    max_chunks: int
+
+    def __init__(self, config: dict[str, any]):
+        self.languages = config.get("languages", ["ko", "en", "ja"])
+        self.max_workers = config.get("max_workers", 4)
+        self.transcript_ttl = config.get("transcript_ttl", 7 * 24 * 60 * 60)
+        self.missing_ttl = config.get("missing_ttl", 60 * 60)
+        self.chunk_seconds = config.get("chunk_seconds", 120)
+        self.chunk_chars = config.get("chunk_chars", 1500)
+        self.max_chunks = config.get("max_chunks", 12)
+
+
+class Logging:
+    level: str
+    format: str
+    enqueue: bool
+    colorize: bool
+    limit_below: str
+    rate_limits: dict[str, float]
+    sample_rates: dict[str, float]
+
+    def __init__(self, config: dict[str, any]):
+        self.level = config.get("level", "DEBUG")
+        self.format = config.get("format", "pretty")
+        self.enqueue = config.get("enqueue", True)
+        self.colorize = config.get("colorize", True)
+        self.limit_below = config.get("limit_below", "WARNING")
+        # 모듈 이름 접두사 -> 초당 최대 메시지 수 / 남길 비율(0~1). 가장 긴 접두사가 적용됩니다.
+        self.rate_limits = config.get("rate_limits", {})
+        self.sample_rates = config.get("sample_rates", {})
+
+    @staticmethod
+    def _match(table: dict[str, float], name: str) -> Optional[float]:
+        prefixes = [prefix for prefix in table if name == prefix or name.startswith(prefix + ".")]
+        return table[max(prefixes, key=len)] if prefixes else None
+
+    def rate_limit_for(self, name: str) -> Optional[float]:
+        return self._match(self.rate_limits, name)
+
+    def sample_rate_for(self, name: str) -> float:
+        rate = self._match(self.sample_rates, name)
+        return 1.0 if rate is None else rate
+
+
+class Metrics:
+    host: str
+    port: Optional[int]
+
+    def __init__(self, config: dict[str, any]):
+        self.host = config.get("host", "127.0.0.1")
+        # 설정하면 http://<host>:<port>/metrics 에서 Prometheus 형식으로 노출합니다.
+        self.port = config.get("port")
+
+
+class Server:
+    host: str
+    port: int
+    max_concurrency: int
+    max_queue: int
+    queue_timeout: float
+    request_timeout: float
+    client_header: str
+    client_rate: float
+    client_burst: float
+    client_concurrency: int
+    client_quotas: dict[str, dict[str, float]]
+    http_limit: int
+    http_limit_per_host: int
+    browser_pool_size: int
+    checkpoint: bool
+    sse_heartbeat: float
+    drain_timeout: float
+
+    def __init__(self, config: dict[str, any]):
+        self.host = config.get("host", "127.0.0.1")
+        self.port = config.get("port", 8080)
+        # 동시에 실행하는 요청 수와, 자리가 날 때까지 기다릴 수 있는 요청 수. 대기열이 차면 503 을 반환합니다.
+        self.max_concurrency = config.get("max_concurrency", 8)
+        self.max_queue = config.get("max_queue", 32)
+        self.queue_timeout = config.get("queue_timeout", 30)
+        self.request_timeout = config.get("request_timeout", 180)
+        # 클라이언트를 구분하는 헤더. 없으면 접속한 주소로 구분합니다.
+        self.client_header = config.get("client_header", "X-Client-Id")
+        # 클라이언트별 분당 요청 수, 한 번에 몰아 보낼 수 있는 요청 수, 동시 요청 수. 넘으면 429 를 반환합니다.
+        self.client_rate = config.get("client_rate", 60)
+        self.client_burst = config.get("client_burst", 10)
+        self.client_concurrency = config.get("client_concurrency", 4)
+        # 클라이언트별로 위 값을 바꿉니다. e.g. {"batch-job": {"rate": 600, "burst": 50, "concurrency": 16}}
+        self.client_quotas = config.get("client_quotas", {})
+        self.http_limit = config.get("http_limit", 100)
+        self.http_limit_per_host = config.get("http_limit_per_host", 8)
+        # 0 보다 크면 worker.browser_pool_socket 에 이 크기의 브라우저 풀을 서비스 안에서 띄웁니다.
+        self.browser_pool_size = config.get("browser_pool_size", 0)
+        # True 이면 checkpoint.path 에 그래프 실행 상태를 저장하고 thread_id 로 이어서 실행할 수 있습니다.
+        self.checkpoint = config.get("checkpoint", False)
+        self.sse_heartbeat = config.get("sse_heartbeat", 15)
+        # 종료 신호를 받은 뒤 readiness 를 내리고 진행 중인 요청이 끝나기를 기다리는 최대 시간(초).
+        self.drain_timeout = config.get("drain_timeout", 30)
+
+    def client_quota(self, client: str) -> dict[str, float]:
+        return {
+            "rate": self.client_rate,
+            "burst": self.client_burst,
+            "concurrency": self.client_concurrency,
+            **self.client_quotas.get(client, {}),
+        }
+
+
+class LLMScheduler:
+    limits: dict[str, dict[str, float]]
+    default_rpm: float
+    default_tpm: float
+    burst_seconds: float
+    bulk_max_wait: float
+    completion_tokens: int
+    max_retries: int
+    base_backoff: float
+    max_backoff: float
+
+    def __init__(self, config: dict[str, any]):
+        # 모델 이름 -> {"rpm": 분당 요청 수, "tpm": 분당 토큰 수}. 없는 값은 default_rpm / default_tpm 을 사용합니다.
+        self.limits = config.get("limits", {})
+        self.default_rpm = config.get("default_rpm", 500)
+        self.default_tpm = config.get("default_tpm", 30000)
+        self.burst_seconds = config.get("burst_seconds", 10)
+        self.bulk_max_wait = config.get("bulk_max_wait", 30)
+        self.completion_tokens = config.get("completion_tokens", 512)
+        self.max_retries = config.get("max_retries", 5)
+        self.base_backoff = config.get("base_backoff", 1.0)
+        self.max_backoff = config.get("max_backoff", 60.0)
+
+    def limits_for(self, model: str) -> dict[str, float]:
+        limits = self.limits.get(model, {})
+        return {"rpm": limits.get("rpm", self.default_rpm), "tpm": limits.get("tpm", self.default_tpm)}
+
+
+class BrowserSupervisor:
+    reap_interval: Optional[float]
+    max_age: float
+    quit_grace: float
+    orphan_grace: float
+    reap_reparented: bool
+
+    def __init__(self, config: dict[str, any]):
+        # reaper 실행 주기(초). None 이면 reaper 를 실행하지 않습니다.
+        self.reap_interval = config.get("reap_interval", 60)
+        # 드라이버가 이 시간(초)보다 오래 살아 있으면 정리되지 않은 것으로 보고 강제로 종료합니다.
+        self.max_age = config.get("max_age", 10 * 60)
+        self.quit_grace = config.get("quit_grace", 30)
+        # 등록되지 않은 브라우저 프로세스는 이 시간(초)이 지나야 정리합니다. 막 생성 중인 드라이버를 건드리지 않기 위함입니다.
+        self.orphan_grace = config.get("orphan_grace", 120)
+        # 부모가 죽어 init(pid 1)으로 넘어간 같은 사용자의 자동화 브라우저도 정리합니다.
+        # 같은 사용자로 실행되는 다른 프로세스의 브라우저까지 종료할 수 있으므로 이 프로세스만 브라우저를 띄우는 환경에서만 켭니다.
+        self.reap_reparented = config.get("reap_reparented", False)
+
+
+class ModelRouter:
+    tasks: dict[str, dict[str, any]]
+    max_cost_per_run: Optional[float]
+    max_seconds_per_run: Optional[float]
+    max_cost_per_call: Optional[float]
+    hard_cost_limit: bool
+    max_queue_seconds: dict[str, float]
+    context_windows: dict[str, int]
+    default_context_window: int
+    prices: dict[str, dict[str, float]]
+
+    # 작업 이름 -> tiers(좋은 순서의 GPT 속성 이름), small_input_tokens(이보다 작은 입력은 가장 싼 tier), completion_tokens(예상 출력).
+    # refine_request, search_query 는 json_schema 구조화 출력을 쓰므로 이를 지원하는 모델(gpt_4o, gpt_4o_mini)만 두어야 합니다.
+    DEFAULT_TASKS = {
+        "refine_request": {"tiers": ["gpt_4o", "gpt_4o_mini"], "completion_tokens": 400},
+        "search_query": {"tiers": ["gpt_4o", "gpt_4o_mini"], "small_input_tokens": 300, "completion_tokens": 300},
+        "web_qa": {"tiers": ["gpt_4o_mini"]},
+        "answer": {"tiers": ["gpt_4o", "gpt_4o_mini"], "completion_tokens": 800},
+    }
+
+    def __init__(self, config: dict[str, any]):
+        tasks = config.get("tasks", {})
+        self.tasks = {name: {**self.DEFAULT_TASKS.get(name, {}), **tasks.get(name, {})} for name in {*self.DEFAULT_TASKS, *tasks}}
+        # 실행(그래프 run) 하나의 비용(USD)과 시간(초) 한도. RunnableConfig 의 configurable.max_cost / max_seconds 로 실행마다 바꿀 수 있습니다.
+        self.max_cost_per_run = config.get("max_cost_per_run")
+        self.max_seconds_per_run = config.get("max_seconds_per_run")
+        self.max_cost_per_call = config.get("max_cost_per_call")
+        # True 이면 가장 싼 후보도 max_cost_per_call 이나 실행의 남은 예산을 넘을 때 호출하지 않고 BudgetExceededError 를 발생시킵니다.
+        self.hard_cost_limit = config.get("hard_cost_limit", False)
+        # llm_scheduler 에서 이보다 오래 기다릴 것으로 보이면 다음 후보를 사용합니다.
+        self.max_queue_seconds = {"interactive": 5.0, "bulk": 60.0, **config.get("max_queue_seconds", {})}
+        self.context_windows = {"gpt-4": 8192, "gpt-3.5-turbo": 16385, **config.get("context_windows", {})}
+        self.default_context_window = config.get("default_context_window", 128000)
+        # get_openai_callback 의 가격표에 없는 모델의 1K 토큰당 가격. {"model": {"input": float, "output": float}}
+        self.prices = config.get("prices", {})
+
+    def task(self, name: str) -> dict[str, any]:
+        return self.tasks[name]
+
+    def context_window(self, model: str) -> int:
+        return self.context_windows.get(model, self.default_context_window)
+
+
+class Checkpoint:
+    path: str
+    document_ttl: float
+
+    def __init__(self, config: dict[str, any]):
+        self.path = config.get("path", "checkpoints.sqlite")
+        self.document_ttl = config.get("document_ttl", 7 * 24 * 60 * 60)
+
+
 class Shared:
     gpt: Optional[GPT] = None
     open_ai: Optional[OpenAI] = None
     tmdb: Optional[TMDB] = None
     disk_cache: Optional[DiskCache] = None
+    cache_writer: Optional[CacheWriter] = None
     google_search: Optional[GoogleSearch] = None
+    web_fetch: Optional[WebFetch] = None
+    document_fetch: Optional[DocumentFetch] = None
+    rerank: Optional[Rerank] = None
+    worker: Optional[Worker] = None
+    checkpoint: Optional[Checkpoint] = None
+    search: Optional[Search] = None
+    fan_out: Optional[FanOut] = None
+    namu_wiki: Optional[NamuWiki] = None
+    youtube: Optional[YouTube] = None
+    logging: Optional[Logging] = None
+    metrics: Optional[Metrics] = None
+    server: Optional[Server] = None
+    llm_scheduler: Optional[LLMScheduler] = None
+    model_router: Optional[ModelRouter] = None
+    browser_supervisor: Optional[BrowserSupervisor] = None
+
+    _listeners: dict[str, list[Callable[[Any, Any], None]]] = defaultdict(list)
+
+    @classmethod
+    def subscribe(cls, name: str, listener: Callable[[Any, Any], None]):
+        """
+        Shared.<name> 이 설정 변경으로 교체될 때 listener(old, new) 를 호출하도록 등록합니다.
+        풀, 캐시처럼 설정으로부터 만들어진 자원을 다시 만들 때 사용합니다.
+        """
+        cls._listeners[name].append(listener)
+
+    @classmethod
+    def replace(cls, name: str, value: Any):
+        old = getattr(cls, name)
+        setattr(cls, name, value)
+        for listener in cls._listeners[name]:
+            listener(old, value)
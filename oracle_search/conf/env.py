@@ -1,13 +1,17 @@
+import copy
 import os
+import threading
 from enum import Enum
 from functools import cached_property
 
 import yaml
 
-from typing import Optional, Type, TypeVar
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar
 
 T = TypeVar("T")
 
+ENV_OVERRIDE_PREFIX = "EX_MACHINA__"
+
 
 class _SingletonWrapper:
     _instance: Optional[T] = None
@@ -39,10 +43,115 @@ class Profile(str, Enum):
         return self == self.PROD
 
 
+def deep_merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    base 를 복사한 뒤 override 의 값을 재귀적으로 덮어씁니다.
+    """
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def env_overrides(environ: Dict[str, str]) -> Dict[str, Any]:
+    """
+    EX_MACHINA__SECTION__KEY=value 형태의 환경 변수를 {"section": {"key": value}} 로 변환합니다.
+    값은 YAML 로 해석하므로 숫자, 불리언, 리스트를 그대로 쓸 수 있습니다.
+    """
+    overrides = {}
+    for name, raw in environ.items():
+        if not name.startswith(ENV_OVERRIDE_PREFIX):
+            continue
+        *path, leaf = name[len(ENV_OVERRIDE_PREFIX):].lower().split("__")
+        node = overrides
+        for key in path:
+            node = node.setdefault(key, {})
+        node[leaf] = yaml.safe_load(raw)
+    return overrides
+
+
 @singleton
 class Environment:
+    """
+    설정 파일, 환경 변수, 코드에서 지정한 override 를 순서대로 합친 설정을 제공합니다.
+    설정 파일이 바뀌면 reload 로 다시 읽고, 값이 바뀐 경우 subscribe 로 등록한 콜백에 새 설정을 전달합니다.
+    config 는 매번 새 dict 로 교체되므로 읽는 쪽에서 별도의 잠금이 필요 없습니다.
+    """
+
     def __init__(self):
         self.profile = Profile(os.getenv("EX_MACHINA_ENV", Profile.DEV.value))
-
-        with open("config.yaml") as f:
-            self.config = yaml.load(f, Loader=yaml.FullLoader).get(self.profile)
+        self.path = os.getenv("EX_MACHINA_CONFIG", "config.yaml")
+        self.overrides: Dict[str, Any] = {}
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.RLock()
+        self._mtime: Optional[float] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self.config = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        self._mtime = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            file_config = yaml.safe_load(f).get(self.profile) or {}
+        return deep_merge(deep_merge(file_config, env_overrides(dict(os.environ))), self.overrides)
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        self.listeners.append(listener)
+
+    def _publish(self, config: Dict[str, Any]):
+        with self._lock:
+            if config == self.config:
+                return
+            self.config = config
+            for listener in self.listeners:
+                listener(config)
+
+    def override(self, overrides: Dict[str, Any]):
+        """
+        실행 중에 설정 일부를 덮어씁니다. 설정 파일을 다시 읽어도 override 는 유지됩니다.
+        """
+        with self._lock:
+            self.overrides = deep_merge(self.overrides, overrides)
+            self._publish(deep_merge(self.config, overrides))
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        설정 파일이 바뀌었으면 다시 읽습니다. 파일을 읽거나 해석하지 못하면 기존 설정을 유지합니다.
+
+        Returns:
+            bool: 설정 파일을 다시 읽었는지 여부.
+        """
+        with self._lock:
+            try:
+                if not force and os.path.getmtime(self.path) == self._mtime:
+                    return False
+                config = self._load()
+            except (OSError, yaml.YAMLError, AttributeError) as e:
+                from oracle_search.pretty_logger import setup_logger
+
+                setup_logger().error(f"Failed to reload {self.path}, keeping the current config: {e}")
+                return False
+            self._publish(config)
+            return True
+
+    def watch(self, interval: float = 2.0):
+        """
+        interval 초마다 설정 파일의 변경 여부를 확인하는 데몬 스레드를 시작합니다.
+        """
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def run():
+            while not self._stop_watching.wait(interval):
+                self.reload()
+
+        self._watcher = threading.Thread(target=run, name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        self._watcher = None
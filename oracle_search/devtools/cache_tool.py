@@ -0,0 +1,344 @@
+"""
+로컬 디스크 캐시(disk_cache.cache_dir) 를 관리하는 오프라인 도구입니다.
+
+- stats: 항목 수, 크기, 만료된 항목, 키 종류(fetcher)와 도메인별 항목 수를 보여줍니다.
+- export: 자주 쓰이는 항목을 스냅샷 파일(gzip)로 내보냅니다. 항목이 참조하는 본문(document_body:)과 나무위키 문단도 함께 내보냅니다.
+- import: 스냅샷을 새 캐시에 한 번에 넣습니다. 남은 만료 시간을 유지하며, 기본으로 이미 있는 항목은 덮어쓰지 않습니다.
+- expire: 만료된 항목을 지웁니다.
+- vacuum: 파일과 DB 의 불일치를 고치고 SQLite 파일을 압축합니다.
+- purge: 도메인(하위 도메인 포함)의 항목을 지웁니다. 본문은 다른 항목과 공유될 수 있으므로 body_ttl 이 지나 만료되도록 둡니다.
+
+--order hits 는 disk_cache.eviction_policy 가 least-frequently-used 일 때만 읽은 횟수가 기록됩니다.
+기록되지 않았으면 recent 와 같이 최근 사용(또는 저장) 순서로 고릅니다.
+워커가 캐시를 사용 중일 때 vacuum 을 실행하면 그동안 쓰기가 막히므로 워커를 멈춘 뒤 실행하세요.
+
+사용법:
+    python -m oracle_search.devtools.cache_tool [--cache-dir DIR] stats [--top 20]
+    python -m oracle_search.devtools.cache_tool export snapshot.gz [--order recent|hits] [--limit 5000] [--max-mb 512]
+    python -m oracle_search.devtools.cache_tool import snapshot.gz [--overwrite]
+    python -m oracle_search.devtools.cache_tool expire
+    python -m oracle_search.devtools.cache_tool vacuum
+    python -m oracle_search.devtools.cache_tool purge example.com [--dry-run]
+"""
+import argparse
+import gzip
+import os
+import pickle
+import re
+import sqlite3
+import struct
+import sys
+import time
+from collections import Counter
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import orjson
+
+SNAPSHOT_FORMAT = "oracle_search.cache_snapshot"
+SNAPSHOT_VERSION = 1
+BODY_KEY_PREFIX = "document_body:"
+# 워커 사이의 조정에 쓰이는 항목은 다른 노드로 옮기지 않습니다.
+EXCLUDED_PREFIXES = ("lease:", "worker_stats:", "search_quota:")
+URL_REGEX = re.compile(r"https?://[^\s]+")
+YOUTUBE_DOMAIN = "youtube.com"
+YOUTUBE_KINDS = {"YouTubeTranscript", "YouTubeFetcher"}
+FRAME = struct.Struct(">I")
+
+
+def default_cache_dir() -> str:
+    from oracle_search.conf.env import Environment
+
+    return Environment().config["disk_cache"]["cache_dir"]
+
+
+def open_cache(directory: str):
+    from diskcache import Cache
+
+    # eviction_policy 등은 넘기지 않아 캐시에 저장된 설정을 그대로 사용합니다.
+    return Cache(directory)
+
+
+def key_kind(key: str) -> str:
+    return key.split(":", 1)[0] if ":" in key else key
+
+
+def key_domain(key: str) -> Optional[str]:
+    """
+    캐시 키에 들어 있는 URL 의 도메인을 반환합니다. 영상 ID 로 저장된 자막은 youtube.com 으로 봅니다.
+    """
+    match = URL_REGEX.search(key)
+    if not match:
+        return YOUTUBE_DOMAIN if key_kind(key) in YOUTUBE_KINDS else None
+    host = urlsplit(match.group(0)).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def matches_domain(domain: Optional[str], target: str) -> bool:
+    return domain is not None and (domain == target or domain.endswith(f".{target}"))
+
+
+def _rows(cache, where: str = "", parameters: tuple = ()) -> Iterator[tuple]:
+    """
+    (key, store_time, expire_time, access_time, access_count, size) 를 읽습니다. 문자열 키만 다룹니다.
+    """
+    connection = sqlite3.connect(f"file:{os.path.join(cache.directory, 'cache.db')}?mode=ro", uri=True)
+    try:
+        yield from connection.execute(
+            "SELECT key, store_time, expire_time, access_time, access_count, size FROM Cache "
+            f"WHERE raw = 1 AND typeof(key) = 'text' {where}",
+            parameters,
+        )
+    finally:
+        connection.close()
+
+
+def _read_entry(cache, key: str) -> tuple:
+    # 큰 값은 diskcache 가 파일로 저장하므로 read=True 로 파일 핸들을 받아 읽습니다.
+    value, expire_time = cache.get(key, read=True, expire_time=True)
+    if hasattr(value, "read"):
+        with value:
+            value = value.read()
+    return value, expire_time
+
+
+def _encode(value) -> Tuple[str, bytes]:
+    if isinstance(value, bytes):
+        return "bytes", value
+    if isinstance(value, str):
+        return "str", value.encode("utf-8")
+    return "pickle", pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(kind: str, data: bytes):
+    if kind == "bytes":
+        return data
+    if kind == "str":
+        return data.decode("utf-8")
+    return pickle.loads(data)
+
+
+def _write_frame(f: BinaryIO, data: bytes):
+    f.write(FRAME.pack(len(data)))
+    f.write(data)
+
+
+def _read_frame(f: BinaryIO) -> Optional[bytes]:
+    header = f.read(FRAME.size)
+    if not header:
+        return None
+    (length,) = FRAME.unpack(header)
+    return f.read(length)
+
+
+def _dependencies(cache, key: str, value) -> List[str]:
+    """
+    항목이 참조하는 다른 캐시 항목의 키입니다. fetch 결과의 본문(body_ref)과 나무위키 문서 인덱스의 문단입니다.
+    """
+    if ":index:" in key:
+        prefix, url = key.split(":index:", 1)
+        section_prefix = f"{prefix}:section:{url}:"
+        return [row[0] for row in _rows(cache, "AND substr(key, 1, ?) = ?", (len(section_prefix), section_prefix))]
+    if isinstance(value, bytes) and value[:1] == b"{":
+        try:
+            document = orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return []
+        if isinstance(document, dict) and isinstance(document.get("body_ref"), str):
+            return [document["body_ref"]]
+    return []
+
+
+def stats(cache, top: int):
+    now = time.time()
+    count = expired = 0
+    sizes: Counter = Counter()
+    kinds: Counter = Counter()
+    domains: Counter = Counter()
+    for key, _, expire_time, _, _, size in _rows(cache):
+        count += 1
+        if expire_time is not None and expire_time <= now:
+            expired += 1
+        kinds[key_kind(key)] += 1
+        sizes[key_kind(key)] += size
+        if domain := key_domain(key):
+            domains[domain] += 1
+    policy = cache.eviction_policy
+    print(f"directory={cache.directory} policy={policy} entries={count} expired={expired}")
+    print(f"volume={cache.volume() / 2 ** 20:.1f}MB size_limit={cache.size_limit / 2 ** 20:.0f}MB")
+    print(f"\n{'kind':<32} {'entries':>8} {'MB':>8}")
+    for kind, entries in kinds.most_common(top):
+        print(f"{kind:<32} {entries:>8} {sizes[kind] / 2 ** 20:>8.1f}")
+    print(f"\n{'domain':<32} {'entries':>8}")
+    for domain, entries in domains.most_common(top):
+        print(f"{domain:<32} {entries:>8}")
+
+
+def export(cache, path: str, order: str, limit: Optional[int], max_bytes: Optional[int]) -> int:
+    policy = cache.eviction_policy
+    if order == "hits" and policy != "least-frequently-used":
+        print(f"eviction_policy is {policy}, so hit counts are not recorded; ordering by recency instead")
+        order = "recent"
+    if order == "hits":
+        column = "access_count DESC, store_time DESC"
+    elif policy == "least-recently-used":
+        column = "access_time DESC"
+    else:
+        column = "store_time DESC"
+
+    now = time.time()
+    excluded = " ".join(f"AND substr(key, 1, {len(prefix)}) != '{prefix}'" for prefix in EXCLUDED_PREFIXES)
+    candidates = _rows(
+        cache,
+        f"AND substr(key, 1, {len(BODY_KEY_PREFIX)}) != '{BODY_KEY_PREFIX}' {excluded} "
+        f"AND (expire_time IS NULL OR expire_time > ?) ORDER BY {column}",
+        (now,),
+    )
+
+    exported = set()
+    written = entries = 0
+    with gzip.open(path, "wb") as f:
+        _write_frame(f, orjson.dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "created_at": now}))
+
+        def write(key: str, value, expire_time: Optional[float]):
+            nonlocal written, entries
+            kind, data = _encode(value)
+            expire_in = None if expire_time is None else expire_time - now
+            _write_frame(f, orjson.dumps({"key": key, "kind": kind, "expire_in": expire_in}))
+            _write_frame(f, data)
+            exported.add(key)
+            written += len(data)
+            entries += 1
+
+        primaries = 0
+        for key, *_ in candidates:
+            if limit is not None and primaries >= limit or max_bytes is not None and written >= max_bytes:
+                break
+            value, expire_time = _read_entry(cache, key)
+            if value is None:
+                continue
+            dependencies = []
+            for dependency in _dependencies(cache, key, value):
+                if dependency in exported:
+                    continue
+                dependency_value, dependency_expire = _read_entry(cache, dependency)
+                if dependency_value is None:
+                    # 본문이 이미 만료된 항목은 가져가도 쓸 수 없으므로 건너뜁니다.
+                    break
+                dependencies.append((dependency, dependency_value, dependency_expire))
+            else:
+                # 참조하는 항목을 먼저 기록하여 import 가 중간에 끊겨도 본문 없는 항목이 생기지 않도록 합니다.
+                for dependency in dependencies:
+                    write(*dependency)
+                write(key, value, expire_time)
+                primaries += 1
+    print(f"Exported {primaries} entries ({entries} with dependencies, {written / 2 ** 20:.1f}MB) to {path}")
+    return entries
+
+
+def import_snapshot(cache, path: str, overwrite: bool, batch: int = 500) -> int:
+    loaded = skipped = 0
+    with gzip.open(path, "rb") as f:
+        header = orjson.loads(_read_frame(f) or b"{}")
+        if header.get("format") != SNAPSHOT_FORMAT or header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} cache snapshot")
+        # 스냅샷을 만든 뒤 지난 시간만큼 만료 시간을 줄입니다.
+        elapsed = time.time() - header["created_at"]
+        done = False
+        while not done:
+            # batch 개씩 한 트랜잭션으로 기록하여 항목마다 커밋하지 않도록 합니다.
+            with cache.transact():
+                for _ in range(batch):
+                    meta = _read_frame(f)
+                    if meta is None:
+                        done = True
+                        break
+                    entry = orjson.loads(meta)
+                    data = _read_frame(f)
+                    expire = None if entry["expire_in"] is None else entry["expire_in"] - elapsed
+                    if expire is not None and expire <= 0:
+                        skipped += 1
+                        continue
+                    value = _decode(entry["kind"], data)
+                    if overwrite:
+                        cache.set(entry["key"], value, expire=expire)
+                    elif not cache.add(entry["key"], value, expire=expire):
+                        skipped += 1
+                        continue
+                    loaded += 1
+    print(f"Imported {loaded} entries from {path} ({skipped} expired or already present)")
+    return loaded
+
+
+def vacuum(cache):
+    import warnings
+
+    with warnings.catch_warnings(record=True) as found:
+        warnings.simplefilter("always")
+        cache.check(fix=True)
+    for warning in found:
+        print(f"Fixed: {warning.message}")
+    before = os.path.getsize(os.path.join(cache.directory, "cache.db"))
+    connection = sqlite3.connect(os.path.join(cache.directory, "cache.db"), timeout=60)
+    try:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    after = os.path.getsize(os.path.join(cache.directory, "cache.db"))
+    print(f"Vacuumed cache.db: {before / 2 ** 20:.1f}MB -> {after / 2 ** 20:.1f}MB")
+
+
+def purge(cache, domain: str, dry_run: bool) -> int:
+    domain = domain.lower().removeprefix("www.")
+    keys = [row[0] for row in _rows(cache) if matches_domain(key_domain(row[0]), domain)]
+    if not dry_run:
+        for key in keys:
+            cache.delete(key)
+    print(f"{'Would purge' if dry_run else 'Purged'} {len(keys)} entries for {domain}")
+    return len(keys)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline maintenance for the oracle_search disk cache.")
+    parser.add_argument("--cache-dir", help="캐시 디렉터리. 지정하지 않으면 설정의 disk_cache.cache_dir 를 사용합니다")
+    commands = parser.add_subparsers(dest="command", required=True)
+    stats_parser = commands.add_parser("stats")
+    stats_parser.add_argument("--top", type=int, default=20)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--order", choices=("recent", "hits"), default="recent")
+    export_parser.add_argument("--limit", type=int, help="내보낼 최대 항목 수(참조하는 본문 제외)")
+    export_parser.add_argument("--max-mb", type=float, help="내보낼 최대 크기(MB, 압축 전)")
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--overwrite", action="store_true", help="이미 있는 항목도 덮어씁니다")
+    commands.add_parser("expire")
+    commands.add_parser("vacuum")
+    purge_parser = commands.add_parser("purge")
+    purge_parser.add_argument("domain")
+    purge_parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    cache = open_cache(args.cache_dir or default_cache_dir())
+    try:
+        if args.command == "stats":
+            stats(cache, args.top)
+        elif args.command == "export":
+            max_bytes = int(args.max_mb * 2 ** 20) if args.max_mb else None
+            export(cache, args.path, args.order, args.limit, max_bytes)
+        elif args.command == "import":
+            import_snapshot(cache, args.path, args.overwrite)
+        elif args.command == "expire":
+            print(f"Removed {cache.expire()} expired entries")
+        elif args.command == "vacuum":
+            vacuum(cache)
+        elif args.command == "purge":
+            purge(cache, args.domain, args.dry_run)
+    finally:
+        cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
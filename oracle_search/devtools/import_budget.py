@@ -0,0 +1,118 @@
+"""
+주요 진입점의 import 시간을 `python -X importtime` 으로 측정하고 예산을 넘는지 확인합니다.
+
+사용법:
+    python -m oracle_search.devtools.import_budget [--scale 1.5]
+"""
+import argparse
+import re
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+IMPORTTIME_REGEX = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+HEAVY_MODULES = (
+    "selenium",
+    "trafilatura",
+    "readability",
+    "htmldate",
+    "bs4",
+    "html2text",
+    "lxml",
+    "youtube_transcript_api",
+    "pypdf",
+    "langchain_openai",
+    "langchain_google_community",
+)
+
+
+@dataclass
+class EntryPoint:
+    module: str
+    budget_ms: float
+    forbidden: Tuple[str, ...] = HEAVY_MODULES
+
+
+@dataclass
+class Measurement:
+    entry_point: EntryPoint
+    cumulative_ms: float
+    heavy_imports: List[str] = field(default_factory=list)
+
+    @property
+    def over_budget(self) -> bool:
+        return self.cumulative_ms > self.entry_point.budget_ms
+
+    @property
+    def ok(self) -> bool:
+        return not self.over_budget and not self.heavy_imports
+
+
+ENTRY_POINTS = [
+    EntryPoint("oracle_search", budget_ms=150),
+    EntryPoint("oracle_search.web_loader.fetchers.base", budget_ms=600),
+    EntryPoint("oracle_search.web_loader.web_loader", budget_ms=600),
+    EntryPoint("oracle_search.web_loader.search", budget_ms=600),
+    EntryPoint("oracle_search.chain.base", budget_ms=400),
+    EntryPoint("oracle_search.tools.web_tools", budget_ms=1500),
+    EntryPoint("oracle_search.langgraph.oracle_search", budget_ms=2500),
+]
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """
+    -X importtime 출력에서 모듈별 누적 import 시간(ms)을 읽습니다.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if match := IMPORTTIME_REGEX.match(line):
+            cumulative[match.group(4)] = int(match.group(2)) / 1000
+    return cumulative
+
+
+def measure(entry_point: EntryPoint, repeat: int = 3) -> Measurement:
+    """
+    새 인터프리터에서 entry_point 를 import 하여 누적 시간을 측정합니다. 디스크 캐시 영향을 줄이기 위해 최솟값을 사용합니다.
+    """
+    timings = []
+    imported = {}
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {entry_point.module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imported = parse_importtime(completed.stderr)
+        timings.append(imported.get(entry_point.module, 0.0))
+
+    heavy = sorted(
+        module
+        for module in entry_point.forbidden
+        if any(name == module or name.startswith(f"{module}.") for name in imported)
+    )
+    return Measurement(entry_point, cumulative_ms=min(timings), heavy_imports=heavy)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check import-time budgets of oracle_search entry points.")
+    parser.add_argument("--scale", type=float, default=1.0, help="모든 예산에 곱할 배율 (느린 CI 머신용)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for entry_point in ENTRY_POINTS:
+        scaled = EntryPoint(entry_point.module, entry_point.budget_ms * args.scale, entry_point.forbidden)
+        result = measure(scaled, repeat=args.repeat)
+        status = "ok" if result.ok else "FAIL"
+        print(f"[{status}] {scaled.module}: {result.cumulative_ms:.1f} ms (budget {scaled.budget_ms:.0f} ms)")
+        if result.heavy_imports:
+            print(f"       eagerly imports: {', '.join(result.heavy_imports)}")
+        failed |= not result.ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
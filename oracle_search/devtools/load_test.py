@@ -0,0 +1,473 @@
+"""
+LangGraph 파이프라인(get_graph)을 가짜 LLM, 가짜 Google 검색, 페이지 재생 서버에 연결하여 동시 실행 부하를 측정합니다.
+
+- 가짜 LLM 서버는 OpenAI chat completions 형식으로 응답하며, 요청의 json_schema 에 맞는 JSON 을 만들어 돌려줍니다.
+- 가짜 검색은 재생 서버의 페이지 링크를 돌려주며, --distinct-pages 로 같은 페이지가 다시 나올 비율(캐시 적중)을 조절합니다.
+- 재생 서버는 --pages 디렉터리의 *.html 을 돌려가며 응답하고, 지정하지 않으면 합성한 페이지를 사용합니다.
+
+가짜 서버는 별도 스레드의 이벤트 루프에서 실행되므로 측정하는 이벤트 루프의 지연에 섞이지 않습니다.
+설정 파일과 디스크 캐시는 임시 디렉터리에 새로 만듭니다.
+
+--http 를 주면 그래프를 직접 실행하지 않고 HTTP 서비스(oracle_search.server)를 같은 이벤트 루프에 띄워 /v1/oracle 의 SSE 로 실행합니다.
+서비스의 admission control 이 거절한 요청은 errors 에 "HTTP 503", "HTTP 429" 로 기록됩니다.
+
+사용법:
+    python -m oracle_search.devtools.load_test --runs 50 --concurrency 10 [--llm-latency 0.5] [--json report.json]
+    python -m oracle_search.devtools.load_test --http --runs 50 --concurrency 20 --server-concurrency 8 --server-queue 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+from aiohttp import ClientSession, web
+
+VOCABULARY = [
+    "python", "asyncio", "event", "loop", "coroutine", "파이썬", "비동기", "성능", "캐시", "검색",
+    "latency", "throughput", "queue", "worker", "thread", "process", "memory", "graph", "node", "browser",
+]
+FIELD_VALUES = {"language": ["en", "ko", "ja"], "recent_days": [-1, -1, 30, 365]}
+
+
+def example_from_schema(schema: dict, defs: Optional[dict] = None, name: str = "", items: int = 4) -> Any:
+    """
+    JSON schema 에 맞는 임의의 값을 만듭니다. 문자열은 VOCABULARY 의 단어를 섞어 만들고, 배열은 items 개로 채웁니다.
+    """
+    defs = defs if defs is not None else schema.get("$defs", {})
+    if "$ref" in schema:
+        return example_from_schema(defs[schema["$ref"].split("/")[-1]], defs, name, items)
+    for key in ("anyOf", "oneOf", "allOf"):
+        if key in schema:
+            options = [option for option in schema[key] if option.get("type") != "null"] or schema[key]
+            return example_from_schema(options[0], defs, name, items)
+    if name in FIELD_VALUES:
+        return random.choice(FIELD_VALUES[name])
+    kind = schema.get("type", "object")
+    if kind == "object":
+        return {key: example_from_schema(value, defs, key, items) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}), defs, name, items) for _ in range(items)]
+    if kind == "integer":
+        return random.randint(1, 100)
+    if kind == "number":
+        return random.random()
+    if kind == "boolean":
+        return random.random() < 0.5
+    return " ".join(random.sample(VOCABULARY, 3))
+
+
+def synthetic_page(index: int, paragraphs: int = 30) -> str:
+    body = "".join(
+        f"<h2>Section {section}</h2><p>{' '.join(random.choices(VOCABULARY, k=80))}</p>" for section in range(paragraphs)
+    )
+    return f"<html><head><title>Page {index}</title></head><body><article>{body}</article></body></html>"
+
+
+def fake_chat_app(latency: float, completion_tokens: int, queries: int) -> web.Application:
+    async def completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(latency)
+        response_format = body.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            content = json.dumps(example_from_schema(response_format["json_schema"]["schema"], items=queries))
+        else:
+            content = " ".join(random.choices(VOCABULARY, k=completion_tokens))
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        return web.json_response(
+            {
+                "id": f"chatcmpl-{random.getrandbits(32):x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+        )
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+def replay_app(pages: List[str], latency: float) -> web.Application:
+    async def page(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        index = int(request.match_info["index"])
+        return web.Response(text=pages[index % len(pages)], content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/page/{index}", page)
+    return app
+
+
+class FakeSearchEngine:
+    """
+    GoogleSearchAPIWrapper.results 와 같은 형식으로 재생 서버의 링크를 돌려줍니다. executor 스레드에서 호출됩니다.
+    """
+
+    def __init__(self, base_url: str, latency: float, distinct_pages: int):
+        self.base_url = base_url
+        self.latency = latency
+        self.distinct_pages = distinct_pages
+
+    def results(self, query: str, num_results: int, search_params: Optional[dict] = None) -> List[Dict[str, str]]:
+        time.sleep(self.latency)
+        return [
+            {
+                "link": f"{self.base_url}/page/{random.randrange(self.distinct_pages)}",
+                "title": query,
+                "snippet": " ".join(random.choices(VOCABULARY, k=20)),
+            }
+            for _ in range(num_results)
+        ]
+
+
+class FakeGoogleSearch:
+    def __init__(self, search_engine: FakeSearchEngine):
+        self.search_engine = search_engine
+
+
+class BackgroundServers:
+    """
+    가짜 서버들을 별도 스레드의 이벤트 루프에서 실행합니다.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="load-test-servers", daemon=True)
+        self.runners: List[web.AppRunner] = []
+
+    def start(self, apps: List[web.Application]) -> List[int]:
+        self.thread.start()
+        return asyncio.run_coroutine_threadsafe(self._start(apps), self.loop).result()
+
+    async def _start(self, apps: List[web.Application]) -> List[int]:
+        ports = []
+        for app in apps:
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            self.runners.append(runner)
+            ports.append(site._server.sockets[0].getsockname()[1])
+        return ports
+
+    def stop(self):
+        async def cleanup():
+            for runner in self.runners:
+                await runner.cleanup()
+
+        asyncio.run_coroutine_threadsafe(cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def child_process_count() -> int:
+    try:
+        import psutil
+
+        return len(psutil.Process().children(recursive=True))
+    except ImportError:
+        pass
+    # psutil 이 없으면 /proc 에서 부모 pid 를 따라가며 셉니다. (Linux)
+    parents = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents[int(stat.parent.name)] = int(fields[1])
+    descendants, frontier = set(), {os.getpid()}
+    while frontier:
+        frontier = {pid for pid, parent in parents.items() if parent in frontier} - descendants
+        descendants |= frontier
+    return len(descendants)
+
+
+def rss_mb() -> float:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # /proc 이 없으면 최대 RSS 를 사용합니다. (macOS 는 byte, Linux 는 KB 단위)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+class Monitor:
+    """
+    interval 초마다 깨어나며 이벤트 루프 지연과 스레드 수, 자식 프로세스 수, RSS 를 기록합니다.
+    """
+
+    def __init__(self, interval: float = 0.05, resource_every: int = 10):
+        self.interval = interval
+        self.resource_every = resource_every
+        self.lags: List[float] = []
+        self.threads: List[int] = []
+        self.processes: List[int] = []
+        self.rss: List[float] = []
+
+    async def run(self):
+        ticks = 0
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+            if ticks % self.resource_every == 0:
+                self.threads.append(threading.active_count())
+                self.processes.append(child_process_count())
+                self.rss.append(rss_mb())
+            ticks += 1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float], scale: float = 1.0) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": percentile(values, 0.5) * scale,
+        "p90": percentile(values, 0.9) * scale,
+        "p99": percentile(values, 0.99) * scale,
+        "max": max(values, default=0.0) * scale,
+    }
+
+
+def write_config(directory: str, args) -> str:
+    config = {
+        "dev": {
+            "gpt": {
+                "models": {
+                    "gpt35": "fake-gpt-3.5",
+                    "gpt4": "fake-gpt-4",
+                    "gpt4o": "fake-gpt-4o",
+                    "gpt4o_mini": "fake-gpt-4o-mini",
+                }
+            },
+            "disk_cache": {"cache_dir": os.path.join(directory, "cache")},
+            "google_search": {"google_api_key": "load-test", "custom_search_engine_id": "load-test"},
+            "logging": {"level": args.log_level},
+            "web_fetch": {"search_timeout": args.search_timeout},
+        }
+    }
+    if args.http:
+        config["dev"]["server"] = {
+            "max_concurrency": args.server_concurrency or args.concurrency,
+            "max_queue": args.runs if args.server_queue is None else args.server_queue,
+            "client_rate": 10 ** 9,
+            "client_burst": 10 ** 9,
+            "client_concurrency": 10 ** 9,
+        }
+    if not args.respect_llm_limits:
+        config["dev"]["llm_scheduler"] = {"default_rpm": 10 ** 9, "default_tpm": 10 ** 12}
+    path = os.path.join(directory, "config.yaml")
+    with open(path, "w") as f:
+        yaml.safe_dump(config, f)
+    return path
+
+
+class HTTPStatusError(Exception):
+    pass
+
+
+async def astream_http(session: ClientSession, base_url: str, inputs: Dict[str, Any]):
+    """
+    /v1/oracle 의 SSE 를 astream_oracle 과 같은 형식의 이벤트로 바꿔 내보냅니다.
+    """
+    async with session.post(f"{base_url}/v1/oracle", json={"task_description": inputs["task_description"]}) as response:
+        if response.status != 200:
+            raise HTTPStatusError(f"HTTP {response.status}")
+        name = None
+        async for line in response.content:
+            line = line.decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                name = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if name == "error":
+                    raise RuntimeError(data["error"])
+                yield {**data, "event": name}
+
+
+async def run_load(args, search_engine: FakeSearchEngine) -> Dict[str, Any]:
+    from oracle_search.langgraph.oracle_search import astream_oracle, get_graph
+
+    runner = session = None
+    if args.http:
+        from oracle_search.server import create_app
+
+        runner = web.AppRunner(create_app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        session = ClientSession()
+
+        def astream(inputs):
+            return astream_http(session, base_url, inputs)
+    else:
+        graph = get_graph()
+
+        def astream(inputs):
+            return astream_oracle(inputs, graph)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    totals: List[float] = []
+    nodes: Dict[str, List[float]] = defaultdict(list)
+    documents: List[int] = []
+    errors: Dict[str, int] = defaultdict(int)
+
+    async def run_once(index: int):
+        async with semaphore:
+            inputs = {
+                "url": None,
+                "task_description": f"{' '.join(random.sample(VOCABULARY, 4))} #{index}",
+                "total_cost": 0,
+            }
+            started = last = time.perf_counter()
+            count = 0
+            try:
+                async for event in astream(inputs):
+                    if event["event"] == "document":
+                        count += 1
+                    elif event["event"] == "node_end":
+                        now = time.perf_counter()
+                        nodes[event["node"]].append(now - last)
+                        last = now
+            except Exception as e:
+                errors[str(e) if isinstance(e, HTTPStatusError) else e.__class__.__name__] += 1
+                return
+            totals.append(time.perf_counter() - started)
+            documents.append(count)
+
+    monitor = Monitor()
+    monitor_task = asyncio.create_task(monitor.run())
+    started = time.perf_counter()
+    await asyncio.gather(*(run_once(index) for index in range(args.runs)))
+    elapsed = time.perf_counter() - started
+    monitor_task.cancel()
+    if runner is not None:
+        await session.close()
+        await runner.cleanup()
+
+    return {
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "completed": len(totals),
+        "errors": dict(errors),
+        "seconds": elapsed,
+        "throughput": len(totals) / elapsed if elapsed else 0.0,
+        "documents_per_run": sum(documents) / len(documents) if documents else 0.0,
+        "latency": summarize(totals),
+        "nodes": {node: summarize(values) for node, values in nodes.items()},
+        "loop_lag_ms": summarize(monitor.lags, 1000),
+        "threads_max": max(monitor.threads, default=threading.active_count()),
+        "processes_max": max(monitor.processes, default=0),
+        "rss_mb_max": max(monitor.rss, default=rss_mb()),
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(
+        f"runs={report['runs']} concurrency={report['concurrency']} completed={report['completed']} "
+        f"errors={report['errors'] or 0} seconds={report['seconds']:.1f} "
+        f"throughput={report['throughput']:.2f} runs/s documents/run={report['documents_per_run']:.1f}"
+    )
+    print(f"{'':<12} {'count':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    rows = [("total (s)", report["latency"])] + [(f"{node} (s)", stats) for node, stats in report["nodes"].items()]
+    rows.append(("loop lag(ms)", report["loop_lag_ms"]))
+    for name, stats in rows:
+        print(
+            f"{name:<12} {stats['count']:>6} {stats['p50']:>8.3f} {stats['p90']:>8.3f} "
+            f"{stats['p99']:>8.3f} {stats['max']:>8.3f}"
+        )
+    print(
+        f"threads max={report['threads_max']} child processes max={report['processes_max']} "
+        f"rss max={report['rss_mb_max']:.0f}MB"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the oracle LangGraph pipeline against local fakes.")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="가짜 LLM 응답 지연(초)")
+    parser.add_argument("--llm-tokens", type=int, default=200, help="가짜 LLM 이 보고하는 completion 토큰 수")
+    parser.add_argument("--queries", type=int, default=4, help="가짜 LLM 이 만드는 검색 쿼리 수")
+    parser.add_argument("--search-latency", type=float, default=0.2, help="가짜 검색 응답 지연(초)")
+    parser.add_argument("--page-latency", type=float, default=0.1, help="재생 서버 응답 지연(초)")
+    parser.add_argument("--pages", help="재생할 *.html 페이지가 있는 디렉터리")
+    parser.add_argument("--distinct-pages", type=int, default=10 ** 9, help="검색 결과로 나올 서로 다른 페이지 수")
+    parser.add_argument("--search-timeout", type=float, default=60)
+    parser.add_argument("--respect-llm-limits", action="store_true", help="llm_scheduler 의 기본 RPM/TPM 한도를 적용합니다")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--http", action="store_true", help="HTTP 서비스를 띄워 SSE 로 실행합니다")
+    parser.add_argument("--server-concurrency", type=int, help="--http 에서 서비스의 max_concurrency (기본값 --concurrency)")
+    parser.add_argument("--server-queue", type=int, help="--http 에서 서비스의 max_queue (기본값 --runs)")
+    parser.add_argument("--json", help="보고서를 JSON 으로 저장할 경로")
+    args = parser.parse_args(argv)
+
+    if args.pages:
+        pages = [path.read_text(errors="replace") for path in sorted(Path(args.pages).glob("*.html"))]
+        if not pages:
+            print(f"No *.html pages in {args.pages}")
+            return 1
+    else:
+        pages = [synthetic_page(index) for index in range(20)]
+
+    servers = BackgroundServers()
+    llm_port, replay_port = servers.start(
+        [fake_chat_app(args.llm_latency, args.llm_tokens, args.queries), replay_app(pages, args.page_latency)]
+    )
+    with tempfile.TemporaryDirectory(prefix="oracle-load-test-") as directory:
+        os.environ["EX_MACHINA_CONFIG"] = write_config(directory, args)
+        os.environ["EX_MACHINA_ENV"] = "dev"
+        os.environ["OPENAI_API_BASE"] = os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "load-test")
+        os.environ.setdefault("TMDB_ACCESS_TOKEN", "load-test")
+
+        from oracle_search import ExMachina, Shared
+
+        ExMachina.bootstrap()
+        search_engine = FakeSearchEngine(f"http://127.0.0.1:{replay_port}", args.search_latency, args.distinct_pages)
+        Shared.replace("google_search", FakeGoogleSearch(search_engine))
+        try:
+            report = asyncio.run(run_load(args, search_engine))
+        finally:
+            Shared.disk_cache.close()
+            servers.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+lxml 기반 마크다운 변환기와 이전 html2text 기반 html_to_markdown 의 속도와 출력 차이를 비교합니다.
+
+저장해 둔 HTML 페이지(*.html) 디렉터리를 fixture 로 사용하며, 지정하지 않으면 합성한 페이지를 사용합니다.
+
+사용법:
+    python -m oracle_search.devtools.markdown_benchmark [--fixtures DIR] [--repeat 5]
+"""
+import argparse
+import difflib
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from oracle_search.web_loader.markdown import convert, iter_markdown
+
+
+def html2text_to_markdown(html: str, include_images: bool = False, include_links: bool = True) -> str:
+    """
+    이전 html_to_markdown 구현입니다. 비교 기준으로만 사용합니다.
+    """
+    import html2text
+
+    h = html2text.HTML2Text()
+    h.ignore_links = not include_links
+    h.ignore_images = not include_images
+    h.skip_internal_links = True
+    h.bypass_tables = False
+    h.mark_code = True
+    h.escape_snob = True
+    h.body_width = 0
+    return "\n".join([line.strip() for line in h.handle(html).split("\n")])
+
+
+def synthetic_page(sections: int = 400) -> str:
+    body = []
+    for index in range(sections):
+        body.append(
+            f"<h2>Section {index}</h2>"
+            f"<p>Paragraph {index} with <b>bold</b>, <i>italic</i>, <code>code()</code> and "
+            f"<a href='https://example.com/{index}'>a link</a>.</p>"
+            f"<ul><li>first item</li><li>second <a href='#s{index}'>item</a></li></ul>"
+            f"<table><tr><th>key</th><th>value</th></tr><tr><td>{index}</td><td>value {index}</td></tr></table>"
+            f"<pre>for i in range({index}):\n    print(i)</pre>"
+        )
+    return f"<html><head><style>p {{}}</style></head><body>{''.join(body)}</body></html>"
+
+
+def load_fixtures(directory: str) -> List[Tuple[str, str]]:
+    return [(path.name, path.read_text(errors="replace")) for path in sorted(Path(directory).glob("*.html"))]
+
+
+def best_time(func: Callable[[str], str], html: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(html)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def first_line_time(html: str) -> float:
+    started = time.perf_counter()
+    next(iter_markdown(html, include_links=True), None)
+    return time.perf_counter() - started
+
+
+def compare(name: str, html: str, repeat: int) -> Dict[str, float]:
+    legacy = html2text_to_markdown(html)
+    current = convert(html, include_links=True)
+    return {
+        "name": name,
+        "kb": len(html.encode("utf-8")) / 1024,
+        "html2text_ms": best_time(html2text_to_markdown, html, repeat) * 1000,
+        "lxml_ms": best_time(lambda page: convert(page, include_links=True), html, repeat) * 1000,
+        "first_line_ms": first_line_time(html) * 1000,
+        # 빈 줄 차이는 무시하고 내용이 얼마나 같은지 비교합니다.
+        "similarity": difflib.SequenceMatcher(
+            None,
+            [line for line in legacy.splitlines() if line],
+            [line for line in current.splitlines() if line],
+            autojunk=False,
+        ).ratio(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the lxml markdown converter against html2text.")
+    parser.add_argument("--fixtures", help="저장해 둔 *.html 페이지가 있는 디렉터리")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else [("synthetic", synthetic_page())]
+    if not fixtures:
+        print(f"No *.html fixtures in {args.fixtures}")
+        return 1
+
+    print(f"{'fixture':<32} {'KB':>8} {'html2text':>10} {'lxml':>8} {'first':>8} {'speedup':>8} {'similar':>8}")
+    for name, html in fixtures:
+        result = compare(name, html, args.repeat)
+        print(
+            f"{result['name'][:32]:<32} {result['kb']:>8.1f} {result['html2text_ms']:>8.1f}ms "
+            f"{result['lxml_ms']:>6.1f}ms {result['first_line_ms']:>6.1f}ms "
+            f"{result['html2text_ms'] / max(result['lxml_ms'], 1e-6):>7.1f}x {result['similarity']:>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+OracleState 를 노드가 끝날 때마다 SQLite 에 저장하는 checkpointer 입니다.
+
+search_results 처럼 본문이 큰 WebContent / YoutubeTranscript 는 본문을 공유 디스크 캐시에 저장하고
+checkpoint 에는 메타데이터와 body_ref 만 기록합니다. 같은 본문은 여러 checkpoint 에 걸쳐 한 번만 저장되며,
+checkpoint 에서 복원한 문서는 page_content 에 접근할 때 본문을 읽습니다.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Tuple, Union, TYPE_CHECKING
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from oracle_search import Shared
+from oracle_search.models.documents import BaseDocument, WebContent, YoutubeTranscript
+
+if TYPE_CHECKING:
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+DOCUMENT_REF_KEY = "__document__"
+DOCUMENT_TYPES = {cls.__name__: cls for cls in (WebContent, YoutubeTranscript)}
+
+
+def document_ref(document: Union[WebContent, YoutubeTranscript]) -> dict:
+    document.persist(Shared.checkpoint.document_ttl)
+    return {
+        DOCUMENT_REF_KEY: type(document).__name__,
+        "source": document.source,
+        "metadata": document.metadata,
+        "body_ref": document.body_ref,
+    }
+
+
+def _to_refs(value: Any) -> Any:
+    if isinstance(value, BaseDocument):
+        return document_ref(value)
+    if isinstance(value, dict):
+        return {key: _to_refs(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_refs(item) for item in value)
+    return value
+
+
+def _from_refs(value: Any) -> Any:
+    if isinstance(value, dict):
+        if DOCUMENT_REF_KEY in value:
+            data = dict(value)
+            return DOCUMENT_TYPES[data.pop(DOCUMENT_REF_KEY)].model_validate(data)
+        return {key: _from_refs(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_from_refs(item) for item in value)
+    return value
+
+
+class DocumentRefSerializer(JsonPlusSerializer):
+    """
+    checkpoint 와 pending write 를 직렬화하기 전에 문서를 캐시 참조로 바꾸고, 읽을 때 다시 문서로 복원합니다.
+    """
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        return super().dumps_typed(_to_refs(obj))
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return _from_refs(super().loads_typed(data))
+
+
+@asynccontextmanager
+async def sqlite_checkpointer(path: Optional[str] = None) -> AsyncIterator["AsyncSqliteSaver"]:
+    """
+    checkpoint.path (기본값 checkpoints.sqlite) 의 SQLite 파일을 쓰는 checkpointer 를 엽니다.
+    """
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with aiosqlite.connect(path or Shared.checkpoint.path) as conn:
+        yield AsyncSqliteSaver(conn, serde=DocumentRefSerializer())
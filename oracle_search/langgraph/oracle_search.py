@@ -1,16 +1,30 @@
 import operator
-from typing import Annotated, Optional, Union, TypedDict
+import time
+from typing import Annotated, Any, AsyncIterator, Dict, List, Optional, Union, TypedDict
 
 from langchain_community.callbacks import get_openai_callback
+from langchain_core.callbacks import adispatch_custom_event
 from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.constants import END
 from langgraph.graph import add_messages, StateGraph
 from pydantic import BaseModel
 
-from App import fetch_url_content
-from oracle_search.chain.base import get_refined_request, get_search_query
+from oracle_search import Shared
+from oracle_search.chain.base import aget_refined_request, aget_search_query
+from oracle_search.chain.model_router import run_budget_scope
+from oracle_search.models.base import SearchQuery
 from oracle_search.models.documents import WebContent, YoutubeTranscript
-from oracle_search.web_loader.search import aget_search_full_contents
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.search import astream_search_full_contents
+from oracle_search.web_loader.web_loader import fetch_url_content
+
+logger = setup_logger()
+
+
+class ThreadNotFoundError(ValueError):
+    pass
 
 
 class OracleState(TypedDict):
@@ -18,17 +32,18 @@ class OracleState(TypedDict):
     task_description: str
     chat_history: Annotated[list[BaseMessage], add_messages]
     dp_history: Annotated[list[BaseModel], operator.add]
+    search_queries: Optional[list[SearchQuery]]
     search_results: Optional[list[Union[WebContent, YoutubeTranscript]]]
     total_cost: Annotated[float, operator.add]
 
 
-async def begin(state: OracleState):
-    with get_openai_callback() as cb:
+async def begin(state: OracleState, config: RunnableConfig):
+    with get_openai_callback() as cb, run_budget_scope(state, config):
         if state['url'] is None:
             task_description = state['task_description']
         else:
             content = await fetch_url_content(state['url'])
-            task_description = get_refined_request(content, state['task_description']).redefined_request
+            task_description = (await aget_refined_request(content, state['task_description'])).redefined_request
     return {
         "task_description": task_description,
         "chat_history": [HumanMessage(content=task_description, additional_kwargs={"name": "HUMAN"})],
@@ -37,33 +52,57 @@ async def begin(state: OracleState):
     }
 
 
-async def generate_query_and_search(state: OracleState):
-    with get_openai_callback() as cb:
-        query_res = get_search_query(state['chat_history'])
+async def generate_search_query(state: OracleState, config: RunnableConfig):
+    with get_openai_callback() as cb, run_budget_scope(state, config):
+        query_res = await aget_search_query(state['chat_history'])
         query_message = query_res['raw']
         query_message.additional_kwargs['name'] = 'QUERYGENERATOR'
         query_parsed = query_res['parsed']
+    return {
+        "chat_history": [query_message],
+        "dp_history": [query_parsed],
+        "search_queries": query_parsed.queries,
+        'total_cost': cb.total_cost
+    }
+
+
+async def search(state: OracleState, config: RunnableConfig):
+    await adispatch_custom_event("search_queries", {"queries": state['search_queries']}, config=config)
 
-        search_results = await aget_search_full_contents(query_parsed.queries)
-        mock_search_message = HumanMessage(content=f"{len(search_results)} web contents are stored in Long Term Memory",
-                                           additional_kwargs={"name": "SEARCH"})
+    # 검색 결과와 문서가 준비될 때마다 custom event 로 내보내 astream_events 를 쓰는 쪽에서 진행 상황을 볼 수 있게 합니다.
+    search_results = []
+    events = astream_search_full_contents(
+        state['search_queries'], timeout=Shared.web_fetch.search_timeout, request=state['task_description']
+    )
+    async for event in events:
+        await adispatch_custom_event(event["event"], event, config=config)
+        if event["event"] == "document":
+            # 그래프가 끝날 때까지 모든 본문을 메모리에 들고 있지 않도록 디스크 캐시로 내리고, 필요할 때 다시 읽습니다.
+            search_results.append(await event["content"].aoffload())
+    mock_search_message = HumanMessage(content=f"{len(search_results)} web contents are stored in Long Term Memory",
+                                       additional_kwargs={"name": "SEARCH"})
     return {
-        "chat_history": [query_message, mock_search_message],
-        "dp_history": [query_parsed, mock_search_message],
+        "chat_history": [mock_search_message],
+        "dp_history": [mock_search_message],
         "search_results": search_results,
-        'total_cost': cb.total_cost
     }
 
 
-def get_graph():
+def get_graph(checkpointer: Optional[BaseCheckpointSaver] = None):
+    """
+    checkpointer 를 지정하면 노드가 끝날 때마다 상태가 저장되어, 실패한 실행을 마지막으로 끝난 노드 다음부터 이어갈 수 있습니다.
+    쿼리 생성(LLM 호출)과 검색을 별도 노드로 두어 검색이 실패해도 쿼리 생성을 다시 하지 않습니다.
+    """
     graph = StateGraph(OracleState)
     graph.add_node("Begin", begin)
-    graph.add_node("Search", generate_query_and_search)
-    graph.add_edge("Begin", "Search")
+    graph.add_node("Query", generate_search_query)
+    graph.add_node("Search", search)
+    graph.add_edge("Begin", "Query")
+    graph.add_edge("Query", "Search")
     graph.add_edge("Search", END)
     graph.set_entry_point("Begin")
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
     # graph.add_conditional_edges(
     #     "AnswerWithLongTermMemory",
     #     chat_router,
@@ -73,3 +112,74 @@ def get_graph():
     #         "plan": "Refine",
     #     },
     # )
+
+
+async def astream_oracle(
+    inputs: Optional[OracleState], graph=None, config: Optional[RunnableConfig] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    그래프를 실행하면서 노드가 보낸 custom event 와 노드 종료 시점의 출력을 순서대로 내보냅니다.
+
+    Yields:
+        {"event": <custom event 이름>, **data} 또는 {"event": "node_end", "node": str, "output": dict}.
+    """
+    graph = graph or get_graph()
+    nodes = {name for name in graph.nodes if not name.startswith("__")}
+    # 모델 라우터가 실행 단위 시간 예산(max_seconds)을 계산할 수 있도록 실행 시작 시각을 넣습니다.
+    config = dict(config or {})
+    config["configurable"] = {"started_at": time.time(), **config.get("configurable", {})}
+    async for event in graph.astream_events(inputs, config, version="v2"):
+        if event["event"] == "on_custom_event":
+            yield {**event["data"], "event": event["name"]}
+            continue
+        # 노드 안에서 실행된 chain 의 on_chain_end 는 건너뛰고 노드 자체의 종료만 내보냅니다.
+        is_node = event["name"] in nodes and event["metadata"].get("langgraph_node") == event["name"]
+        if event["event"] == "on_chain_end" and is_node:
+            yield {"event": "node_end", "node": event["name"], "output": event["data"].get("output")}
+
+
+def thread_config(thread_id: str, checkpoint_id: Optional[str] = None) -> RunnableConfig:
+    configurable = {"thread_id": thread_id}
+    if checkpoint_id is not None:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+async def aresume_oracle(graph, thread_id: str) -> OracleState:
+    """
+    thread_id 의 마지막 checkpoint 에서 실행을 이어갑니다. 이미 끝난 실행이면 저장된 상태를 그대로 반환합니다.
+    checkpoint 가 없는 thread 이면 ThreadNotFoundError 를 발생시킵니다.
+    """
+    config = thread_config(thread_id)
+    snapshot = await graph.aget_state(config)
+    if snapshot.created_at is None:
+        raise ThreadNotFoundError(f"No checkpoints for thread {thread_id}")
+    if not snapshot.next:
+        return snapshot.values
+    logger.info(f"Resuming thread {thread_id} at {', '.join(snapshot.next)}")
+    return await graph.ainvoke(None, config)
+
+
+async def areplay_oracle(graph, thread_id: str, checkpoint_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    저장된 checkpoint 부터 이후 노드를 다시 실행하고 노드별 소요 시간을 반환합니다.
+    checkpoint_id 를 지정하지 않으면 입력만 기록된 첫 checkpoint 부터 전체를 다시 실행합니다.
+    다시 실행한 결과는 같은 thread 에 새 분기로 기록되며 기존 checkpoint 는 그대로 남습니다.
+
+    Returns:
+        [{"node": str, "seconds": float}, ...]
+    """
+    if checkpoint_id is None:
+        history = [snapshot async for snapshot in graph.aget_state_history(thread_config(thread_id))]
+        if not history:
+            raise ThreadNotFoundError(f"No checkpoints for thread {thread_id}")
+        checkpoint_id = history[-1].config["configurable"]["checkpoint_id"]
+
+    timings = []
+    started = time.perf_counter()
+    async for update in graph.astream(None, thread_config(thread_id, checkpoint_id), stream_mode="updates"):
+        finished = time.perf_counter()
+        for node in update:
+            timings.append({"node": node, "seconds": finished - started})
+        started = finished
+    return timings
@@ -0,0 +1,371 @@
+"""
+프로세스 안에서 counter, histogram, gauge 를 모으는 메트릭 레지스트리입니다.
+
+- 값은 레이블 값 튜플을 키로 하는 dict 에 잠금 하나로 기록하므로 hot path 에 두어도 부담이 작습니다.
+- snapshot() 으로 현재 값을 dict 로 가져올 수 있고, metrics.port 를 설정하면 localhost 에서 Prometheus 텍스트 형식으로 노출합니다.
+- gauge 는 값을 직접 설정하거나, 수집할 때 호출할 함수를 등록할 수 있습니다. (e.g. 브라우저 풀 상태)
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from oracle_search.conf.conf import Shared
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    type: str
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+    def snapshot(self) -> dict:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [(f"{self.name}_total", dict(zip(self.labelnames, key)), value) for key, value in values]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, value: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value: float = 1, **labels):
+        self.inc(-value, **labels)
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]):
+        """
+        수집할 때마다 function() 이 반환하는 {레이블 값 튜플: 값} 을 사용합니다. 예외가 나면 값을 비웁니다.
+        """
+        self._function = function
+
+    def _current(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            try:
+                return dict(self._function())
+            except Exception:
+                return {}
+        with self._lock:
+            return dict(self._values)
+
+    def samples(self):
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in self._current().items()]
+
+    def snapshot(self) -> dict:
+        return self._current()
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 레이블 값 -> [구간별 개수..., +Inf 개수, 합계]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        samples = []
+        for key, counts in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_bound(bound)}, cumulative))
+            samples.append((f"{self.name}_sum", labels, counts[-1]))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        return {
+            key: {
+                "count": sum(counts[:-1]),
+                "sum": counts[-1],
+                "buckets": dict(zip(self.buckets + (float("inf"),), counts[:-1])),
+            }
+            for key, counts in values
+        }
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """
+        {메트릭 이름: {"type": ..., "labels": [...], "values": {레이블 값 튜플: 값}}} 형태로 현재 값을 반환합니다.
+        histogram 의 값은 {"count", "sum", "buckets"} 입니다.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.type, "labels": list(metric.labelnames), "values": metric.snapshot()}
+            for metric in metrics
+        }
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    label_text = ",".join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {_format_value(value)}")
+                else:
+                    lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def snapshot() -> Dict[str, dict]:
+    return registry.snapshot()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 수집 요청마다 stderr 에 접근 로그를 남기지 않습니다.
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    /metrics 를 Prometheus 텍스트 형식으로 제공하는 HTTP 서버를 daemon 스레드에서 시작합니다.
+    이벤트 루프와 무관하게 동작하므로 Streamlit 이나 스크립트에서도 사용할 수 있습니다.
+    """
+    global _server
+    stop_metrics_server()
+    _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    return _server
+
+
+def stop_metrics_server():
+    global _server
+    if _server is not None:
+        server, _server = _server, None
+        server.shutdown()
+        server.server_close()
+
+
+def _apply_metrics_conf(old, new):
+    if old is not None and new is not None and (old.host, old.port) == (new.host, new.port):
+        return
+    stop_metrics_server()
+    if new is not None and new.port:
+        try:
+            start_metrics_server(new.port, new.host)
+        except OSError as e:
+            # 여러 워커 프로세스가 같은 포트를 설정한 경우 먼저 뜬 프로세스만 노출합니다.
+            logger.warning(f"Failed to start the metrics server on {new.host}:{new.port}: {e}")
+
+
+Shared.subscribe("metrics", _apply_metrics_conf)
+# 이 모듈보다 설정이 먼저 적용된 경우입니다.
+if Shared.metrics is not None:
+    _apply_metrics_conf(None, Shared.metrics)
+
+
+def llm_metrics_callback(chain: str):
+    """
+    chain 이름을 레이블로 LLM 호출 수, 지연 시간, 토큰 사용량을 기록하는 LangChain callback handler 를 만듭니다.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class LLMMetricsCallback(BaseCallbackHandler):
+        def __init__(self):
+            self.started: Dict[Any, float] = {}
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self.started[run_id] = time.perf_counter()
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            started = self.started.pop(run_id, None)
+            output = response.llm_output or {}
+            model = output.get("model_name", "unknown")
+            usage = output.get("token_usage") or {}
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+            if not usage:
+                # 스트리밍 응답은 llm_output 대신 메시지의 usage_metadata 에 사용량이 들어 있습니다.
+                for generations in response.generations:
+                    for generation in generations:
+                        message = getattr(generation, "message", None)
+                        if message is None:
+                            continue
+                        metadata = getattr(message, "usage_metadata", None) or {}
+                        prompt_tokens += metadata.get("input_tokens", 0)
+                        completion_tokens += metadata.get("output_tokens", 0)
+                        model = message.response_metadata.get("model_name", model)
+            LLM_CALLS.inc(chain=chain, model=model, outcome="ok")
+            LLM_TOKENS.inc(prompt_tokens, chain=chain, model=model, kind="prompt")
+            LLM_TOKENS.inc(completion_tokens, chain=chain, model=model, kind="completion")
+            if started is not None:
+                LLM_SECONDS.observe(time.perf_counter() - started, chain=chain)
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self.started.pop(run_id, None)
+            LLM_CALLS.inc(chain=chain, model="unknown", outcome="error")
+
+    return LLMMetricsCallback()
+
+
+# 여러 모듈에서 함께 쓰는 메트릭입니다.
+CACHE_LOOKUPS = registry.counter("oracle_search_fetch_cache", "fetch 결과 캐시 조회 수", ("fetcher", "result"))
+FETCHERS_CREATED = registry.counter("oracle_search_fetchers_created", "ContentFetcherFactory 가 만든 Fetcher 수", ("fetcher",))
+FETCH_SECONDS = registry.histogram(
+    "oracle_search_fetch_seconds", "Fetcher 별 fetch 소요 시간(캐시 miss 만)", ("fetcher", "outcome")
+)
+EXTRACT_SECONDS = registry.histogram(
+    "oracle_search_extract_seconds", "HTML 에서 본문을 추출하는 데 걸린 시간", ("fetcher",)
+)
+BROWSER_STARTS = registry.histogram(
+    "oracle_search_browser_start_seconds", "셀레니움 드라이버를 얻는 데 걸린 시간", ("pooled",)
+)
+BROWSERS_ACTIVE = registry.gauge("oracle_search_browsers_active", "현재 사용 중인 셀레니움 드라이버 수")
+SEARCH_REQUESTS = registry.counter(
+    "oracle_search_google_requests", "Google Custom Search API 호출 수(쿼터 사용량)", ("outcome",)
+)
+SEARCH_RESULTS = registry.counter("oracle_search_google_results", "Google 검색 결과 수")
+SEARCH_SECONDS = registry.histogram("oracle_search_google_seconds", "Google 검색 API 응답 시간")
+LLM_CALLS = registry.counter("oracle_search_llm_calls", "chain 별 LLM 호출 수", ("chain", "model", "outcome"))
+LLM_TOKENS = registry.counter("oracle_search_llm_tokens", "chain 별 LLM 토큰 사용량", ("chain", "model", "kind"))
+LLM_SECONDS = registry.histogram("oracle_search_llm_seconds", "chain 별 LLM 호출 시간", ("chain",))
+WORKER_EVENTS = registry.counter("oracle_search_worker_events", "worker_stats 에 기록된 이벤트 수", ("event",))
@@ -1,17 +1,179 @@
-from typing import Literal, Dict, Union
+import asyncio
+from hashlib import blake2b
+from typing import Any, Dict, Literal, Optional, Union
 
-from pydantic import BaseModel
+import orjson
+from pydantic import BaseModel, Field, PrivateAttr, computed_field, model_validator
 
+BODY_KEY_PREFIX = "document_body:"
+
+
+def body_key(data: bytes) -> str:
+    return f"{BODY_KEY_PREFIX}{blake2b(data, digest_size=16).hexdigest()}"
+
+
+def store_body(body: str, ttl: Optional[float] = None, write_behind: bool = False) -> str:
+    """
+    본문을 내용 해시를 키로 공유 디스크 캐시에 bytes 로 저장하고 키를 반환합니다. 같은 본문은 한 번만 저장됩니다.
+    write_behind 이면 async_cache 의 쓰기 버퍼에 넣고 바로 반환합니다.
+    """
+    from oracle_search.conf.conf import Shared
+
+    data = body.encode("utf-8")
+    ref = body_key(data)
+    if write_behind:
+        from oracle_search.async_cache import async_cache
+
+        # 이미 저장된 본문인지 확인하려면 SQLite 를 읽어야 하므로 확인하지 않고 같은 내용을 다시 씁니다.
+        async_cache.set(ref, data, expire=ttl or Shared.disk_cache.body_ttl)
+    # 이미 저장된 본문은 만료 시각만 늘립니다.
+    elif not touch_body(ref, ttl):
+        Shared.disk_cache.web_cache.set(ref, data, expire=ttl or Shared.disk_cache.body_ttl)
+    return ref
+
+
+def touch_body(ref: str, ttl: Optional[float] = None) -> bool:
+    from oracle_search.async_cache import async_cache
+    from oracle_search.conf.conf import Shared
+
+    # 쓰기 버퍼에 있는 본문은 기록될 때 만료 시각이 새로 정해집니다.
+    if async_cache.pending(ref):
+        return True
+    return Shared.disk_cache.web_cache.touch(ref, expire=ttl or Shared.disk_cache.body_ttl)
+
+
+def load_body(ref: str) -> Optional[str]:
+    from oracle_search.async_cache import MISSING, async_cache
+    from oracle_search.conf.conf import Shared
+
+    if (pending := async_cache.peek(ref)) is not MISSING:
+        return pending.decode("utf-8")
+    # 큰 값은 diskcache 가 파일로 저장하므로 read=True 로 파일 핸들을 받아 바로 읽습니다. 작은 값은 bytes 로 반환됩니다.
+    value = Shared.disk_cache.web_cache.get(ref, read=True)
+    if value is None or isinstance(value, bytes):
+        return value.decode("utf-8") if value is not None else None
+    with value:
+        return value.read().decode("utf-8")
+
+
+class BaseDocument(BaseModel):
+    """
+    fetch 한 문서의 공통 모델입니다.
+
+    본문(page_content)은 body_ref 가 가리키는 디스크 캐시 항목에 따로 저장할 수 있으며,
+    offload 한 문서는 메타데이터와 body_ref 만 메모리에 두고 page_content 에 처음 접근할 때 본문을 읽습니다.
+    이 읽기와 쓰기는 SQLite 를 바로 사용하므로 이벤트 루프에서는 aload, aoffload 를 사용합니다.
+    model_dump 결과에는 기존과 같이 page_content, source, metadata 가 들어갑니다.
+    """
 
-class WebContent(BaseModel):
-    page_content: str
     source: str
+    metadata: Dict[str, Union[str, None]]
+    body_ref: Optional[str] = Field(default=None, exclude=True)
+
+    _body: Optional[str] = PrivateAttr(default=None)
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _take_page_content(cls, data: Any, handler):
+        body = None
+        if isinstance(data, dict) and "page_content" in data:
+            data = dict(data)
+            body = data.pop("page_content")
+        document = handler(data)
+        if body is not None:
+            document._body = body
+        return document
+
+    @computed_field
+    @property
+    def page_content(self) -> str:
+        if self._body is None and self.body_ref is not None:
+            self._body = load_body(self.body_ref)
+            if self._body is None:
+                raise LookupError(f"Body {self.body_ref} of {self.source} has expired from the cache")
+        return self._body or ""
+
+    @page_content.setter
+    def page_content(self, value: str):
+        self._body = value
+        self.body_ref = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._body is not None
+
+    def persist(self, ttl: Optional[float] = None, write_behind: bool = False) -> str:
+        """
+        본문을 디스크 캐시에 저장하고 body_ref 를 반환합니다. write_behind 는 store_body 를 참고합니다.
+        """
+        if self.body_ref is None or (not touch_body(self.body_ref, ttl) and self.is_loaded):
+            self.body_ref = store_body(self._body or "", ttl, write_behind)
+        return self.body_ref
+
+    def offload(self, ttl: Optional[float] = None) -> "BaseDocument":
+        """
+        본문을 디스크 캐시에 저장하고 메모리에서 내립니다. 다시 page_content 에 접근하면 캐시에서 읽습니다.
+        """
+        self.persist(ttl)
+        self._body = None
+        return self
+
+    async def aload(self) -> "BaseDocument":
+        """
+        본문이 메모리에 없으면 async_cache 의 읽기 스레드 풀에서 읽어 둡니다.
+        이벤트 루프에서 page_content 에 처음 접근하면 SQLite 를 읽게 되므로 그 전에 호출합니다.
+        """
+        if self._body is None and self.body_ref is not None:
+            from oracle_search.async_cache import async_cache
+
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(async_cache.read_pool(), load_body, self.body_ref)
+            if body is None:
+                raise LookupError(f"Body {self.body_ref} of {self.source} has expired from the cache")
+            self._body = body
+        return self
+
+    async def apersist(self, ttl: Optional[float] = None) -> str:
+        """
+        이벤트 루프를 막지 않는 persist 입니다. 본문이 메모리에 있으면 확인하지 않고 async_cache 쓰기 버퍼로 다시 쓰고,
+        없으면 executor 스레드에서 만료 시각만 늘립니다.
+        """
+        from oracle_search.async_cache import async_cache
+        from oracle_search.conf.conf import Shared
+
+        if self.is_loaded or self.body_ref is None:
+            data = (self._body or "").encode("utf-8")
+            self.body_ref = body_key(data)
+            await async_cache.aset(self.body_ref, data, expire=ttl or Shared.disk_cache.body_ttl)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, touch_body, self.body_ref, ttl)
+        return self.body_ref
+
+    async def aoffload(self, ttl: Optional[float] = None) -> "BaseDocument":
+        """
+        이벤트 루프를 막지 않는 offload 입니다.
+        """
+        await self.apersist(ttl)
+        self._body = None
+        return self
+
+    def to_bytes(self, ttl: Optional[float] = None, write_behind: bool = False) -> bytes:
+        """
+        본문은 body_ref 로만 남기고 메타데이터를 orjson 으로 직렬화합니다.
+        """
+        self.persist(ttl, write_behind)
+        return orjson.dumps({"source": self.source, "metadata": self.metadata, "body_ref": self.body_ref})
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        return cls.model_validate(orjson.loads(data))
+
+
+class WebContent(BaseDocument):
     metadata: Dict[Literal["title", "description", "keywords", "published_date", "source", "summary"], Union[str, None]]
 
 
-class YoutubeTranscript(BaseModel):
-    page_content: str
-    source: str
+class YoutubeTranscript(BaseDocument):
     metadata: Dict[
         Literal["title", "description", "keywords", "channel_name", "published_date", "source", "summary"],
         Union[str, None],
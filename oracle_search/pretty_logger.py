@@ -1,7 +1,124 @@
+"""
+loguru 위에 얹은 로거입니다.
+
+- 메시지 포맷(pformat)은 loguru 의 lazy 옵션으로 미루어, 어떤 sink 도 받지 않는 레벨이면 계산하지 않습니다.
+- sink 는 기본적으로 enqueue 되어 별도 스레드에서 기록되므로 이벤트 루프가 출력 때문에 멈추지 않습니다.
+- logging.limit_below 보다 낮은 레벨의 메시지는 모듈별 rate_limits(초당 개수), sample_rates(남길 비율)로 줄일 수 있습니다.
+- logging.format 이 json 이면 한 줄에 하나의 JSON 객체로 기록합니다.
+"""
+import random
+import sys
+import threading
+import time
+import traceback
 from pprint import pformat
+from typing import Dict, List, Optional, Tuple
 
+import orjson
 from loguru import logger
 
+from oracle_search.conf.conf import Logging, Shared
+
+PRETTY_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> - <level>{level: <8}</level> - "
+    'File "<cyan>{file.path}</cyan>", line <cyan>{line}</cyan> -\n{message}'
+)
+
+_lock = threading.Lock()
+_handler_ids: List[int] = []
+_configured = False
+# 설정이 바뀔 때마다 증가하며, PrettyLogger 는 이 값이 바뀌면 모듈별 정책을 다시 계산합니다.
+_generation = 0
+_minimum_level_no = 0
+_limit_below_no = 30
+_level_numbers: Dict[str, int] = {}
+
+
+def _level_no(level) -> int:
+    if isinstance(level, int):
+        return level
+    if level not in _level_numbers:
+        _level_numbers[level] = logger.level(level).no
+    return _level_numbers[level]
+
+
+def _json_format(record) -> str:
+    payload = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    extra = {key: value for key, value in record["extra"].items() if key != "serialized"}
+    if extra:
+        payload["extra"] = extra
+    if record["exception"] is not None:
+        payload["exception"] = "".join(traceback.format_exception(*record["exception"]))
+    record["extra"]["serialized"] = orjson.dumps(payload, default=str).decode("utf-8")
+    return "{extra[serialized]}\n"
+
+
+def configure_logging(conf: Optional[Logging] = None, minimum_level: Optional[str] = None):
+    """
+    sink 를 설정합니다. 이전에 이 함수가 추가한 sink 만 교체하고, 모듈별 rate limit / sampling 정책을 초기화합니다.
+
+    Args:
+        conf (Optional[Logging]): 로깅 설정. 없으면 Shared.logging, 그것도 없으면 기본값을 사용합니다.
+        minimum_level (Optional[str]): 설정의 level 대신 사용할 최소 로그 레벨.
+    """
+    global _configured, _generation, _minimum_level_no, _limit_below_no
+    conf = conf or Shared.logging or Logging({})
+    level = minimum_level or conf.level
+    with _lock:
+        if not _configured:
+            # loguru 의 기본 stderr sink 도 제거합니다.
+            logger.remove()
+        for handler_id in _handler_ids:
+            logger.remove(handler_id)
+        _handler_ids.clear()
+
+        if conf.format == "json":
+            handler_id = logger.add(sys.stdout, format=_json_format, level=level, enqueue=conf.enqueue, colorize=False)
+        else:
+            handler_id = logger.add(
+                sys.stdout, format=PRETTY_FORMAT, level=level, enqueue=conf.enqueue, colorize=conf.colorize
+            )
+        _handler_ids.append(handler_id)
+        _minimum_level_no = _level_no(level)
+        _limit_below_no = _level_no(conf.limit_below)
+        _generation += 1
+        _configured = True
+
+
+Shared.subscribe("logging", lambda old, new: configure_logging(new))
+
+
+class _RateLimiter:
+    """
+    초당 rate 개, 최대 rate 개까지 모아 둘 수 있는 token bucket 입니다. 버린 메시지 수는 다음에 통과하는 메시지에 붙입니다.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = max(rate, 1.0)
+        self.updated = time.monotonic()
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Tuple[bool, int]:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.suppressed += 1
+                return False, 0
+            self.tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+            return True, suppressed
+
 
 def pretty_message(width, *args, **kwargs):
     """
@@ -23,114 +140,143 @@ def pretty_message(width, *args, **kwargs):
 
     parts = []
     if pretty_args:
-        parts.append("\n".join(pretty_args))
+        parts.append("\n".join(str(arg) for arg in pretty_args))
     if pretty_kwargs:
         parts.append("\n".join(f"{k}={v}" for k, v in pretty_kwargs.items()))
     return "\n".join(parts)
 
 
 class PrettyLogger:
-    def __init__(self, default_width=160):
+    def __init__(self, default_width=160, name=""):
         """
         PrettyLogger 인스턴스를 초기화합니다.
 
         Args:
             default_width (int): 기본 메시지 너비.
+            name (str): 로거를 사용하는 모듈 이름. rate limit 과 sampling 정책을 고를 때 사용합니다.
         """
         self.default_width = default_width
+        self.name = name
+        self._generation = -1
+        self._limiter: Optional[_RateLimiter] = None
+        self._sample_rate = 1.0
 
-    def log(self, level, *args, width=None, depth=0, **kwargs):
+    def _allow(self, level_no: int) -> Tuple[bool, int]:
+        if level_no >= _limit_below_no:
+            return True, 0
+        if self._generation != _generation:
+            conf = Shared.logging or Logging({})
+            rate = conf.rate_limit_for(self.name)
+            self._limiter = _RateLimiter(rate) if rate is not None else None
+            self._sample_rate = conf.sample_rate_for(self.name)
+            self._generation = _generation
+        if self._sample_rate < 1.0 and random.random() >= self._sample_rate:
+            return False, 0
+        if self._limiter is not None:
+            return self._limiter.acquire()
+        return True, 0
+
+    def log(self, level, *args, width=None, depth=0, exception=False, **kwargs):
         """
         주어진 로그 레벨에 따라 메시지를 로그합니다.
+        최소 레벨보다 낮거나 rate limit / sampling 으로 버려지는 메시지는 포맷하지 않습니다.
 
         Args:
             level (str): 로그 레벨.
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
             depth (int): 로그 깊이.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다. traceback 은 sink 에서 포맷됩니다.
             **kwargs: 로그할 키워드 인수들.
         """
+        level_no = _level_no(level)
+        if level_no < _minimum_level_no:
+            return
+        allowed, suppressed = self._allow(level_no)
+        if not allowed:
+            return
         if width is None:
             width = self.default_width
-        message = pretty_message(width, *args, **kwargs)
-        logger.opt(depth=1 + depth).log(level, message)
 
-    def debug(self, *args, width=None, **kwargs):
+        def message():
+            text = pretty_message(width, *args, **kwargs)
+            return f"{text}\n(suppressed {suppressed} messages)" if suppressed else text
+
+        logger.opt(depth=1 + depth, lazy=True, exception=exception or None).log(level, "{}", message)
+
+    def debug(self, *args, width=None, exception=False, **kwargs):
         """
         DEBUG 레벨로 메시지를 로그합니다.
 
         Args:
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다.
             **kwargs: 로그할 키워드 인수들.
         """
-        self.log("DEBUG", *args, width=width, depth=1, **kwargs)
+        self.log("DEBUG", *args, width=width, depth=1, exception=exception, **kwargs)
 
-    def info(self, *args, width=None, **kwargs):
+    def info(self, *args, width=None, exception=False, **kwargs):
         """
         INFO 레벨로 메시지를 로그합니다.
 
         Args:
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다.
             **kwargs: 로그할 키워드 인수들.
         """
-        self.log("INFO", *args, width=width, depth=1, **kwargs)
+        self.log("INFO", *args, width=width, depth=1, exception=exception, **kwargs)
 
-    def warning(self, *args, width=None, **kwargs):
+    def warning(self, *args, width=None, exception=False, **kwargs):
         """
         WARNING 레벨로 메시지를 로그합니다.
 
         Args:
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다.
             **kwargs: 로그할 키워드 인수들.
         """
-        self.log("WARNING", *args, width=width, depth=1, **kwargs)
+        self.log("WARNING", *args, width=width, depth=1, exception=exception, **kwargs)
 
-    def error(self, *args, width=None, **kwargs):
+    def error(self, *args, width=None, exception=False, **kwargs):
         """
         ERROR 레벨로 메시지를 로그합니다.
 
         Args:
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다.
             **kwargs: 로그할 키워드 인수들.
         """
-        self.log("ERROR", *args, width=width, depth=1, **kwargs)
+        self.log("ERROR", *args, width=width, depth=1, exception=exception, **kwargs)
 
-    def critical(self, *args, width=None, **kwargs):
+    def critical(self, *args, width=None, exception=False, **kwargs):
         """
         CRITICAL 레벨로 메시지를 로그합니다.
 
         Args:
             *args: 로그할 인수들.
             width (int, optional): 메시지 너비. 기본값은 None.
+            exception (bool): True 이면 처리 중인 예외의 traceback 을 함께 기록합니다.
             **kwargs: 로그할 키워드 인수들.
         """
-        self.log("CRITICAL", *args, width=width, depth=1, **kwargs)
+        self.log("CRITICAL", *args, width=width, depth=1, exception=exception, **kwargs)
 
 
-def setup_logger(minimum_level="DEBUG", default_width=160):
+def setup_logger(minimum_level=None, default_width=160):
     """
-    로거를 설정합니다.
+    로거를 설정합니다. sink 는 처음 호출할 때 한 번만 설정되며, 이후 호출은 같은 sink 를 공유하는 로거를 반환합니다.
+    설정 파일의 logging 섹션이 적용되거나 바뀌면 sink 가 다시 설정됩니다.
 
     Args:
-        minimum_level (str): 최소 로그 레벨.
+        minimum_level (Optional[str]): 최소 로그 레벨. 없으면 logging.level 을 사용합니다.
         default_width (int): 기본 메시지 너비.
 
     Returns:
-        PrettyLogger: 설정된 로거 인스턴스.
+        PrettyLogger: 호출한 모듈 이름으로 만든 로거 인스턴스.
     """
-    format_str = (
-        "<green>{time:YYYY-MM-DD HH:mm:ss}</green> - <level>{level: <8}</level> - "
-        'File "<cyan>{file.path}</cyan>", line <cyan>{line}</cyan> -\n{message}'
-    )
-    logger.remove()
-    logger.add(
-        lambda msg: print(msg),
-        format=format_str,
-        level=minimum_level,
-        colorize=True,
-    )
-    return PrettyLogger(default_width=default_width)
+    if not _configured:
+        configure_logging(minimum_level=minimum_level)
+    return PrettyLogger(default_width=default_width, name=sys._getframe(1).f_globals.get("__name__", ""))
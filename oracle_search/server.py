@@ -0,0 +1,596 @@
+"""
+검색 그래프와 웹 도구를 HTTP 로 제공하는 장기 실행 서비스입니다. 로드 밸런서 뒤에 여러 프로세스를 띄워 사용할 수 있습니다.
+
+Endpoints:
+    POST /v1/oracle       {"task_description", "url"?, "thread_id"?, "max_cost"?, "max_seconds"?}
+                          get_graph() 실행의 진행 상황을 SSE(text/event-stream)로 보냅니다.
+    POST /v1/oracle/{thread_id}/resume
+                          server.checkpoint 를 켠 경우, 실패하거나 끊긴 실행을 마지막 checkpoint 에서 이어 실행하고 최종 상태를 반환합니다.
+    POST /v1/oracle/{thread_id}/replay  {"checkpoint_id"?}
+                          저장된 checkpoint 부터 노드를 다시 실행하고 노드별 소요 시간을 반환합니다.
+    POST /v1/web-content  {"url", "refresh"?}  get_web_content 와 같이 문서를 가져옵니다.
+    POST /v1/web-task     {"url", "task"}      web_task 와 같이 문서를 읽고 task 에 답합니다.
+    GET  /healthz         프로세스가 응답하는지 확인합니다.
+    GET  /readyz          요청을 받을 수 있는지(시작 완료, 종료 중 아님, 대기열 여유, 캐시와 브라우저 풀 접근) 확인합니다.
+    GET  /metrics         Prometheus 형식의 메트릭.
+
+모든 요청은 프로세스에 하나뿐인 runtime 을 함께 씁니다. runtime 에는 연결 풀을 가진 aiohttp 세션, 컴파일한 그래프,
+선택적으로 서비스 안에서 띄운 브라우저 풀(server.browser_pool_size)이 들어 있고, 디스크 캐시와 LLM 스케줄러는 원래 프로세스 전역입니다.
+
+/v1/* 요청은 admission control 을 거칩니다.
+- 클라이언트(server.client_header 헤더, 없으면 접속 주소)별 분당 요청 수와 동시 요청 수를 넘으면 429 를 반환합니다.
+- 동시에 server.max_concurrency 개를 실행하고 server.max_queue 개까지 기다리게 하며, 대기열이 찼거나
+  queue_timeout 초 안에 자리가 나지 않거나 종료 중이면 503 을 반환합니다. 두 경우 모두 Retry-After 헤더를 보냅니다.
+
+실행:
+    python -m oracle_search.server [--host 0.0.0.0] [--port 8080]
+"""
+import argparse
+import asyncio
+import math
+import time
+import uuid
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+import orjson
+from aiohttp import ClientSession, TCPConnector, web
+
+from oracle_search import ExMachina, Shared
+from oracle_search.metrics import registry
+from oracle_search.models.documents import BaseDocument
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+HTTP_REQUESTS = registry.counter("oracle_search_http_requests", "HTTP 서비스가 처리한 요청 수", ("route", "status"))
+HTTP_SECONDS = registry.histogram("oracle_search_http_seconds", "HTTP 서비스의 요청 처리 시간", ("route",))
+HTTP_REJECTED = registry.counter("oracle_search_http_rejected", "admission control 이 거절한 요청 수", ("reason",))
+# 요청 처리 시간의 EWMA 가중치. Retry-After 를 계산하는 데 사용합니다.
+SERVICE_SECONDS_ALPHA = 0.2
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    동시에 실행하는 요청 수를 server.max_concurrency 로 제한하고, 나머지는 도착한 순서대로 max_queue 개까지 기다리게 합니다.
+    """
+
+    def __init__(self):
+        self.running = 0
+        self.waiting: Deque[asyncio.Future] = deque()
+        self.draining = False
+        self.service_seconds = 1.0
+
+    def retry_after(self) -> float:
+        conf = Shared.server
+        return max(1.0, self.service_seconds * (len(self.waiting) + 1) / max(conf.max_concurrency, 1))
+
+    async def acquire(self):
+        conf = Shared.server
+        if self.draining:
+            raise Rejected(503, "draining", self.retry_after())
+        if self.running < conf.max_concurrency and not self.waiting:
+            self.running += 1
+            return
+        if len(self.waiting) >= conf.max_queue:
+            raise Rejected(503, "queue_full", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiting.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, conf.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # 자리를 넘겨받은 직후 취소되었으면 다음 대기자에게 넘깁니다.
+                self.release()
+            elif waiter in self.waiting:
+                self.waiting.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                raise Rejected(503, "queue_timeout", self.retry_after()) from None
+            raise
+
+    def release(self, seconds: Optional[float] = None):
+        if seconds is not None:
+            self.service_seconds += SERVICE_SECONDS_ALPHA * (seconds - self.service_seconds)
+        # 끝난 요청의 자리를 대기자에게 바로 넘기므로 running 은 줄지 않습니다.
+        while self.waiting:
+            waiter = self.waiting.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def full(self) -> bool:
+        return len(self.waiting) >= Shared.server.max_queue
+
+
+@dataclass
+class _ClientState:
+    tokens: float
+    updated: float = field(default_factory=time.monotonic)
+    active: int = 0
+
+
+class ClientQuotas:
+    """
+    클라이언트별 token bucket(분당 rate, 최대 burst)과 동시 요청 수 제한입니다.
+    """
+
+    # 이 수보다 많은 클라이언트를 기억하게 되면 쉬고 있는 클라이언트를 지웁니다.
+    MAX_CLIENTS = 10000
+
+    def __init__(self):
+        self.clients: Dict[str, _ClientState] = {}
+
+    def acquire(self, client: str):
+        quota = Shared.server.client_quota(client)
+        now = time.monotonic()
+        state = self.clients.get(client)
+        if state is None:
+            if len(self.clients) >= self.MAX_CLIENTS:
+                self._prune(now)
+            state = self.clients[client] = _ClientState(tokens=quota["burst"], updated=now)
+        per_second = quota["rate"] / 60
+        state.tokens = min(quota["burst"], state.tokens + (now - state.updated) * per_second)
+        state.updated = now
+        if state.active >= quota["concurrency"]:
+            raise Rejected(429, "client_concurrency", 1.0)
+        if state.tokens < 1:
+            raise Rejected(429, "client_rate", (1 - state.tokens) / per_second if per_second else 60.0)
+        state.tokens -= 1
+        state.active += 1
+
+    def release(self, client: str, refund: bool = False):
+        """
+        끝난 요청의 동시 요청 수를 줄입니다. refund 가 True 이면 실행하지 못한 요청이므로 분당 요청 수의 몫도 돌려줍니다.
+        """
+        state = self.clients.get(client)
+        if state is not None:
+            state.active -= 1
+            if refund:
+                state.tokens = min(Shared.server.client_quota(client)["burst"], state.tokens + 1)
+
+    def _prune(self, now: float):
+        for client, state in list(self.clients.items()):
+            quota = Shared.server.client_quota(client)
+            refilled = state.tokens + (now - state.updated) * quota["rate"] / 60 >= quota["burst"]
+            if not state.active and refilled:
+                del self.clients[client]
+
+
+class ServiceRuntime:
+    """
+    요청들이 함께 쓰는 자원입니다. aiohttp 앱의 on_startup / on_cleanup 에서 시작하고 정리합니다.
+    """
+
+    def __init__(self):
+        self.session: Optional[ClientSession] = None
+        self.graph = None
+        self.admission = AdmissionController()
+        self.quotas = ClientQuotas()
+        self.started_at: Optional[float] = None
+        self.ready = False
+        self._stack = AsyncExitStack()
+        self._browser_pool: Optional[asyncio.Task] = None
+
+    async def start(self, app: web.Application):
+        from oracle_search.langgraph.checkpoint import sqlite_checkpointer
+        from oracle_search.langgraph.oracle_search import get_graph
+
+        conf = Shared.server
+        self.session = ClientSession(
+            connector=TCPConnector(limit=conf.http_limit, limit_per_host=conf.http_limit_per_host)
+        )
+        if conf.browser_pool_size and Shared.worker.browser_pool_socket:
+            await self._start_browser_pool(conf.browser_pool_size, Shared.worker.browser_pool_socket)
+        checkpointer = await self._stack.enter_async_context(sqlite_checkpointer()) if conf.checkpoint else None
+        self.graph = get_graph(checkpointer)
+        self.started_at = time.time()
+        self.ready = True
+        logger.info("Oracle search service is ready")
+
+    async def _start_browser_pool(self, size: int, socket_path: str):
+        from oracle_search.web_loader.browser_pool import BrowserPoolServer
+
+        pool = BrowserPoolServer(socket_path, size)
+        self._browser_pool = asyncio.create_task(pool.serve_forever())
+        # 풀이 소켓을 열기 전에 요청이 들어오면 드라이버를 빌리지 못하므로 준비될 때까지 기다립니다.
+        while pool.server is None:
+            if self._browser_pool.done():
+                self._browser_pool.result()
+            await asyncio.sleep(0.1)
+
+    async def drain(self, app: web.Application):
+        self.ready = False
+        self.admission.draining = True
+        logger.info(f"Draining {self.admission.running} running and {len(self.admission.waiting)} queued requests")
+
+    async def close(self, app: web.Application):
+        from oracle_search.async_cache import async_cache
+
+        self.ready = False
+        if self.session is not None:
+            await self.session.close()
+        if self._browser_pool is not None:
+            self._browser_pool.cancel()
+            await asyncio.gather(self._browser_pool, return_exceptions=True)
+        await self._stack.aclose()
+        await async_cache.aflush(Shared.cache_writer.shutdown_timeout)
+
+    @asynccontextmanager
+    async def admit(self, client: str) -> AsyncIterator[None]:
+        self.quotas.acquire(client)
+        try:
+            await self.admission.acquire()
+        except Rejected:
+            # 서비스가 바빠서 거절한 요청은 클라이언트의 분당 요청 수에 세지 않습니다.
+            self.quotas.release(client, refund=True)
+            raise
+        except BaseException:
+            self.quotas.release(client)
+            raise
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.admission.release(time.monotonic() - started)
+            self.quotas.release(client)
+
+
+RUNTIME = web.AppKey("runtime", ServiceRuntime)
+_runtime: Optional[ServiceRuntime] = None
+
+
+def _default(obj: Any) -> Any:
+    # 문서 본문은 크므로 진행 상황에는 메타데이터만 보냅니다. 본문이 필요한 응답은 document_json 을 사용합니다.
+    if isinstance(obj, BaseDocument):
+        return {"source": obj.source, "metadata": obj.metadata}
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return str(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def document_json(document: BaseDocument) -> dict:
+    return {"kind": document.__class__.__name__, **document.model_dump()}
+
+
+def json_response(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    return web.Response(body=dumps(data), status=status, content_type="application/json", headers=headers)
+
+
+def error_response(status: int, message: str, headers: Optional[Dict[str, str]] = None) -> web.Response:
+    return json_response({"error": message}, status=status, headers=headers)
+
+
+def http_error(exception_class, message: str) -> web.HTTPException:
+    return exception_class(text=dumps({"error": message}).decode("utf-8"), content_type="application/json")
+
+
+def client_id(request: web.Request) -> str:
+    return request.headers.get(Shared.server.client_header) or request.remote or "unknown"
+
+
+async def read_json(request: web.Request, *required: str) -> dict:
+    try:
+        body = orjson.loads(await request.read())
+    except orjson.JSONDecodeError as e:
+        raise http_error(web.HTTPBadRequest, f"Invalid JSON: {e}")
+    missing = [name for name in required if not isinstance(body, dict) or not body.get(name)]
+    if missing:
+        raise http_error(web.HTTPBadRequest, f"Missing {', '.join(missing)}")
+    return body
+
+
+def admitted(route: str):
+    """
+    핸들러를 admission control 과 공유 HTTP 세션, client_scope 안에서 실행하고 요청 메트릭을 기록합니다.
+    """
+
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request: web.Request) -> web.StreamResponse:
+            from oracle_search.web_loader.http_session import shared_session_scope
+            from oracle_search.web_loader.task_context import client_scope
+
+            runtime = request.app[RUNTIME]
+            client = client_id(request)
+            started = time.perf_counter()
+            status = 500
+            try:
+                async with runtime.admit(client):
+                    # LLM 스케줄러가 요청 내용이 아니라 client 별로 돌아가며 허가하도록 client ID 를 전달합니다.
+                    with shared_session_scope(runtime.session), client_scope(client):
+                        response = await handler(request, runtime)
+                status = response.status
+                return response
+            except Rejected as e:
+                HTTP_REJECTED.inc(reason=e.reason)
+                status = e.status
+                return error_response(
+                    e.status, f"Rejected: {e.reason}", headers={"Retry-After": str(math.ceil(e.retry_after))}
+                )
+            except web.HTTPException as e:
+                status = e.status
+                raise
+            finally:
+                HTTP_REQUESTS.inc(route=route, status=str(status))
+                HTTP_SECONDS.observe(time.perf_counter() - started, route=route)
+
+        return wrapper
+
+    return decorator
+
+
+async def _with_timeout(coroutine, what: str):
+    try:
+        return await asyncio.wait_for(coroutine, Shared.server.request_timeout)
+    except asyncio.TimeoutError:
+        raise http_error(web.HTTPGatewayTimeout, f"{what} did not finish in {Shared.server.request_timeout}s")
+
+
+@admitted("web_content")
+async def web_content(request: web.Request, runtime: ServiceRuntime) -> web.Response:
+    from oracle_search.web_loader.web_loader import ContentFetcherFactory
+
+    body = await read_json(request, "url")
+    fetcher = ContentFetcherFactory.create_fetcher(body["url"], runtime.session)
+    content = await _with_timeout(fetcher.fetch(refresh=bool(body.get("refresh"))), "Fetch")
+    if content is None:
+        return error_response(502, f"Failed to fetch {body['url']}")
+    return json_response(document_json(content))
+
+
+@admitted("web_task")
+async def web_task(request: web.Request, runtime: ServiceRuntime) -> web.Response:
+    from oracle_search.tools.web_tools import web_qa
+    from oracle_search.web_loader.task_context import request_scope
+    from oracle_search.web_loader.web_loader import ContentFetcherFactory
+
+    body = await read_json(request, "url", "task")
+
+    async def run():
+        with request_scope(body["task"]):
+            content = await ContentFetcherFactory.create_fetcher(body["url"], runtime.session).fetch()
+        if content is None:
+            return None
+        return await web_qa(content, body["task"])
+
+    answer = await _with_timeout(run(), "Task")
+    if answer is None:
+        return error_response(502, f"Failed to fetch {body['url']}")
+    return json_response(document_json(answer))
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+@admitted("oracle")
+async def oracle(request: web.Request, runtime: ServiceRuntime) -> web.StreamResponse:
+    from oracle_search.langgraph.oracle_search import astream_oracle, thread_config
+
+    body = await read_json(request, "task_description")
+    conf = Shared.server
+    thread_id = body.get("thread_id") or uuid.uuid4().hex
+    config = thread_config(thread_id) if conf.checkpoint else {"configurable": {}}
+    for name in ("max_cost", "max_seconds"):
+        if body.get(name) is not None:
+            config["configurable"][name] = body[name]
+    inputs = {"url": body.get("url"), "task_description": body["task_description"], "total_cost": 0}
+
+    response = web.StreamResponse(
+        headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    await response.prepare(request)
+    await response.write(_sse("run", {"thread_id": thread_id}))
+
+    # 다음 이벤트를 기다리는 동안 heartbeat 를 보내려면 generator 를 직접 취소하지 않고 queue 로 받아야 합니다.
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for event in astream_oracle(inputs, runtime.graph, config):
+                queue.put_nowait(event)
+            queue.put_nowait(None)
+        except Exception as e:
+            queue.put_nowait(e)
+
+    producer = asyncio.create_task(produce())
+    deadline = time.monotonic() + conf.request_timeout
+    documents = 0
+    total_cost = 0.0
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                await response.write(_sse("error", {"error": f"Run did not finish in {conf.request_timeout}s"}))
+                break
+            try:
+                event = await asyncio.wait_for(queue.get(), min(conf.sse_heartbeat, remaining))
+            except asyncio.TimeoutError:
+                await response.write(b": heartbeat\n\n")
+                continue
+            if event is None:
+                await response.write(_sse("done", {"thread_id": thread_id, "documents": documents, "total_cost": total_cost}))
+                break
+            if isinstance(event, Exception):
+                logger.error(f"Oracle run {thread_id} failed: {event}")
+                await response.write(_sse("error", {"error": f"{event.__class__.__name__}: {event}"}))
+                break
+            name = event.pop("event")
+            if name == "document":
+                documents += 1
+                event["content"] = document_json(event["content"])
+            elif name == "node_end" and isinstance(event.get("output"), dict):
+                total_cost += event["output"].get("total_cost") or 0.0
+            await response.write(_sse(name, event))
+    except ConnectionResetError:
+        logger.info(f"Client disconnected from oracle run {thread_id}")
+    finally:
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+    return response
+
+
+def _thread_id(request: web.Request) -> str:
+    if not Shared.server.checkpoint:
+        raise http_error(web.HTTPNotFound, "Checkpointing is disabled (server.checkpoint)")
+    return request.match_info["thread_id"]
+
+
+def state_json(thread_id: str, state: Dict[str, Any]) -> dict:
+    # 대화 기록은 다시 만들 수 있으므로 보내지 않고, 문서는 _default 에 따라 메타데이터만 보냅니다.
+    return {
+        "thread_id": thread_id,
+        "task_description": state.get("task_description"),
+        "search_queries": state.get("search_queries") or [],
+        "search_results": state.get("search_results") or [],
+        "total_cost": state.get("total_cost") or 0.0,
+    }
+
+
+@admitted("oracle_resume")
+async def oracle_resume(request: web.Request, runtime: ServiceRuntime) -> web.Response:
+    from oracle_search.langgraph.oracle_search import ThreadNotFoundError, aresume_oracle
+
+    thread_id = _thread_id(request)
+    try:
+        state = await _with_timeout(aresume_oracle(runtime.graph, thread_id), "Resume")
+    except ThreadNotFoundError as e:
+        return error_response(404, str(e))
+    return json_response(state_json(thread_id, state))
+
+
+@admitted("oracle_replay")
+async def oracle_replay(request: web.Request, runtime: ServiceRuntime) -> web.Response:
+    from oracle_search.langgraph.oracle_search import ThreadNotFoundError, areplay_oracle
+
+    thread_id = _thread_id(request)
+    body = await read_json(request) if request.can_read_body else {}
+    try:
+        timings = await _with_timeout(areplay_oracle(runtime.graph, thread_id, body.get("checkpoint_id")), "Replay")
+    except ThreadNotFoundError as e:
+        return error_response(404, str(e))
+    return json_response({"thread_id": thread_id, "timings": timings})
+
+
+async def healthz(request: web.Request) -> web.Response:
+    runtime = request.app[RUNTIME]
+    uptime = time.time() - runtime.started_at if runtime.started_at else 0.0
+    return json_response({"status": "ok", "uptime": uptime})
+
+
+async def readyz(request: web.Request) -> web.Response:
+    from oracle_search.async_cache import async_cache
+
+    runtime = request.app[RUNTIME]
+    loop = asyncio.get_running_loop()
+    checks: Dict[str, Any] = {
+        "started": runtime.ready,
+        "draining": runtime.admission.draining,
+        "running": runtime.admission.running,
+        "queued": len(runtime.admission.waiting),
+        "cache_write_lag": async_cache.stats()["lag"],
+    }
+    ok = runtime.ready and not runtime.admission.draining and not runtime.admission.full()
+    try:
+        web_cache = Shared.disk_cache.web_cache
+        await asyncio.wait_for(loop.run_in_executor(async_cache.read_pool(), web_cache.get, "readyz"), 2)
+        checks["disk_cache"] = True
+    except Exception as e:
+        checks["disk_cache"] = f"{e.__class__.__name__}: {e}"
+        ok = False
+    if Shared.worker.browser_pool_socket:
+        from oracle_search.web_loader.browser_pool import pool_stats
+
+        try:
+            checks["browser_pool"] = await asyncio.wait_for(
+                loop.run_in_executor(None, pool_stats, Shared.worker.browser_pool_socket), 2
+            )
+        except Exception as e:
+            checks["browser_pool"] = f"{e.__class__.__name__}: {e}"
+            ok = False
+    return json_response({"ready": ok, **checks}, status=200 if ok else 503)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    # 일부 gauge 는 수집할 때 브라우저 풀 서비스에 묻거나 /proc 을 읽으므로 이벤트 루프 밖에서 만듭니다.
+    loop = asyncio.get_running_loop()
+    try:
+        text = await asyncio.wait_for(loop.run_in_executor(None, registry.render_prometheus), 5)
+    except asyncio.TimeoutError:
+        raise http_error(web.HTTPServiceUnavailable, "Collecting metrics did not finish in 5s")
+    return web.Response(text=text, content_type="text/plain", charset="utf-8")
+
+
+def create_app() -> web.Application:
+    global _runtime
+    runtime = _runtime = ServiceRuntime()
+    app = web.Application(client_max_size=1024 * 1024)
+    app[RUNTIME] = runtime
+    app.on_startup.append(runtime.start)
+    app.on_shutdown.append(runtime.drain)
+    app.on_cleanup.append(runtime.close)
+    app.router.add_post("/v1/oracle", oracle)
+    app.router.add_post("/v1/oracle/{thread_id}/resume", oracle_resume)
+    app.router.add_post("/v1/oracle/{thread_id}/replay", oracle_replay)
+    app.router.add_post("/v1/web-content", web_content)
+    app.router.add_post("/v1/web-task", web_task)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/readyz", readyz)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def _admission_state() -> Dict[tuple, float]:
+    if _runtime is None:
+        return {}
+    return {("running",): _runtime.admission.running, ("queued",): len(_runtime.admission.waiting)}
+
+
+registry.gauge("oracle_search_http_admission", "HTTP 서비스에서 실행 중이거나 기다리는 요청 수", ("state",)).set_function(
+    _admission_state
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the oracle search graph and web tools over HTTP.")
+    parser.add_argument("--host", help="server.host 대신 사용할 주소")
+    parser.add_argument("--port", type=int, help="server.port 대신 사용할 포트")
+    parser.add_argument("--watch", action="store_true", help="설정 파일이 바뀌면 바뀐 섹션을 다시 적용합니다")
+    args = parser.parse_args(argv)
+
+    ExMachina.bootstrap(watch=args.watch)
+    conf = Shared.server
+    host, port = args.host or conf.host, args.port or conf.port
+    logger.info(f"Serving oracle search on http://{host}:{port}")
+    web.run_app(
+        create_app(),
+        host=host,
+        port=port,
+        shutdown_timeout=conf.drain_timeout,
+        access_log=None,
+        print=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
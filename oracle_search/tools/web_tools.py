@@ -1,16 +1,18 @@
 import json
-from typing import Union, List
+from typing import Any, AsyncIterator, Dict, List, Union
 
 from aiohttp import ClientSession
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
-from oracle_search import Shared
+from oracle_search.chain.model_router import route
+from oracle_search.chain.scheduler import BULK, INTERACTIVE, astream_scheduled, scheduled
+from oracle_search.metrics import llm_metrics_callback
 from oracle_search.models.documents import WebContent, YoutubeTranscript
 from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.rerank import rerank_contents
+from oracle_search.web_loader.task_context import request_scope
 from oracle_search.web_loader.web_loader import WebContentExtractor
 
 logger = setup_logger()
@@ -53,16 +55,21 @@ def web_task(url: str, task: str) -> Union[WebContent, YoutubeTranscript]:
     """
 
     async def fetch_and_qa(url: str, task: str):
-        async with ClientSession() as session:
-            extractor = WebContentExtractor(url, session)
-            content = await extractor.afetch()
-            return await web_qa(content, task)
+        # 나무위키처럼 요청에 맞는 부분만 추출할 수 있는 fetcher 가 task 를 볼 수 있게 합니다.
+        with request_scope(task):
+            async with ClientSession() as session:
+                extractor = WebContentExtractor(url, session)
+                content = await extractor.afetch()
+        return await web_qa(content, task)
 
     with ThreadPoolExecutor() as pool:
         return pool.submit(lambda: asyncio.run(fetch_and_qa(url, task))).result()
 
 
 async def web_qa(content: Union[WebContent, YoutubeTranscript], task: str) -> Union[WebContent, YoutubeTranscript]:
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_openai import ChatOpenAI
+
     web_qa_template_prompt = dedent(
         """\
         You are a helpful AI assistant designed to answer tasks based on specific content. Your goal is to provide accurate and relevant information from the given content.
@@ -87,15 +94,60 @@ async def web_qa(content: Union[WebContent, YoutubeTranscript], task: str) -> Un
         """
     )
     web_qa_template = ChatPromptTemplate.from_messages([("system", web_qa_template_prompt), ("human", "{task}")])
-    llm = ChatOpenAI(model=Shared.gpt.gpt_4o_mini, temperature=0.5)
-    web_qa_chain = web_qa_template | llm
-    res = (await web_qa_chain.ainvoke({"content": content.model_dump(), "task": task})).content
+    inputs = {"content": content.model_dump(), "task": task}
+    model = route("web_qa", inputs, BULK).model
+    # web_qa 는 문서 수만큼 한꺼번에 나가므로 bulk 우선순위로 보내 다른 사용자의 대화형 호출을 막지 않게 합니다.
+    llm = ChatOpenAI(model=model, temperature=0.5, max_retries=0)
+    web_qa_chain = scheduled(web_qa_template | llm, model, BULK)
+    res = (await web_qa_chain.ainvoke(inputs, config={"callbacks": [llm_metrics_callback("web_qa")]})).content
     content = content.model_copy()
     content.page_content = res
     return content
 
 
+ANSWER_PROMPT = dedent(
+    """\
+    You are a helpful AI assistant designed to answer tasks based on specific content. Your goal is to provide accurate and relevant information from the given content.
+
+    Here is the content you should use to answer task:
+
+    <contents>
+    {content}
+    </contents>
+
+    When given a task, follow these instructions:
+
+    1. Carefully read and understand the task.
+    2. Search the provided content for relevant information.
+    3. If you find information in the content that directly answers the task, use it to formulate your response.
+    4. If the content does not contain information relevant to the task, or if you are unsure about the answer, you must respond with "I don't know."
+    5. Do not use any external knowledge or information not present in the given content.
+    6. Provide concise and accurate answers based solely on the information in the content.
+
+    Remember, your responses should be based exclusively on the information in the provided content. Do not speculate or provide information from other sources.
+    The user will now provide you with task.
+    """
+)
+
+
+def _answer_chain(model: str):
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_openai import ChatOpenAI
+
+    web_qa_template = ChatPromptTemplate.from_messages([("system", ANSWER_PROMPT), ("human", "{task}")])
+    # 스트리밍 응답에도 토큰 사용량이 포함되도록 stream_usage 를 켭니다.
+    llm = ChatOpenAI(model=model, temperature=0.5, stream_usage=True, max_retries=0)
+    return (web_qa_template | llm).with_config(callbacks=[llm_metrics_callback("answer")])
+
+
+def _answer_inputs(responses: List[Union[WebContent, YoutubeTranscript]], task: str) -> Dict[str, str]:
+    return {"content": json.dumps([r.model_dump() for r in responses], ensure_ascii=False), "task": task}
+
+
 def answer_with_contents(contents: List[Union[WebContent, YoutubeTranscript]], task: str) -> str:
+    # 거의 같은 문서를 제거하고 관련도 상위 문서만 web_qa 로 보냅니다.
+    contents = rerank_contents(contents, task)
+
     def run_web_qa(content, request):
         return asyncio.run(web_qa(content, request))
 
@@ -107,33 +159,38 @@ def answer_with_contents(contents: List[Union[WebContent, YoutubeTranscript]], t
             [task] * len(contents)
         ))
 
-    web_qa_template_prompt = dedent(
-        """\
-        You are a helpful AI assistant designed to answer tasks based on specific content. Your goal is to provide accurate and relevant information from the given content.
-
-        Here is the content you should use to answer task:
-
-        <contents>
-        {content}
-        </contents>
-
-        When given a task, follow these instructions:
-
-        1. Carefully read and understand the task.
-        2. Search the provided content for relevant information.
-        3. If you find information in the content that directly answers the task, use it to formulate your response.
-        4. If the content does not contain information relevant to the task, or if you are unsure about the answer, you must respond with "I don't know."
-        5. Do not use any external knowledge or information not present in the given content.
-        6. Provide concise and accurate answers based solely on the information in the content.
+    inputs = _answer_inputs(responses, task)
+    model = route("answer", inputs).model
+    res = scheduled(_answer_chain(model), model, INTERACTIVE).invoke(inputs)
+    return res.content
 
-        Remember, your responses should be based exclusively on the information in the provided content. Do not speculate or provide information from other sources.
-        The user will now provide you with task.
-        """
-    )
 
-    web_qa_template = ChatPromptTemplate.from_messages([("system", web_qa_template_prompt), ("human", "{task}")])
+async def astream_answer_with_contents(
+    contents: List[Union[WebContent, YoutubeTranscript]], task: str
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    answer_with_contents 의 스트리밍 버전입니다. 진행 상황을 이벤트로 내보냅니다.
 
-    llm = ChatOpenAI(model=Shared.gpt.gpt_4o, temperature=0.5)
-    web_qa_chain = web_qa_template | llm
-    res = web_qa_chain.invoke({"content": json.dumps([r.model_dump() for r in responses], ensure_ascii=False), "task": task})
-    return res.content
+    이벤트 종류:
+        {"event": "reranked", "contents": [...]}: 중복 제거와 순위 매기기가 끝났을 때 한 번.
+        {"event": "web_qa", "content": WebContent | YoutubeTranscript}: 문서별 web_qa 가 끝날 때마다.
+        {"event": "token", "text": str}: 최종 답변의 토큰 조각.
+        {"event": "answer", "text": str}: 최종 답변 전체.
+    """
+    contents = rerank_contents(contents, task)
+    yield {"event": "reranked", "contents": contents}
+
+    responses = []
+    for next_done in asyncio.as_completed([web_qa(content, task) for content in contents]):
+        response = await next_done
+        responses.append(response)
+        yield {"event": "web_qa", "content": response}
+
+    answer = []
+    inputs = _answer_inputs(responses, task)
+    model = route("answer", inputs).model
+    async for chunk in astream_scheduled(_answer_chain(model), inputs, model):
+        if chunk.content:
+            answer.append(chunk.content)
+            yield {"event": "token", "text": chunk.content}
+    yield {"event": "answer", "text": "".join(answer)}
@@ -0,0 +1,271 @@
+"""
+여러 워커 프로세스가 함께 쓰는 브라우저 풀 서비스입니다.
+
+서비스는 geckodriver 프로세스마다 Firefox 세션을 미리 띄워 두고, 로컬 unix socket 으로 접속한 워커에게 하나씩 빌려줍니다.
+워커는 빌린 세션에 webdriver.Remote 로 붙기만 하므로 Firefox 시작 시간을 기다리지 않습니다. 소켓 연결이 끊기면 lease 가 반납된 것으로 봅니다.
+
+반납된 세션은 재사용하지 않고 끝낸 뒤 새 세션을 띄워 둡니다. WebDriver 로는 다른 origin 의 쿠키와 storage 를 지울 수 없으므로
+lease 마다 새 프로필을 쓰게 하기 위해서이며, 새 세션은 다음 lease 전에 백그라운드에서 준비됩니다.
+세션을 끝낼 수 없거나 geckodriver 가 죽은 경우 서비스가 해당 geckodriver 를 다시 띄웁니다.
+풀의 세션은 FIREFOX_ARGUMENTS 로 시작하며, 워커가 넘긴 options 는 사용하지 않습니다.
+
+실행:
+    python -m oracle_search.web_loader.browser_pool --socket /tmp/oracle_search_browsers.sock --size 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+from typing import Optional
+
+from aiohttp import ClientSession, ClientError, ClientTimeout
+from selenium import webdriver
+
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+DEFAULT_GECKODRIVER = "/usr/local/bin/geckodriver"
+FIREFOX_ARGUMENTS = ("--headless", "--disable-gpu", "--no-sandbox", "--disable-dev-shm-usage")
+SESSION_TIMEOUT = ClientTimeout(total=60)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BrowserSlot:
+    def __init__(self, index: int):
+        self.index = index
+        self.port: Optional[int] = None
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.session_id: Optional[str] = None
+        self.capabilities: Optional[dict] = None
+
+    @property
+    def executor_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+class BrowserPoolServer:
+    def __init__(self, socket_path: str, size: int, geckodriver_path: str = DEFAULT_GECKODRIVER):
+        self.socket_path = socket_path
+        self.size = size
+        self.geckodriver_path = geckodriver_path
+        self.slots = [BrowserSlot(i) for i in range(size)]
+        self.free: asyncio.Queue[BrowserSlot] = asyncio.Queue()
+        self.waiting = 0
+        self.leases = 0
+        self.restarts = 0
+        self.capabilities = self._session_capabilities()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.http: Optional[ClientSession] = None
+
+    async def _spawn(self, slot: BrowserSlot):
+        slot.port = _free_port()
+        slot.process = await asyncio.create_subprocess_exec(
+            self.geckodriver_path,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(slot.port),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        for _ in range(50):
+            if await self._ready(slot):
+                await self._start_session(slot)
+                return
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"geckodriver on port {slot.port} did not become ready")
+
+    @staticmethod
+    def _session_capabilities() -> dict:
+        options = webdriver.FirefoxOptions()
+        for argument in FIREFOX_ARGUMENTS:
+            options.add_argument(argument)
+        return {"capabilities": {"firstMatch": [{}], "alwaysMatch": options.to_capabilities()}}
+
+    async def _start_session(self, slot: BrowserSlot):
+        async with self.http.post(f"{slot.executor_url}/session", json=self.capabilities, timeout=SESSION_TIMEOUT) as response:
+            value = (await response.json())["value"]
+        if "sessionId" not in value:
+            raise RuntimeError(f"geckodriver on port {slot.port} could not start a session: {value}")
+        slot.session_id = value["sessionId"]
+        slot.capabilities = value["capabilities"]
+
+    async def _end_session(self, slot: BrowserSlot):
+        """
+        반납된 세션을 끝냅니다. 워커가 이미 끝낸 세션이면 geckodriver 가 오류를 돌려주므로 무시하고,
+        끝난 뒤 geckodriver 가 새 세션을 받을 수 있는 상태인지 확인합니다.
+        """
+        session_id, slot.session_id = slot.session_id, None
+        if session_id is not None:
+            async with self.http.delete(f"{slot.executor_url}/session/{session_id}", timeout=SESSION_TIMEOUT):
+                pass
+        if not await self._ready(slot):
+            raise RuntimeError("session did not end")
+
+    async def _ready(self, slot: BrowserSlot) -> bool:
+        """
+        geckodriver 의 /status 는 세션이 없을 때만 ready 가 true 입니다.
+        """
+        try:
+            async with self.http.get(f"{slot.executor_url}/status") as response:
+                return (await response.json())["value"]["ready"]
+        except (ClientError, OSError, KeyError, ValueError):
+            return False
+
+    async def _kill(self, slot: BrowserSlot):
+        if slot.process and slot.process.returncode is None:
+            slot.process.kill()
+            await slot.process.wait()
+
+    async def _recycle(self, slot: BrowserSlot):
+        """
+        반납된 세션을 끝내고 새 세션을 띄운 뒤 슬롯을 돌려놓습니다. 실패하면 geckodriver 를 다시 띄웁니다.
+        """
+        try:
+            await self._end_session(slot)
+            await self._start_session(slot)
+        except (ClientError, OSError, asyncio.TimeoutError, KeyError, ValueError, RuntimeError) as e:
+            logger.warning(f"Browser slot {slot.index} was not released cleanly ({e!r}), restarting geckodriver")
+            self.restarts += 1
+            await self._kill(slot)
+            await self._spawn(slot)
+        self.free.put_nowait(slot)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = json.loads(await reader.readline() or "{}")
+            if request.get("op") == "stats":
+                writer.write(json.dumps(self.stats()).encode() + b"\n")
+                await writer.drain()
+                return
+            if request.get("op") != "acquire":
+                writer.write(json.dumps({"error": "unknown op"}).encode() + b"\n")
+                await writer.drain()
+                return
+
+            self.waiting += 1
+            try:
+                slot = await self.free.get()
+            finally:
+                self.waiting -= 1
+            self.leases += 1
+            try:
+                lease = {
+                    "executor": slot.executor_url,
+                    "slot": slot.index,
+                    "session_id": slot.session_id,
+                    "capabilities": slot.capabilities,
+                }
+                writer.write(json.dumps(lease).encode() + b"\n")
+                await writer.drain()
+                # 클라이언트가 연결을 닫을 때까지 lease 를 유지합니다.
+                await reader.read()
+            finally:
+                self.leases -= 1
+                await self._recycle(slot)
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.warning(f"Browser pool client error: {e}")
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "leased": self.leases,
+            "free": self.free.qsize(),
+            "waiting": self.waiting,
+            "restarts": self.restarts,
+        }
+
+    async def serve_forever(self):
+        self.http = ClientSession()
+        try:
+            for slot in self.slots:
+                await self._spawn(slot)
+                self.free.put_nowait(slot)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+            logger.info(f"Browser pool with {self.size} browser sessions listening on {self.socket_path}")
+            async with self.server:
+                await self.server.serve_forever()
+        finally:
+            for slot in self.slots:
+                await self._kill(slot)
+            await self.http.close()
+
+
+class PooledRemote(webdriver.Remote):
+    """
+    브라우저 풀에서 빌린 세션에 붙는 드라이버입니다. 새 세션을 만들지 않으며, quit 하면 세션은 그대로 두고 lease 만 반납합니다.
+    세션은 풀이 끝내고 다시 띄웁니다.
+    """
+
+    lease: socket.socket
+
+    def __init__(self, command_executor: str, options, session_id: str, capabilities: dict):
+        self._leased_session = (session_id, capabilities)
+        super().__init__(command_executor=command_executor, options=options)
+
+    def start_session(self, capabilities: dict) -> None:
+        self.session_id, self.caps = self._leased_session
+
+    def quit(self):
+        try:
+            self.stop_client()
+            self.command_executor.close()
+        finally:
+            self.lease.close()
+
+
+def connect_pooled_driver(socket_path: str, options, timeout: Optional[float] = None) -> PooledRemote:
+    """
+    브라우저 풀 서비스에서 미리 띄워 둔 세션 하나를 빌립니다.
+    executor 스레드에서 호출되는 동기 함수이며, 빈 슬롯이 없으면 timeout 초까지 기다립니다.
+    """
+    lease = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        lease.settimeout(timeout)
+        lease.connect(socket_path)
+        lease.sendall(b'{"op": "acquire"}\n')
+        with lease.makefile("r") as response:
+            leased = json.loads(response.readline())
+        lease.settimeout(None)
+        driver = PooledRemote(leased["executor"], options, leased["session_id"], leased["capabilities"])
+    except BaseException:
+        lease.close()
+        raise
+    driver.lease = lease
+    return driver
+
+
+def pool_stats(socket_path: str, timeout: float = 2.0) -> dict:
+    """
+    브라우저 풀 서비스의 슬롯 상태를 묻습니다. 서비스가 응답하지 않으면 timeout 초 뒤 socket.timeout 을 던집니다.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+        conn.sendall(b'{"op": "stats"}\n')
+        with conn.makefile("r") as response:
+            return json.loads(response.readline())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared browser pool service for oracle_search workers.")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--geckodriver", default=DEFAULT_GECKODRIVER)
+    args = parser.parse_args()
+    asyncio.run(BrowserPoolServer(args.socket, args.size, args.geckodriver).serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+이 프로세스가 띄운 셀레니움 드라이버와 브라우저 프로세스를 추적하고 정리합니다.
+
+- 드라이버를 만들면 드라이버 서비스(geckodriver, chromedriver)와 브라우저의 pid 를 등록합니다.
+- 종료(aquit)는 취소되어도 끝까지 실행되며, quit 이 실패하거나 browser_supervisor.quit_grace 초가 지나도 남은 프로세스는 강제로 종료합니다.
+- 주기적으로 실행되는 reaper 는 max_age 를 넘긴 드라이버(정리되지 않은 드라이버), 등록되지 않은 자식 브라우저 프로세스,
+  부모가 죽어 init 으로 넘어간 자동화 브라우저 프로세스(browser_supervisor.reap_reparented 를 켠 경우)를 종료합니다.
+- report() 는 살아 있는 드라이버별 pid, 경과 시간, RSS 를 반환하며 같은 값을 메트릭으로도 노출합니다.
+
+브라우저 풀 서비스(worker.browser_pool_socket)에서 빌린 드라이버는 프로세스를 서비스가 관리하므로 pid 없이 경과 시간만 추적합니다.
+"""
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from oracle_search import Shared
+from oracle_search.metrics import BROWSERS_ACTIVE, registry
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+DRIVER_PROCESS_NAMES = {"geckodriver", "chromedriver"}
+BROWSER_PROCESS_NAMES = {"firefox", "firefox-esr", "firefox-bin", "chrome", "chromium", "chromium-browser", "headless_shell"}
+# 사람이 띄운 브라우저를 건드리지 않도록 자동화로 실행된 브라우저의 명령행 인자를 확인합니다.
+AUTOMATION_FLAGS = ("-marionette", "--marionette", "--enable-automation", "--remote-debugging-port")
+
+BROWSERS_REAPED = registry.counter("oracle_search_browsers_reaped", "reaper 가 강제로 종료한 브라우저 프로세스 수", ("reason",))
+
+
+@dataclass
+class SupervisedBrowser:
+    driver: Any
+    owner: Optional[str]
+    pids: Set[int] = field(default_factory=set)
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.started
+
+
+def _process_tree(pid: int) -> List[Any]:
+    import psutil
+
+    try:
+        process = psutil.Process(pid)
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def _driver_pids(driver) -> Set[int]:
+    """
+    드라이버 서비스와 그 자식(브라우저와 콘텐츠 프로세스)의 pid 를 모읍니다. 원격 드라이버는 빈 집합을 반환합니다.
+    """
+    pids = set()
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is not None:
+        pids.update(child.pid for child in _process_tree(process.pid))
+    browser_pid = (getattr(driver, "capabilities", None) or {}).get("moz:processID")
+    if browser_pid:
+        pids.update(child.pid for child in _process_tree(browser_pid))
+    return pids
+
+
+def _is_automation_process(process) -> bool:
+    import psutil
+
+    try:
+        name = process.name()
+        if name in DRIVER_PROCESS_NAMES:
+            return True
+        return name in BROWSER_PROCESS_NAMES and any(flag in process.cmdline() for flag in AUTOMATION_FLAGS)
+    except psutil.Error:
+        return False
+
+
+def _kill(pids: Set[int], reason: str) -> int:
+    """
+    pid 와 그 자식 프로세스를 SIGKILL 로 종료하고 종료한 프로세스 수를 반환합니다.
+    """
+    import psutil
+
+    processes = {process.pid: process for pid in pids for process in _process_tree(pid)}
+    for process in processes.values():
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(list(processes.values()), timeout=3)
+    killed = len(processes) - len(alive)
+    if killed:
+        BROWSERS_REAPED.inc(killed, reason=reason)
+    return killed
+
+
+class BrowserSupervisor:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._browsers: Dict[int, SupervisedBrowser] = {}
+        # quit 한 드라이버의 pid -> 이 시각(monotonic)까지 끝나지 않으면 강제로 종료합니다.
+        self._retired: Dict[int, float] = {}
+        self._stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def register(self, driver, owner: Optional[str] = None):
+        try:
+            pids = _driver_pids(driver)
+        except ImportError:
+            pids = set()
+        with self._lock:
+            self._browsers[id(driver)] = SupervisedBrowser(driver, owner, pids)
+        self.start_reaper()
+
+    def quit(self, driver):
+        """
+        드라이버를 종료합니다. 동기 함수이므로 executor 스레드에서 호출합니다.
+        quit 이 실패해도 pid 는 정리 대상으로 남아 quit_grace 초 뒤 reaper 가 강제로 종료합니다.
+        """
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Failed to quit the selenium driver: {e}")
+        finally:
+            with self._lock:
+                browser = self._browsers.pop(id(driver), None)
+                if browser is not None:
+                    deadline = time.monotonic() + Shared.browser_supervisor.quit_grace
+                    self._retired.update(dict.fromkeys(browser.pids, deadline))
+
+    async def aquit(self, driver):
+        """
+        드라이버를 executor 에서 종료합니다. 이 코루틴이 취소되어도 종료 작업은 끝까지 실행됩니다.
+        """
+        await asyncio.shield(asyncio.get_running_loop().run_in_executor(None, self.quit, driver))
+
+    def reap(self) -> int:
+        """
+        정리되지 않은 드라이버와 남은 브라우저 프로세스를 종료하고 종료한 프로세스 수를 반환합니다.
+        """
+        import psutil
+
+        conf = Shared.browser_supervisor
+        now = time.monotonic()
+        with self._lock:
+            leaked = [key for key, browser in self._browsers.items() if browser.age > conf.max_age]
+            leaked = [self._browsers.pop(key) for key in leaked]
+            overdue = {pid for pid, deadline in self._retired.items() if deadline <= now}
+            for pid in overdue:
+                del self._retired[pid]
+            tracked = {pid for browser in self._browsers.values() for pid in browser.pids} | set(self._retired)
+
+        killed = 0
+        for browser in leaked:
+            logger.warning(f"Killing a selenium driver for {browser.owner} that was not quit after {browser.age:.0f}s")
+            # 응답하지 않는 브라우저에서 quit 이 오래 걸릴 수 있으므로 pid 를 바로 종료합니다.
+            killed += _kill(browser.pids, "leaked")
+        if overdue:
+            killed += _kill({pid for pid in overdue if psutil.pid_exists(pid)}, "quit_failed")
+
+        wall_now = time.time()
+        orphans = set()
+        for process in psutil.Process().children():
+            if process.pid not in tracked and _is_automation_process(process):
+                if wall_now - process.create_time() > conf.orphan_grace:
+                    orphans.add(process.pid)
+        if orphans:
+            killed += _kill(orphans, "untracked_child")
+
+        # 이 프로세스가 init(pid 1)이면 넘어온 프로세스가 모두 자식이므로 위의 untracked_child 정리로 충분합니다.
+        if conf.reap_reparented and os.getpid() != 1:
+            uid = os.getuid()
+            # 다른 드라이버가 쓰는 프로세스와 이 프로세스 아래의 프로세스는 건드리지 않습니다.
+            own = tracked | {process.pid for process in _process_tree(os.getpid())}
+            reparented = set()
+            for process in psutil.process_iter(["ppid", "uids", "create_time"]):
+                info = process.info
+                if info["ppid"] != 1 or process.pid in own or not info["uids"] or info["uids"].real != uid:
+                    continue
+                if wall_now - (info["create_time"] or wall_now) > conf.orphan_grace and _is_automation_process(process):
+                    reparented.add(process.pid)
+            if reparented:
+                killed += _kill(reparented, "reparented")
+
+        if killed:
+            logger.warning(f"Reaped {killed} browser processes")
+        return killed
+
+    def report(self) -> List[dict]:
+        """
+        살아 있는 드라이버별 owner, pid, 경과 시간(초), RSS(byte) 를 반환합니다.
+        """
+        import psutil
+
+        with self._lock:
+            browsers = list(self._browsers.values())
+        report = []
+        for browser in browsers:
+            rss = 0
+            pids = set(browser.pids)
+            for pid in browser.pids:
+                for process in _process_tree(pid):
+                    pids.add(process.pid)
+            for pid in pids:
+                try:
+                    rss += psutil.Process(pid).memory_info().rss
+                except psutil.Error:
+                    continue
+            report.append({"owner": browser.owner, "pids": sorted(pids), "age": browser.age, "rss": rss})
+        return report
+
+    def _run_reaper(self):
+        while not self._stop.wait(Shared.browser_supervisor.reap_interval):
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Browser reaper failed: {e}", exception=True)
+
+    def start_reaper(self):
+        conf = Shared.browser_supervisor
+        if conf is None or not conf.reap_interval or (self._reaper is not None and self._reaper.is_alive()):
+            return
+        try:
+            import psutil  # noqa: F401
+        except ImportError:
+            logger.warning("psutil is not installed, browser processes will not be reaped")
+            return
+        self._stop.clear()
+        self._reaper = threading.Thread(target=self._run_reaper, name="browser-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop_reaper(self):
+        if self._reaper is not None:
+            self._stop.set()
+            self._reaper.join()
+            self._reaper = None
+
+    def _metrics(self, key: str) -> dict:
+        report = self.report()
+        if key == "rss":
+            return {(): sum(browser["rss"] for browser in report)}
+        return {(): max((browser["age"] for browser in report), default=0)}
+
+
+browser_supervisor = BrowserSupervisor()
+
+
+def _apply_supervisor_conf(old, new):
+    # reaper 를 이미 실행 중이면 새 reap_interval 로 다시 시작합니다. 아직 드라이버를 만든 적이 없으면 register 때 시작합니다.
+    if browser_supervisor._reaper is not None:
+        browser_supervisor.stop_reaper()
+        browser_supervisor.start_reaper()
+
+
+Shared.subscribe("browser_supervisor", _apply_supervisor_conf)
+
+BROWSERS_ACTIVE.set_function(lambda: {(): len(browser_supervisor._browsers)})
+registry.gauge("oracle_search_browser_rss_bytes", "살아 있는 셀레니움 브라우저 프로세스의 RSS 합계").set_function(
+    lambda: browser_supervisor._metrics("rss")
+)
+registry.gauge("oracle_search_browser_oldest_seconds", "가장 오래 살아 있는 셀레니움 드라이버의 경과 시간").set_function(
+    lambda: browser_supervisor._metrics("age")
+)
@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("oracle_search_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]):
+    """
+    현재 컨텍스트에 timeout 초 뒤의 마감 시각을 설정합니다.
+    이미 더 이른 마감 시각이 설정되어 있으면 그 값을 유지합니다.
+    asyncio Task 는 생성 시점의 컨텍스트를 복사하므로, 이 블록 안에서 만든 Task 들은 같은 마감 시각을 따릅니다.
+
+    Args:
+        timeout (Optional[float]): 남은 시간(초). None 이면 마감 시각을 바꾸지 않습니다.
+    """
+    if timeout is None:
+        yield
+        return
+
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    마감 시각까지 남은 시간(초)을 반환합니다. 마감 시각이 없으면 None 을 반환합니다.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def stage_timeout(limit: float) -> float:
+    """
+    개별 단계의 대기 시간을 limit 과 마감까지 남은 시간 중 작은 값으로 제한합니다.
+    """
+    left = remaining()
+    return limit if left is None else min(limit, left)
@@ -0,0 +1,96 @@
+"""
+PDF 및 오피스 문서에서 텍스트를 추출하는 함수들입니다.
+프로세스 풀에서 실행되므로 모든 함수는 모듈 최상위에 정의되고 파일 경로만 인자로 받습니다.
+"""
+import re
+import zipfile
+from datetime import datetime
+from typing import List, Optional
+from xml.etree import ElementTree
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+CORE_NS = {
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+SLIDE_REGEX = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+DOCX_PAGE_PARAGRAPHS = 40
+
+
+def _pdf_date(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d") if value else None
+
+
+def read_pdf_info(path: str) -> dict:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    info = reader.metadata
+    return {
+        "page_count": len(reader.pages),
+        "title": info.title if info else None,
+        "description": info.subject if info else None,
+        "keywords": info.get("/Keywords") if info else None,
+        "published_date": _pdf_date(info.creation_date) if info else None,
+    }
+
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, min(stop, len(reader.pages)))]
+
+
+def read_office_info(path: str) -> dict:
+    with zipfile.ZipFile(path) as archive:
+        try:
+            root = ElementTree.fromstring(archive.read("docProps/core.xml"))
+        except KeyError:
+            return {"title": None, "description": None, "keywords": None, "published_date": None}
+
+    def text(tag: str) -> Optional[str]:
+        element = root.find(tag, CORE_NS)
+        return element.text if element is not None and element.text else None
+
+    created = text("dcterms:created")
+    return {
+        "title": text("dc:title"),
+        "description": text("dc:description") or text("dc:subject"),
+        "keywords": text("cp:keywords"),
+        "published_date": created[:10] if created else None,
+    }
+
+
+def extract_docx_pages(path: str) -> List[str]:
+    """
+    docx 에는 페이지 정보가 없으므로 문단 DOCX_PAGE_PARAGRAPHS 개를 한 페이지로 취급합니다.
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NS}p"):
+        text = "".join(node.text or "" for node in paragraph.iter(f"{WORD_NS}t")).strip()
+        if text:
+            paragraphs.append(text)
+    return [
+        "\n".join(paragraphs[i:i + DOCX_PAGE_PARAGRAPHS]) for i in range(0, len(paragraphs), DOCX_PAGE_PARAGRAPHS)
+    ]
+
+
+def extract_pptx_pages(path: str) -> List[str]:
+    with zipfile.ZipFile(path) as archive:
+        slides = sorted(
+            (int(match.group(1)), name) for name in archive.namelist() if (match := SLIDE_REGEX.match(name))
+        )
+        pages = []
+        for _, name in slides:
+            root = ElementTree.fromstring(archive.read(name))
+            lines = [
+                "".join(node.text or "" for node in paragraph.iter(f"{DRAWING_NS}t")).strip()
+                for paragraph in root.iter(f"{DRAWING_NS}p")
+            ]
+            pages.append("\n".join(line for line in lines if line))
+    return pages
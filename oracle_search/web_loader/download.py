@@ -0,0 +1,192 @@
+import codecs
+import os
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Optional, Tuple, Collection
+
+from aiohttp import ClientSession, ClientResponse
+
+from oracle_search import Shared
+
+HTML_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml"})
+TEXT_CONTENT_TYPES = HTML_CONTENT_TYPES | {"text/plain"}
+
+META_CHARSET_REGEX = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+SNIFF_BYTES = 4096
+
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+class DownloadError(Exception):
+    def __init__(self, url: str, message: str):
+        super().__init__(f"{message}: {url}")
+        self.url = url
+
+
+class UnsupportedContentTypeError(DownloadError):
+    def __init__(self, url: str, content_type: str):
+        super().__init__(url, f"Unsupported content type '{content_type}'")
+        self.content_type = content_type
+
+
+class ResponseTooLargeError(DownloadError):
+    def __init__(self, url: str, content_type: str, max_bytes: int):
+        super().__init__(url, f"Response of type '{content_type}' exceeds {max_bytes} bytes")
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+
+
+class HTTPStatusError(DownloadError):
+    def __init__(self, url: str, status: int, reason: Optional[str]):
+        super().__init__(url, f"HTTP {status} {reason or ''}".rstrip())
+        self.status = status
+
+
+@dataclass
+class DownloadedText:
+    url: str
+    content_type: str
+    charset: str
+    text: str
+
+
+@dataclass
+class DownloadedFile:
+    url: str
+    content_type: str
+    path: str
+    size: int
+
+
+def parse_content_type(header: Optional[str]) -> Tuple[str, Optional[str]]:
+    """
+    Content-Type 헤더를 MIME 타입과 charset 으로 분리합니다.
+    헤더가 없으면 빈 MIME 타입을 반환합니다.
+    """
+    if not header:
+        return "", None
+    mime, _, params = header.partition(";")
+    charset = None
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "charset" and value.strip():
+            charset = value.strip().strip("\"'")
+    return mime.strip().lower(), charset
+
+
+def _normalize_charset(charset: Optional[str]) -> Optional[str]:
+    if not charset:
+        return None
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return None
+
+
+def detect_charset(head: bytes, header_charset: Optional[str]) -> Optional[str]:
+    """
+    BOM -> Content-Type 헤더 -> <meta charset> 순서로 문서의 인코딩을 결정합니다.
+    찾지 못하면 None 을 반환합니다.
+    """
+    for bom, charset in BOMS:
+        if head.startswith(bom):
+            return charset
+    if charset := _normalize_charset(header_charset):
+        return charset
+    if match := META_CHARSET_REGEX.search(head[:SNIFF_BYTES]):
+        return _normalize_charset(match.group(1).decode("ascii", errors="ignore"))
+    return None
+
+
+def decode_body(body: bytearray, charset: Optional[str]) -> Tuple[str, str]:
+    """
+    버퍼를 한 번만 디코딩합니다. charset 을 모를 경우 utf-8 을 먼저 시도하고, 실패하면 대체 문자로 디코딩합니다.
+    """
+    if charset:
+        return body.decode(charset, errors="replace"), charset
+    try:
+        return body.decode("utf-8"), "utf-8"
+    except UnicodeDecodeError:
+        return body.decode("utf-8", errors="replace"), "utf-8"
+
+
+def check_status(response: ClientResponse, url: str):
+    """
+    4xx/5xx 응답을 HTTPStatusError 로 바꿔, 다른 다운로드 실패처럼 건너뛸 수 있게 합니다.
+    """
+    if response.status >= 400:
+        raise HTTPStatusError(url, response.status, response.reason)
+
+
+async def read_limited(response: ClientResponse, content_type: str) -> bytearray:
+    """
+    응답 본문을 청크 단위로 읽으며, content type 별 최대 크기를 넘으면 즉시 중단합니다.
+    """
+    max_bytes = Shared.web_fetch.max_bytes_for(content_type)
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise ResponseTooLargeError(str(response.url), content_type, max_bytes)
+
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(Shared.web_fetch.chunk_size):
+        body += chunk
+        if len(body) > max_bytes:
+            raise ResponseTooLargeError(str(response.url), content_type, max_bytes)
+    return body
+
+
+async def fetch_text(
+    session: ClientSession, url: str, allowed_types: Collection[str] = TEXT_CONTENT_TYPES
+) -> DownloadedText:
+    """
+    url 의 본문을 스트리밍으로 내려받아 디코딩된 문자열로 반환합니다.
+    허용되지 않은 MIME 타입이면 본문을 읽기 전에 UnsupportedContentTypeError 를 발생시킵니다.
+    Content-Type 헤더가 없는 응답은 HTML 로 간주합니다.
+    """
+    async with session.get(url) as response:
+        check_status(response, url)
+        content_type, header_charset = parse_content_type(response.headers.get("Content-Type"))
+        if content_type and content_type not in allowed_types:
+            raise UnsupportedContentTypeError(url, content_type)
+        content_type = content_type or "text/html"
+
+        body = await read_limited(response, content_type)
+        charset = detect_charset(bytes(body[:SNIFF_BYTES]), header_charset)
+        text, charset = decode_body(body, charset)
+        return DownloadedText(url=str(response.url), content_type=content_type, charset=charset, text=text)
+
+
+async def download_to_file(
+    session: ClientSession, url: str, allowed_types: Collection[str], suffix: str = ""
+) -> DownloadedFile:
+    """
+    url 의 본문을 메모리에 모으지 않고 임시 파일로 스트리밍합니다.
+    임시 파일은 호출자가 삭제해야 하며, 실패한 경우에는 이 함수가 삭제합니다.
+    """
+    async with session.get(url) as response:
+        check_status(response, url)
+        content_type, _ = parse_content_type(response.headers.get("Content-Type"))
+        if content_type not in allowed_types:
+            raise UnsupportedContentTypeError(url, content_type)
+
+        max_bytes = Shared.web_fetch.max_bytes_for(content_type)
+        if response.content_length is not None and response.content_length > max_bytes:
+            raise ResponseTooLargeError(url, content_type, max_bytes)
+
+        fd, path = tempfile.mkstemp(prefix="oracle_search_", suffix=suffix)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in response.content.iter_chunked(Shared.web_fetch.chunk_size):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ResponseTooLargeError(url, content_type, max_bytes)
+                    f.write(chunk)
+        except BaseException:
+            os.unlink(path)
+            raise
+        return DownloadedFile(url=str(response.url), content_type=content_type, path=path, size=size)
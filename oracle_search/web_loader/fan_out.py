@@ -0,0 +1,135 @@
+import math
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Literal, Optional, Set, Tuple, Union
+
+from oracle_search import Shared
+from oracle_search.models.base import SearchQuery
+from oracle_search.models.documents import WebContent, YoutubeTranscript
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.rerank import DocumentReranker, tokenize
+
+logger = setup_logger()
+
+# Google Custom Search API 가 한 번에 반환하는 최대 결과 수입니다.
+MAX_RESULTS_PER_QUERY = 10
+
+SearchResult = Dict[Literal["snippet", "title", "link"], str]
+
+
+def _trigrams(text: str) -> Set[str]:
+    normalized = f" {' '.join(tokenize(text))} "
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+def query_similarity(a: SearchQuery, b: SearchQuery) -> float:
+    """
+    글자 trigram 의 Jaccard 유사도입니다. 단어 단위 비교와 달리 복수형, 조사 차이에 덜 민감합니다.
+    """
+    trigrams_a, trigrams_b = _trigrams(a.query), _trigrams(b.query)
+    if not trigrams_a or not trigrams_b:
+        return 0.0
+    return len(trigrams_a & trigrams_b) / len(trigrams_a | trigrams_b)
+
+
+def merge_queries(queries: List[SearchQuery], threshold: float) -> List[SearchQuery]:
+    """
+    같은 언어 안에서 query_similarity 가 threshold 이상인 쿼리를 앞의 쿼리 하나로 합칩니다.
+    합쳐진 쿼리의 recent_days 는 더 넓은 기간을 따릅니다(-1 은 제한 없음).
+    """
+    merged: List[SearchQuery] = []
+    for query in queries:
+        for index, kept in enumerate(merged):
+            if kept.language.lower() == query.language.lower() and query_similarity(kept, query) >= threshold:
+                if kept.recent_days > 0 and (query.recent_days <= 0 or query.recent_days > kept.recent_days):
+                    merged[index] = kept.model_copy(update={"recent_days": query.recent_days})
+                break
+        else:
+            merged.append(query)
+    return merged
+
+
+class FanOutController:
+    """
+    생성된 검색 쿼리를 몇 번의 wave 로 나누어 실행하도록 계획합니다.
+
+    - 거의 같은 쿼리는 합치고, 언어별로 돌아가며 max_queries 개까지만 남깁니다.
+    - 한 wave 에는 언어마다 쿼리 하나씩을 넣고, 남은 링크 예산을 남은 쿼리 수로 나누어 쿼리당 결과 수를 정합니다.
+      앞선 쿼리가 중복 링크만 가져오면 남은 예산이 뒤 쿼리로 넘어갑니다.
+    - fetch 된 문서 중 거의 같은 문서를 제외하고 요청과 관련 있는 문서가 target_documents 개 모이면
+      더 이상 검색하지 않습니다.
+
+    fan_out.enabled 가 false 이면 기존처럼 모든 쿼리를 한 번에 쿼리당 3개씩 검색합니다.
+    """
+
+    def __init__(self, queries: List[SearchQuery], request: Optional[str] = None):
+        self.conf = Shared.fan_out
+        self.reranker = DocumentReranker(
+            request or " ".join(query.query for query in queries), max_distance=Shared.rerank.max_distance
+        )
+        self.seen_links = set()
+        self.relevant_documents = 0
+        self.waves = 0
+
+        if not self.conf.enabled:
+            self.link_budget = math.inf
+            self.pending: Dict[str, Deque[SearchQuery]] = {"": deque(queries)}
+            return
+
+        selected = self._select(merge_queries(queries, self.conf.merge_threshold))
+        if len(selected) < len(queries):
+            logger.info(f"Fan-out kept {len(selected)} of {len(queries)} generated queries")
+        self.link_budget = self.conf.max_links
+        self.pending = OrderedDict()
+        for query in selected:
+            self.pending.setdefault(query.language.lower(), deque()).append(query)
+
+    def _select(self, queries: List[SearchQuery]) -> List[SearchQuery]:
+        by_language: Dict[str, Deque[SearchQuery]] = OrderedDict()
+        for query in queries:
+            by_language.setdefault(query.language.lower(), deque()).append(query)
+        selected = []
+        while len(selected) < self.conf.max_queries and any(by_language.values()):
+            for language_queries in by_language.values():
+                if language_queries and len(selected) < self.conf.max_queries:
+                    selected.append(language_queries.popleft())
+        return selected
+
+    @property
+    def satisfied(self) -> bool:
+        return self.conf.enabled and self.relevant_documents >= self.conf.target_documents
+
+    def next_wave(self) -> List[Tuple[SearchQuery, int]]:
+        """
+        다음에 실행할 (쿼리, 결과 수) 목록을 반환합니다. 더 검색할 필요가 없으면 빈 목록을 반환합니다.
+        """
+        if self.satisfied or self.link_budget <= 0:
+            return []
+        if not self.conf.enabled:
+            wave = list(self.pending[""])
+            self.pending[""].clear()
+            return [(query, 3) for query in wave]
+
+        remaining_queries = sum(len(language_queries) for language_queries in self.pending.values())
+        if not remaining_queries:
+            return []
+        per_query = max(1, min(MAX_RESULTS_PER_QUERY, math.ceil(self.link_budget / remaining_queries)))
+        wave = [language_queries.popleft() for language_queries in self.pending.values() if language_queries]
+        self.waves += 1
+        return [(query, per_query) for query in wave]
+
+    def accept_results(self, results: List[List[SearchResult]]) -> List[SearchResult]:
+        """
+        wave 의 검색 결과에서 이미 본 링크를 빼고 링크 예산만큼만 남깁니다.
+        """
+        accepted = []
+        for result in (item for query_results in results for item in query_results if "link" in item):
+            if result["link"] in self.seen_links or len(accepted) >= self.link_budget:
+                continue
+            self.seen_links.add(result["link"])
+            accepted.append(result)
+        self.link_budget -= len(accepted)
+        return accepted
+
+    def add_document(self, document: Union[WebContent, YoutubeTranscript]):
+        if self.reranker.add(document) and self.reranker.score(len(self.reranker.documents) - 1) > 0:
+            self.relevant_documents += 1
@@ -1,32 +1,57 @@
+import asyncio
 import platform
 import re
-import traceback
+import time
 from abc import ABC, abstractmethod
 from functools import wraps
-from typing import Union, TypeVar, Generic, Type
+from typing import Union, TypeVar, Generic, Type, List, Optional
 
-import trafilatura
 from aiohttp import ClientSession
-from bs4 import BeautifulSoup
-from htmldate import find_date
-from readability import Document
-from selenium import webdriver
-import html2text
 
 from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.metrics import (
+    BROWSER_STARTS,
+    CACHE_LOOKUPS,
+    EXTRACT_SECONDS,
+    FETCH_SECONDS,
+    registry,
+)
 from oracle_search.pretty_logger import setup_logger
 
-from oracle_search.models.documents import WebContent, YoutubeTranscript
+from oracle_search.models.documents import WebContent, YoutubeTranscript, touch_body
+from oracle_search.web_loader.download import DownloadError, UnsupportedContentTypeError, fetch_text
+from oracle_search.web_loader.browser_supervisor import browser_supervisor
+from oracle_search.web_loader.deadline import deadline_scope, remaining
+from oracle_search.web_loader.hedging import hedged_race
+from oracle_search.web_loader.single_flight import single_flight
+from oracle_search.web_loader.worker_stats import worker_stats
 from datetime import timedelta
 
 
 logger = setup_logger()
 
-YOUTUBE_REGEX = re.compile(r"(?:https?://)?(?:www\.)?(?:youtube\.com|youtu\.be)/(?:watch\?v=)?(.+)")
+# watch?v=, youtu.be/, shorts/, embed/, live/ 형식의 URL 에서 11자리 영상 ID 만 가져옵니다. (재생목록, 시작 시각 등의 쿼리는 제외)
+YOUTUBE_REGEX = re.compile(
+    r"(?:https?://)?(?:www\.|m\.|music\.)?"
+    r"(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|shorts/|embed/|live/|v/)|youtu\.be/)"
+    r"([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])"
+)
+
+
+def parse_video_id(url: str) -> Optional[str]:
+    match = YOUTUBE_REGEX.search(url)
+    return match.group(1) if match else None
+
+
+# selenium, bs4, trafilatura, readability, htmldate, lxml 은 import 비용이 크므로
+# 이 모듈을 import 할 때가 아니라 처음 사용하는 함수 안에서 import 합니다.
 
 
 def get_selenium_driver():
     # TODO: 드라이버를 매번 로드하지 않도록 수정하여 속도를 빠르게
+    from selenium import webdriver
+
     if "linux" in platform.system().lower():
         # Set up Firefox options
         options = webdriver.FirefoxOptions()
@@ -35,6 +60,12 @@ def get_selenium_driver():
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
 
+        if Shared.worker.browser_pool_socket:
+            # 여러 워커가 함께 쓰는 브라우저 풀 서비스에서 geckodriver 를 빌립니다.
+            from oracle_search.web_loader.browser_pool import connect_pooled_driver
+
+            return connect_pooled_driver(Shared.worker.browser_pool_socket, options, timeout=Shared.worker.wait_timeout)
+
         # Set up the Gecko driver
         service = webdriver.FirefoxService("/usr/local/bin/geckodriver")
         driver = webdriver.Firefox(service=service, options=options)
@@ -48,9 +79,56 @@ def get_selenium_driver():
     return driver
 
 
+async def aget_selenium_driver(owner: Optional[str] = None):
+    """
+    브라우저 실행을 executor 에서 수행하고 browser_supervisor 에 등록합니다.
+    실행 도중 취소되면 뒤늦게 생성된 드라이버를 종료하여 브라우저 프로세스가 남지 않도록 합니다.
+    종료는 반드시 aquit_selenium_driver 로 해야 합니다.
+    """
+
+    def start():
+        driver = get_selenium_driver()
+        # 취소와 상관없이 드라이버가 만들어지자마자 등록해야 reaper 가 추적할 수 있습니다.
+        browser_supervisor.register(driver, owner)
+        return driver
+
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, start)
+    try:
+        with BROWSER_STARTS.time(pooled=bool(Shared.worker.browser_pool_socket)):
+            driver = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        def quit_orphan(done):
+            if not done.cancelled() and done.exception() is None:
+                loop.run_in_executor(None, browser_supervisor.quit, done.result())
+
+        future.add_done_callback(quit_orphan)
+        raise
+    return driver
+
+
+async def aquit_selenium_driver(driver):
+    await browser_supervisor.aquit(driver)
+
+
+def _browser_pool_slots() -> dict:
+    socket_path = Shared.worker.browser_pool_socket if Shared.worker else None
+    if not socket_path:
+        return {}
+    from oracle_search.web_loader.browser_pool import pool_stats
+
+    stats = pool_stats(socket_path)
+    return {(state,): stats[state] for state in ("size", "leased", "free", "waiting")}
+
+
+registry.gauge(
+    "oracle_search_browser_pool_slots", "공유 브라우저 풀의 슬롯 상태(worker.browser_pool_socket 사용 시)", ("state",)
+).set_function(_browser_pool_slots)
+
+
 def html_to_markdown(html: str, include_images: bool = False, include_links: bool = True) -> str:
     """
-    HTML을 마크다운으로 변환합니다.
+    HTML을 마크다운으로 변환합니다. 줄 단위로 받아 쓰려면 oracle_search.web_loader.markdown.iter_markdown 을 사용합니다.
 
     Args:
         html (str): 변환할 HTML 문자열.
@@ -60,15 +138,9 @@ def html_to_markdown(html: str, include_images: bool = False, include_links: boo
     Returns:
         str: 마크다운 형식의 문자열.
     """
-    h = html2text.HTML2Text()
-    h.ignore_links = not include_links
-    h.ignore_images = not include_images
-    h.skip_internal_links = True
-    h.bypass_tables = False
-    h.mark_code = True
-    h.escape_snob = True
-    h.body_width = 0  # 텍스트 줄바꿈 비활성화
-    return "\n".join([line.strip() for line in h.handle(html).split("\n")])
+    from oracle_search.web_loader.markdown import convert
+
+    return convert(html, include_images=include_images, include_links=include_links)
 
 
 T = TypeVar("T", bound=Union[WebContent, YoutubeTranscript])
@@ -77,25 +149,60 @@ T = TypeVar("T", bound=Union[WebContent, YoutubeTranscript])
 def cached_fetch(func):
     @wraps(func)
     async def wrapper(self, *args, refresh=False, **kwargs):
-        web_cache = Shared.disk_cache.web_cache
-        cache_key = f"{self.__class__.__name__}:{self.url}"
+        cache_key = self.cache_key
+        # 결과 캐시 외에 자체 캐시(e.g. 문단, 자막)를 쓰는 fetcher 도 그 캐시를 건너뛸 수 있도록 알려 줍니다.
+        self.refresh = refresh
+
+        def decode(cached_result):
+            if cached_result is None:
+                return None
+            # 이전 형식(pickle 된 dict)으로 저장된 항목도 읽을 수 있도록 합니다.
+            if isinstance(cached_result, dict):
+                result = self.output_type.model_validate(cached_result)
+            else:
+                result = self.output_type.from_bytes(cached_result)
+            # 본문은 따로 만료되거나 용량 제한으로 밀려날 수 있으므로, 본문이 없으면 캐시에 없는 것으로 보고 다시 가져옵니다.
+            # 본문이 있으면 결과 항목만큼은 남아 있도록 만료 시각을 늘립니다.
+            if result.body_ref is not None and not touch_body(result.body_ref):
+                logger.warning(f"Cached body of {self.url} is gone, fetching again")
+                return None
+            # cache_key 가 URL 이 아닌 값(e.g. 영상 ID)이면 다른 URL 로 저장된 결과일 수 있으므로 요청한 URL 로 맞춥니다.
+            result.source = self.url
+            result.metadata["source"] = self.url
+            return result
+
+        def lookup():
+            return decode(async_cache.get(cache_key))
 
         if not refresh:
-            cached_result = web_cache.get(cache_key)
+            # 본문 확인도 SQLite 를 읽으므로 조회 전체를 async_cache 의 읽기 스레드에서 실행합니다.
+            cached_result = await asyncio.get_running_loop().run_in_executor(async_cache.read_pool(), lookup)
             if cached_result is not None:
                 logger.info(f"Cache hit for {self.url}")
-                return self.output_type.validate(cached_result)
-
-        result = await func(self, *args, **kwargs)
-        if result is not None:
-            try:
-                web_cache.set(cache_key, result.dict(), expire=timedelta(days=1).total_seconds())
-                logger.info(f"{'Refreshed' if refresh else 'Cached'} result for {self.url}")
-            except Exception as e:
-                trace = traceback.format_exc()
-                logger.error(f"Failed to cache result for {self.url}: {e}\n{trace}")
-
-        return result
+                worker_stats.record("cache_hits")
+                CACHE_LOOKUPS.inc(fetcher=self.__class__.__name__, result="hit")
+                return cached_result
+            worker_stats.record("cache_misses")
+            CACHE_LOOKUPS.inc(fetcher=self.__class__.__name__, result="miss")
+
+        async def compute():
+            result = await func(self, *args, **kwargs)
+            worker_stats.record("fetches")
+            if result is not None and not self.is_partial:
+                try:
+                    # 본문은 내용 해시로 따로 저장하고 캐시 항목에는 메타데이터와 body_ref 만 기록합니다.
+                    # 두 쓰기 모두 async_cache 의 쓰기 버퍼를 거쳐 writer 스레드가 한 트랜잭션으로 기록합니다.
+                    data = result.to_bytes(write_behind=True)
+                    await async_cache.aset(cache_key, data, expire=timedelta(days=1).total_seconds())
+                    logger.info(f"{'Refreshed' if refresh else 'Cached'} result for {self.url}")
+                except Exception as e:
+                    logger.error(f"Failed to cache result for {self.url}: {e}", exception=True)
+            return result
+
+        if refresh:
+            return await compute()
+        # 같은 URL 을 여러 코루틴이나 워커가 동시에 가져오지 않도록 합니다.
+        return await single_flight(cache_key, compute, lookup)
 
     return wrapper
 
@@ -113,15 +220,25 @@ class WebContentFetcher(ABC, Generic[T]):
                         -> WebContent 또는 YoutubeTranscript 객체 리턴
                          -> _finalize -> fetch 작업 완료 후 필요한 정리 작업 수행 (e.g. driver 종료)
 
+    hedge_delay 가 설정되어 있고 alternates 가 대체 Fetcher 를 반환하면,
+    기본 fetch 가 hedge_delay 초 안에 끝나지 않을 때 대체 Fetcher 를 함께 실행하여 먼저 성공한 결과를 사용합니다.
+
+    fetch 는 timeout 초(설정의 web_fetch.fetcher_timeouts 로 클래스별 변경 가능)와
+    호출자가 deadline_scope 로 지정한 마감 시각 중 이른 쪽이 지나면 취소됩니다.
+    취소되면 _finalize 로 자원을 정리하고 _partial_result 가 돌려주는 부분 결과를 반환합니다.
     """
 
     output_type: Type[T]
+    hedge_delay: Optional[float] = None
+    timeout: float = 20.0
 
     def __init__(self, url: str):
         self.url = url
         self.html = None
         self.soup = None
         self.content = None
+        self.is_partial = False
+        self.refresh = False
 
     @abstractmethod
     async def _fetch_html(self):
@@ -164,6 +281,47 @@ class WebContentFetcher(ABC, Generic[T]):
         """
         pass
 
+    @property
+    def cache_key(self) -> str:
+        """
+        fetch 결과를 캐시하고 동시 실행을 합치는 키입니다. 결과가 URL 외의 값에 따라 달라지는 Fetcher 는 재정의합니다.
+        """
+        return f"{self.__class__.__name__}:{self.url}"
+
+    def alternates(self) -> List["WebContentFetcher[T]"]:
+        """
+        같은 콘텐츠를 다른 URL 이나 방식으로 가져오는 대체 Fetcher 들을 반환합니다. (e.g. 모바일 페이지, raw 파일)
+        """
+        return []
+
+    def _partial_result(self) -> Optional[T]:
+        """
+        시간 초과로 취소되었을 때 그때까지 가져온 내용으로 만들 수 있는 결과를 반환합니다.
+        """
+        return None
+
+    async def _hedged_fetch(self) -> T:
+        alternates = self.alternates() if self.hedge_delay is not None else []
+        if not alternates:
+            return await self._fetch()
+
+        async def run_alternate(fetcher: WebContentFetcher[T]) -> T:
+            try:
+                result = await fetcher._fetch()
+            finally:
+                await fetcher._finalize()
+            logger.info(f"Alternate {fetcher.url} won the hedged fetch for {self.url}")
+            return result
+
+        attempts = [self._fetch] + [lambda fetcher=fetcher: run_alternate(fetcher) for fetcher in alternates]
+        result = await hedged_race(
+            attempts, self.hedge_delay, is_good=lambda content: bool(content and content.page_content.strip())
+        )
+        if result is not None:
+            result.source = self.url
+            result.metadata["source"] = self.url
+        return result
+
     async def _fetch(self) -> T:
         """
         self.url 에서 콘텐츠와 메타데이터를 가져와 WebContent 또는 YoutubeTranscript 형식으로 반환합니다.
@@ -182,15 +340,27 @@ class WebContentFetcher(ABC, Generic[T]):
         콘텐츠를 가져오는 주요 메서드입니다.
         먼저 이전에 컨텐츠를 가져온 적이 있으면 바로 반환하고, 그렇지 않으면 _fetch 메서드를 호출하여 콘텐츠를 가져옵니다.
         """
+        if self.content:
+            return self.content
+        started = time.perf_counter()
+        outcome = "ok"
         try:
-            if self.content:
-                return self.content
-            self.content = await self._fetch()
+            with deadline_scope(Shared.web_fetch.timeout_for(self.__class__.__name__, self.timeout)):
+                self.content = await asyncio.wait_for(self._hedged_fetch(), remaining())
+        except asyncio.TimeoutError:
+            self.content = self._partial_result()
+            self.is_partial = self.content is not None
+            outcome = "partial" if self.is_partial else "timeout"
+            logger.warning(f"Timed out fetching {self.url} ({'partial' if self.content else 'no'} content)")
+        except DownloadError as e:
+            outcome = "skipped"
+            logger.warning(f"Skipped content for {self.url}: {e}")
         except Exception as e:
-            trace = traceback.format_exc()
-            logger.error(f"Failed to fetch content for {self.url}: {e}\n{trace}")
+            outcome = "error"
+            logger.error(f"Failed to fetch content for {self.url}: {e}", exception=True)
         finally:
             await self._finalize()
+            FETCH_SECONDS.observe(time.perf_counter() - started, fetcher=self.__class__.__name__, outcome=outcome)
         return self.content
 
 
@@ -204,22 +374,52 @@ class DefaultWebFetcher(WebContentFetcher[WebContent]):
     def __init__(self, url: str, session: ClientSession):
         super().__init__(url)
         self.session = session
+        self.content_type = None
 
     async def _fetch_html(self):
-        async with self.session.get(self.url) as response:
-            self.html = await response.text()
+        """
+        HTML 이 아닌 응답은 본문을 읽기 전에 중단하고, 크기 제한을 넘는 응답은 읽는 도중 중단합니다.
+        디코딩된 문자열 하나를 BeautifulSoup, readability, trafilatura 가 공유합니다.
+        """
+        from bs4 import BeautifulSoup
+
+        downloaded = await fetch_text(self.session, self.url)
+        self.content_type = downloaded.content_type
+        self.html = downloaded.text
         self.soup = BeautifulSoup(self.html, "html.parser")
 
     async def _post_process(self, content) -> str:
         return content
 
+    async def _fetch(self) -> WebContent:
+        """
+        확장자로는 알 수 없었던 PDF, 오피스 문서 응답은 DocumentFetcher 로 넘깁니다.
+        """
+        try:
+            return await super()._fetch()
+        except UnsupportedContentTypeError as e:
+            # document 모듈이 이 모듈을 import 하므로 순환 import 를 피하기 위해 여기서 import 합니다.
+            from oracle_search.web_loader.fetchers.document import DOCUMENT_CONTENT_TYPES, DocumentFetcher
+
+            if e.content_type not in DOCUMENT_CONTENT_TYPES:
+                raise
+            fetcher = DocumentFetcher(self.url, self.session)
+            try:
+                return await fetcher._fetch()
+            finally:
+                await fetcher._finalize()
+
     async def _fetch_content(self) -> str:
         """
         readability와 trafilatura를 사용하여 콘텐츠를 추출합니다.
         둘 중 더 긴 콘텐츠를 반환합니다.
         """
-        readability_content = html_to_markdown(Document(self.html).summary())
-        trafilatura_content = trafilatura.extract(self.html, output_format="markdown")
+        import trafilatura
+        from readability import Document
+
+        with EXTRACT_SECONDS.time(fetcher=self.__class__.__name__):
+            readability_content = html_to_markdown(Document(self.html).summary())
+            trafilatura_content = trafilatura.extract(self.html, output_format="markdown")
 
         if readability_content and trafilatura_content and len(readability_content) > len(trafilatura_content):
             return readability_content
@@ -230,6 +430,8 @@ class DefaultWebFetcher(WebContentFetcher[WebContent]):
             return html_to_markdown(self.html)
 
     async def _fetch_metadata(self) -> dict:
+        from htmldate import find_date
+
         metadata = {
             "title": self.soup.find("title").text if self.soup.find("title") else None,
             "description": self.soup.find("meta", {"name": "description"})["content"]
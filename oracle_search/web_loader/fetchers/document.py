@@ -0,0 +1,176 @@
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from urllib.parse import urlparse
+
+from aiohttp import ClientSession
+
+from oracle_search import Shared
+from oracle_search.models.documents import WebContent
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader import document_text
+from oracle_search.web_loader.download import download_to_file
+from oracle_search.web_loader.fetchers.base import WebContentFetcher
+
+logger = setup_logger()
+
+DOCUMENT_CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": "pptx",
+}
+DOCUMENT_EXTENSIONS = {".pdf": "pdf", ".docx": "docx", ".pptx": "pptx"}
+GENERIC_CONTENT_TYPES = {"application/octet-stream", "binary/octet-stream"}
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=Shared.document_fetch.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def _resize_process_pool(old, new):
+    """
+    document_fetch.max_workers 가 바뀌면 다음 요청부터 새 크기의 풀을 사용합니다. 진행 중인 작업은 기존 풀에서 끝납니다.
+    """
+    global _process_pool
+    if _process_pool is not None and (old is None or old.max_workers != new.max_workers):
+        _process_pool.shutdown(wait=False)
+        _process_pool = None
+
+
+Shared.subscribe("document_fetch", _resize_process_pool)
+
+
+def approximate_tokens(text: str) -> int:
+    return len(text.encode("utf-8")) // 4
+
+
+def document_kind_from_url(url: str) -> Optional[str]:
+    return DOCUMENT_EXTENSIONS.get(os.path.splitext(urlparse(url).path)[1].lower())
+
+
+class DocumentFetcher(WebContentFetcher[WebContent]):
+    """
+    PDF, docx, pptx 문서를 가져오는 Fetcher 입니다.
+    문서를 임시 파일로 내려받은 뒤 프로세스 풀에서 페이지 단위로 텍스트를 추출하며,
+    페이지 수 또는 토큰 수 한도를 넘으면 남은 페이지는 추출하지 않습니다.
+    """
+
+    output_type = WebContent
+
+    def __init__(self, url: str, session: ClientSession):
+        super().__init__(url)
+        self.session = session
+        self.kind = document_kind_from_url(url)
+        self.path = None
+        self.info = None
+
+    async def _fetch_html(self):
+        downloaded = await download_to_file(
+            self.session,
+            self.url,
+            allowed_types=DOCUMENT_CONTENT_TYPES.keys() | GENERIC_CONTENT_TYPES,
+            suffix=f".{self.kind}" if self.kind else "",
+        )
+        self.path = downloaded.path
+        self.kind = DOCUMENT_CONTENT_TYPES.get(downloaded.content_type, self.kind)
+        if self.kind is None:
+            raise ValueError(f"Could not determine document type of {self.url} ({downloaded.content_type})")
+
+        loop = asyncio.get_running_loop()
+        if self.kind == "pdf":
+            self.info = await loop.run_in_executor(get_process_pool(), document_text.read_pdf_info, self.path)
+        else:
+            self.info = await loop.run_in_executor(get_process_pool(), document_text.read_office_info, self.path)
+
+    async def _extract_pdf_pages(self) -> List[str]:
+        """
+        max_workers 개의 페이지 묶음만 동시에 제출하고, 앞에서부터 순서대로 결과를 모읍니다.
+        토큰 한도를 넘으면 대기 중인 작업을 취소합니다.
+        """
+        conf = Shared.document_fetch
+        loop = asyncio.get_running_loop()
+        page_count = min(self.info["page_count"], conf.max_pages)
+        starts = iter(range(0, page_count, conf.pages_per_task))
+        in_flight = deque()
+
+        def submit_next():
+            start = next(starts, None)
+            if start is not None:
+                in_flight.append(
+                    loop.run_in_executor(
+                        get_process_pool(),
+                        document_text.extract_pdf_pages,
+                        self.path,
+                        start,
+                        min(start + conf.pages_per_task, page_count),
+                    )
+                )
+
+        for _ in range(conf.max_workers):
+            submit_next()
+
+        pages, tokens = [], 0
+        try:
+            while in_flight:
+                for page in await in_flight.popleft():
+                    pages.append(page)
+                    tokens += approximate_tokens(page)
+                    if tokens >= conf.max_tokens:
+                        logger.info(f"Token budget reached after {len(pages)} pages of {self.url}")
+                        return pages
+                submit_next()
+        finally:
+            for future in in_flight:
+                future.cancel()
+        return pages
+
+    async def _fetch_content(self) -> str:
+        if self.kind == "pdf":
+            pages = await self._extract_pdf_pages()
+        else:
+            extract = document_text.extract_docx_pages if self.kind == "docx" else document_text.extract_pptx_pages
+            pages = await asyncio.get_running_loop().run_in_executor(get_process_pool(), extract, self.path)
+
+        conf = Shared.document_fetch
+        sections, tokens = [], 0
+        for number, page in enumerate(pages[:conf.max_pages], start=1):
+            if tokens >= conf.max_tokens:
+                break
+            sections.append(f"## Page {number}\n\n{page.strip()}")
+            tokens += approximate_tokens(page)
+        return "\n\n".join(sections)
+
+    async def _post_process(self, content) -> str:
+        return content
+
+    async def _fetch_metadata(self) -> dict:
+        return {
+            "title": self.info.get("title"),
+            "description": self.info.get("description"),
+            "keywords": self.info.get("keywords"),
+            "published_date": self.info.get("published_date"),
+            "source": self.url,
+        }
+
+    async def _fetch(self) -> WebContent:
+        if not self.path:
+            await self._fetch_html()
+        metadata = await self._fetch_metadata()
+        content = await self.fetch_content()
+        metadata["summary"] = None
+        return WebContent(page_content=content, source=self.url, metadata=metadata)
+
+    async def _finalize(self):
+        if self.path:
+            os.unlink(self.path)
+            self.path = None
@@ -1,34 +1,125 @@
 import asyncio
-import traceback
+import json
 from abc import ABC
+from typing import List, Literal, Optional
+from urllib.parse import urlparse
 
-from bs4 import BeautifulSoup
-from selenium.common import TimeoutException
-from selenium.webdriver.common.by import By
+from aiohttp import ClientSession
 
 from oracle_search.models.documents import WebContent
 from oracle_search.pretty_logger import setup_logger
 
-from oracle_search.web_loader.fetchers.base import WebContentFetcher, get_selenium_driver
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from oracle_search.web_loader.deadline import remaining, stage_timeout
+from oracle_search.web_loader.download import fetch_text
+from oracle_search.web_loader.fetchers.base import (
+    WebContentFetcher,
+    DefaultWebFetcher,
+    aget_selenium_driver,
+    aquit_selenium_driver,
+)
 
 logger = setup_logger()
 
 
+def to_raw_url(url: str) -> Optional[str]:
+    """
+    github.com/{owner}/{repo}/blob/{ref}/{path} 형태의 URL 을 raw.githubusercontent.com URL 로 변환합니다.
+    """
+    parts = urlparse(url).path.strip("/").split("/")
+    if len(parts) < 5 or parts[2] != "blob":
+        return None
+    owner, repo, _, ref, *path = parts
+    return f"https://raw.githubusercontent.com/{owner}/{repo}/{ref}/{'/'.join(path)}"
+
+
+def notebook_to_markdown(notebook: str) -> str:
+    cells = []
+    for cell in json.loads(notebook).get("cells", []):
+        source = "".join(cell.get("source", []))
+        if cell.get("cell_type") == "code":
+            cells.append(f"```\n{source}\n```")
+        else:
+            cells.append(source)
+    return "\n\n".join(cells)
+
+
+class GitHubRawFetcher(DefaultWebFetcher):
+    """
+    브라우저 없이 raw.githubusercontent.com 에서 파일 원문을 가져오는 Fetcher 입니다.
+    GitHub Fetcher 들의 hedge 대체 경로로 사용됩니다.
+    """
+
+    def __init__(self, url: str, session: ClientSession, kind: Literal["markdown", "notebook", "code"]):
+        super().__init__(url, session)
+        self.blob_url = url
+        self.raw_url = to_raw_url(url)
+        self.kind = kind
+
+    async def _fetch_html(self):
+        downloaded = await fetch_text(self.session, self.raw_url)
+        self.content_type = downloaded.content_type
+        self.html = downloaded.text
+
+    async def _fetch_content(self) -> str:
+        if self.kind == "notebook":
+            return notebook_to_markdown(self.html)
+        if self.kind == "code":
+            return f"```\n{self.html}\n```"
+        return self.html
+
+    async def _fetch_metadata(self) -> dict:
+        owner, repo, _, ref, *path = urlparse(self.blob_url).path.strip("/").split("/")
+        return {
+            "title": f"{repo}/{'/'.join(path)} at {ref} · {owner}/{repo}",
+            "description": None,
+            "keywords": None,
+            "published_date": None,
+            "source": self.blob_url,
+        }
+
+
 class GitHubFetcherBase(WebContentFetcher[WebContent], ABC):
     output_type = WebContent
+    hedge_delay = 3.0
+    timeout = 30.0
+    raw_kind: Literal["markdown", "notebook", "code"]
 
-    def __init__(self, url: str):
+    def __init__(self, url: str, session: Optional[ClientSession] = None):
         super().__init__(url)
+        self.session = session
         self.driver = None
 
+    def alternates(self) -> List[WebContentFetcher[WebContent]]:
+        """
+        브라우저 렌더링이 느린 경우를 대비해 raw 파일을 직접 가져오는 Fetcher 를 대체 경로로 사용합니다.
+        """
+        if self.session is None or to_raw_url(self.url) is None:
+            return []
+        return [GitHubRawFetcher(self.url, self.session, self.raw_kind)]
+
     async def _fetch_html(self):
-        self.driver = get_selenium_driver()
+        self.driver = await aget_selenium_driver(owner=self.url)
+        self.driver.set_page_load_timeout(stage_timeout(30))
         await asyncio.get_event_loop().run_in_executor(None, self.driver.get, self.url)
-        await asyncio.get_event_loop().run_in_executor(None, self.driver.implicitly_wait, 10)
+        await asyncio.get_event_loop().run_in_executor(None, self.driver.implicitly_wait, stage_timeout(10))
+
+    async def _wait_visible(self, css_selector: str):
+        """
+        css_selector 요소가 보일 때까지 기다립니다. 시간 안에 나타나지 않으면 selenium 의 TimeoutException 이 발생합니다.
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        return await asyncio.get_event_loop().run_in_executor(
+            None,
+            WebDriverWait(self.driver, stage_timeout(10)).until,
+            EC.visibility_of_element_located((By.CSS_SELECTOR, css_selector)),
+        )
 
     async def _fetch_metadata(self) -> dict:
+        from bs4 import BeautifulSoup
+
         metadata = {
             "title": self.driver.title,
             "description": None,
@@ -43,7 +134,11 @@ class GitHubFetcherBase(WebContentFetcher[WebContent], ABC):
                 soup = BeautifulSoup(self.driver.page_source, "html.parser")
                 last_commit_element = soup.find("relative-time")
                 published_date = last_commit_element["datetime"]
+                break
             except TypeError:
+                left = remaining()
+                if left is not None and left <= 1:
+                    break
                 await asyncio.sleep(1)
 
         metadata["published_date"] = published_date
@@ -51,40 +146,36 @@ class GitHubFetcherBase(WebContentFetcher[WebContent], ABC):
 
     async def _finalize(self):
         if self.driver:
-            await asyncio.get_event_loop().run_in_executor(None, self.driver.quit)
+            driver, self.driver = self.driver, None
+            await aquit_selenium_driver(driver)
 
 
 class GitHubMarkdownFetcher(GitHubFetcherBase):
+    raw_kind = "markdown"
+
     async def _fetch_content(self) -> str:
+        from selenium.common import TimeoutException
+
         try:
-            markdown_body = await asyncio.get_event_loop().run_in_executor(
-                None,
-                WebDriverWait(self.driver, 10).until,
-                EC.visibility_of_element_located((By.CSS_SELECTOR, "article.markdown-body")),
-            )
+            markdown_body = await self._wait_visible("article.markdown-body")
             content = markdown_body.get_attribute("innerHTML")
         except TimeoutException as e:
-            trace = traceback.format_exc()
-            logger.warning(f"Failed to extract GitHub Markdown content for {self.url}: {e}\n{trace}")
+            logger.warning(f"Failed to extract GitHub Markdown content for {self.url}: {e}", exception=True)
             content = None
         return content
 
 
 class GitHubJupyterNotebookFetcher(GitHubFetcherBase):
+    raw_kind = "notebook"
+
     async def _fetch_content(self) -> str:
+        from selenium.common import TimeoutException
+
         try:
-            iframe = await asyncio.get_event_loop().run_in_executor(
-                None,
-                WebDriverWait(self.driver, 10).until,
-                EC.visibility_of_element_located((By.CSS_SELECTOR, "iframe")),
-            )
+            iframe = await self._wait_visible("iframe")
             await asyncio.get_event_loop().run_in_executor(None, self.driver.switch_to.frame, iframe)
 
-            content_div = await asyncio.get_event_loop().run_in_executor(
-                None,
-                WebDriverWait(self.driver, 10).until,
-                EC.visibility_of_element_located((By.CSS_SELECTOR, "div#notebook-container")),
-            )
+            content_div = await self._wait_visible("div#notebook-container")
             content = content_div.get_attribute("innerHTML")
         except TimeoutException as e:
             logger.warning(f"Failed to extract GitHub Jupyter notebook content for {self.url}: {e}")
@@ -93,14 +184,15 @@ class GitHubJupyterNotebookFetcher(GitHubFetcherBase):
 
 
 class GitHubCodeBlobFetcher(GitHubFetcherBase):
+    raw_kind = "code"
+
     async def _fetch_content(self) -> str:
-        await super()._fetch_html()
+        from selenium.common import TimeoutException
+
+        # 새 드라이버를 띄우지 않고 기존 드라이버로 페이지를 다시 불러옵니다.
+        await asyncio.get_event_loop().run_in_executor(None, self.driver.get, self.url)
         try:
-            textarea = await asyncio.get_event_loop().run_in_executor(
-                None,
-                WebDriverWait(self.driver, 10).until,
-                EC.visibility_of_element_located((By.CSS_SELECTOR, "textarea#read-only-cursor-text-area")),
-            )
+            textarea = await self._wait_visible("textarea#read-only-cursor-text-area")
             content = textarea.get_attribute("value")
         except TimeoutException as e:
             logger.warning(f"Failed to extract GitHub code blob content for {self.url}: {e}")
@@ -1,32 +1,320 @@
+import asyncio
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from hashlib import blake2b
+from typing import Dict, List, Optional
+
+import orjson
 from aiohttp import ClientSession
 
-from oracle_search.web_loader.fetchers.base import DefaultWebFetcher, html_to_markdown
+from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.models.documents import WebContent
 from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.download import fetch_text
+from oracle_search.web_loader.fetchers.base import DefaultWebFetcher
+from oracle_search.web_loader.rerank import bm25_score, tokenize
+from oracle_search.web_loader.task_context import current_request
 
 logger = setup_logger()
 
+HEADING_LINE_REGEX = re.compile(r"^(#{1,6}) (.*)$")
+SECTION_NUMBER_REGEX = re.compile(r"^(\d+(?:\.\d+)*)\.\s*(.*)$")
+FOOTNOTE_MARK_REGEX = re.compile(r"\[([^\[\]\s]{1,20})\]")
+TABLE_PLACEHOLDER = "NAMUTABLE{}NAMUTABLE"
+TABLE_PLACEHOLDER_REGEX = re.compile(r"NAMUTABLE(\d+)NAMUTABLE")
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+@dataclass
+class NamuSection:
+    number: str
+    title: str
+    level: int
+    text: str
+    tables: Dict[str, List[List[str]]] = field(default_factory=dict)
+
+
+@dataclass
+class NamuArticle:
+    title: str
+    sections: List[NamuSection]
+    footnotes: Dict[str, str]
+    metadata: dict
+
+
+def _normalize(text: str) -> str:
+    return WHITESPACE_REGEX.sub(" ", text).strip()
+
+
+def _drop_table_of_contents(container):
+    """
+    문단으로 가는 내부 링크(#s-...)를 모두 포함하는 가장 작은 요소를 목차로 보고 제거합니다.
+    """
+    links = [
+        link
+        for link in container.xpath('.//a[starts-with(@href, "#s-")]')
+        if not link.xpath("ancestor::h2|ancestor::h3|ancestor::h4|ancestor::h5|ancestor::h6")
+    ]
+    if not links:
+        return
+    toc = links[0].getparent()
+    while toc is not None and toc is not container:
+        if all(toc in link.iterancestors() for link in links[1:]):
+            break
+        toc = toc.getparent()
+    if toc is not None and toc is not container and not toc.xpath(".//h2|.//h3|.//h4|.//h5|.//h6"):
+        toc.drop_tree()
+
+
+def parse_article(html: str) -> Optional[NamuArticle]:
+    """
+    나무위키 문서를 문단, 각주, 표로 나눕니다.
+    편집 링크, 목차, 이미지, 링크 주소는 버리고 각주 본문은 문서 끝의 목록에서 가져옵니다.
+    표는 문단 본문에 자리표시자로 남기고 행 목록으로 따로 저장합니다.
+    """
+    from htmldate import find_date
+    from lxml import html as lxml_html
+
+    from oracle_search.web_loader.markdown import iter_element_markdown
+
+    root = lxml_html.document_fromstring(html)
+    h1 = next(root.iter("h1"), None)
+    if h1 is None:
+        return None
+
+    container = h1
+    for _ in range(3):
+        parent = next(container.iterancestors("div"), None)
+        if parent is None:
+            break
+        container = parent
+
+    footnotes = {}
+    for anchor in container.xpath('.//*[starts-with(@id, "fn-")]'):
+        entry = anchor.getparent()
+        name = anchor.get("id")[3:]
+        text = _normalize(entry.text_content())
+        footnotes[name] = re.sub(rf"^\[{re.escape(name)}\]\s*", "", text)
+        entry.drop_tree()
+    for reference in container.xpath('.//a[starts-with(@href, "#fn-")]'):
+        name = reference.get("href")[4:]
+        if name not in footnotes and reference.get("title"):
+            footnotes[name] = _normalize(reference.get("title"))
+
+    for edit_link in container.xpath('.//a[contains(@href, "/edit/")]'):
+        edit_link.drop_tree()
+    _drop_table_of_contents(container)
+
+    tables = {}
+    for index, table in enumerate(list(container.iter("table"))):
+        if table.getparent() is None:
+            continue
+        rows = [[_normalize(cell.text_content()) for cell in row.xpath("./th|./td")] for row in table.iter("tr")]
+        tables[str(index)] = [row for row in rows if any(row)]
+        placeholder = lxml_html.Element("p")
+        placeholder.text = TABLE_PLACEHOLDER.format(index)
+        placeholder.tail = table.tail
+        table.getparent().replace(table, placeholder)
+
+    title = _normalize(h1.text_content())
+    sections = [NamuSection(number="", title=title, level=1, text="")]
+    lines: List[str] = []
+
+    def close_section():
+        section = sections[-1]
+        section.text = "\n".join(lines).strip()
+        section.tables = {index: tables[index] for index in TABLE_PLACEHOLDER_REGEX.findall(section.text)}
+        lines.clear()
+
+    for line in "".join(iter_element_markdown(container)).splitlines():
+        if match := HEADING_LINE_REGEX.match(line):
+            level, heading = len(match.group(1)), match.group(2).strip()
+            if level == 1 and heading == title and len(sections) == 1 and not lines:
+                continue
+            close_section()
+            if number_match := SECTION_NUMBER_REGEX.match(heading):
+                sections.append(NamuSection(number_match.group(1), number_match.group(2), level, ""))
+            else:
+                sections.append(NamuSection("", heading, level, ""))
+            continue
+        lines.append(line)
+    close_section()
+
+    description = root.xpath('//meta[@name="description"]/@content')
+    keywords = root.xpath('//meta[@name="keywords"]/@content')
+    page_title = root.findtext(".//title")
+    metadata = {
+        "title": page_title.strip() if page_title else title,
+        "description": description[0] if description else None,
+        "keywords": keywords[0] if keywords else None,
+        "published_date": find_date(root),
+    }
+    return NamuArticle(title=title, sections=sections, footnotes=footnotes, metadata=metadata)
+
+
+def render_table(rows: List[List[str]], max_rows: int) -> str:
+    if not rows:
+        return ""
+    lines = [" | ".join(rows[0]), "|".join(["---"] * max(len(rows[0]), 1))]
+    lines += [" | ".join(row) for row in rows[1:max_rows]]
+    if len(rows) > max_rows:
+        lines.append(f"... ({len(rows) - max_rows} rows omitted)")
+    return "\n".join(lines)
+
+
+def select_sections(sections: List[dict], request: Optional[str], max_sections: int) -> List[int]:
+    """
+    요청과 BM25 점수가 높은 문단을 최대 max_sections 개 고릅니다. 도입부와 첫 번째 문단(보통 개요)은 항상 포함합니다.
+    request 가 없으면 모든 문단을 반환합니다. 반환하는 인덱스는 문서 순서입니다.
+    """
+    candidates = [index for index, section in enumerate(sections) if section["length"]]
+    if not request:
+        return candidates
+
+    query_tokens = set(tokenize(request))
+    document_frequency = Counter(token for section in sections for token in section["terms"])
+    average_length = sum(section["length"] for section in sections) / max(len(candidates), 1)
+    scores = {
+        index: bm25_score(
+            query_tokens,
+            sections[index]["terms"],
+            sections[index]["length"],
+            average_length,
+            document_frequency,
+            len(candidates),
+        )
+        for index in candidates
+    }
+    selected = set(candidates[:2])
+    for index in sorted(candidates, key=scores.get, reverse=True):
+        if len(selected) >= max_sections or scores[index] <= 0:
+            break
+        selected.add(index)
+    return sorted(selected)
+
 
 class NamuWikiFetcher(DefaultWebFetcher):
+    """
+    나무위키 문서를 문단 단위로 나누어 캐시하고, 현재 요청(task_context)과 관련 있는 문단만 반환합니다.
+
+    문서 인덱스(제목, 메타데이터, 각주, 문단별 토큰 빈도)와 각 문단 본문은 따로 캐시되므로,
+    같은 문서를 다른 요청으로 다시 가져올 때는 HTML 을 받거나 파싱하지 않고 고른 문단만 읽습니다.
+    """
+
     def __init__(self, url: str, session: ClientSession):
         super().__init__(url, session)
 
-    async def _fetch_content(self) -> str:
-        if not self.soup:
-            await self._fetch_html()
+    @property
+    def cache_key(self) -> str:
+        request = current_request()
+        if not request:
+            return super().cache_key
+        return f"{super().cache_key}:{blake2b(request.encode('utf-8'), digest_size=8).hexdigest()}"
 
-        h1_tag = self.soup.find("h1")
-        if h1_tag:
-            content_div = h1_tag.find_parent("div")
-            for _ in range(2):
-                content_div = content_div.find_parent("div")
-            if content_div:
-                return str(content_div)
-            else:
-                logger.warning(f"Failed to find the content div in {self.url}")
-                return ""
-        else:
+    @property
+    def _index_key(self) -> str:
+        return f"{self.__class__.__name__}:index:{self.url}"
+
+    def _section_key(self, index: int) -> str:
+        return f"{self.__class__.__name__}:section:{self.url}:{index}"
+
+    async def _fetch_html(self):
+        # 나무위키 문서는 매우 크므로 BeautifulSoup 을 만들지 않고 parse_article 에서 lxml 로 한 번만 파싱합니다.
+        downloaded = await fetch_text(self.session, self.url)
+        self.content_type = downloaded.content_type
+        self.html = downloaded.text
+
+    async def _load_index(self, refresh: bool = False) -> Optional[dict]:
+        if not refresh and (cached := await async_cache.aget(self._index_key)) is not None:
+            return orjson.loads(cached)
+
+        if not self.html:
+            await self._fetch_html()
+        article = await asyncio.get_running_loop().run_in_executor(None, parse_article, self.html)
+        if article is None:
             logger.warning(f"Failed to find the <h1> tag in {self.url}")
-            return ""
+            return None
+
+        ttl = Shared.namu_wiki.section_ttl
+        sections = []
+        for index, section in enumerate(article.sections):
+            tokens = tokenize(f"{section.title} {section.text}")
+            sections.append(
+                {
+                    "number": section.number,
+                    "title": section.title,
+                    "level": section.level,
+                    "length": len(tokens) if section.text else 0,
+                    "terms": dict(Counter(tokens)),
+                }
+            )
+            async_cache.set(
+                self._section_key(index), orjson.dumps({"text": section.text, "tables": section.tables}), expire=ttl
+            )
+        index = {
+            "title": article.title,
+            "metadata": article.metadata,
+            "footnotes": article.footnotes,
+            "sections": sections,
+        }
+        # 문단을 모두 기록한 뒤 인덱스를 기록해야 인덱스가 있는데 문단이 없는 경우가 생기지 않습니다.
+        # 쓰기 버퍼는 넣은 순서대로 기록하므로 인덱스를 마지막에 넣으면 됩니다.
+        await async_cache.aset(self._index_key, orjson.dumps(index), expire=ttl)
+        logger.info(f"Parsed {len(sections)} sections and {len(article.footnotes)} footnotes from {self.url}")
+        return index
+
+    def _load_sections(self, indices: List[int]) -> Optional[List[dict]]:
+        loaded = []
+        for index in indices:
+            cached = async_cache.get(self._section_key(index))
+            if cached is None:
+                return None
+            loaded.append(orjson.loads(cached))
+        return loaded
+
+    def _render(self, index: dict, indices: List[int], bodies: List[dict]) -> str:
+        conf = Shared.namu_wiki
+        parts = [f"# {index['title']}"]
+        for section_index, body in zip(indices, bodies):
+            section = index["sections"][section_index]
+            if section_index:
+                heading = f"{section['number']}. {section['title']}" if section["number"] else section["title"]
+                parts.append(f"{'#' * max(section['level'], 2)} {heading}")
+            text = TABLE_PLACEHOLDER_REGEX.sub(
+                lambda match: render_table(body["tables"].get(match.group(1), []), conf.max_table_rows), body["text"]
+            )
+            parts.append(text)
+
+        content = "\n\n".join(part for part in parts if part)
+        referenced = dict.fromkeys(name for name in FOOTNOTE_MARK_REGEX.findall(content) if name in index["footnotes"])
+        if referenced:
+            parts.append("## 각주\n\n" + "\n".join(f"[{name}] {index['footnotes'][name]}" for name in referenced))
+            content = "\n\n".join(part for part in parts if part)
+        return content
+
+    async def _fetch(self) -> WebContent:
+        # refresh 로 호출되면 캐시된 인덱스를 쓰지 않고 문서를 다시 받아 인덱스와 문단을 새로 기록합니다.
+        index = await self._load_index(refresh=self.refresh)
+        if index is None:
+            return WebContent(page_content="", source=self.url, metadata={"source": self.url, "summary": None})
+
+        loop = asyncio.get_running_loop()
+        indices = select_sections(index["sections"], current_request(), Shared.namu_wiki.max_sections)
+        bodies = await loop.run_in_executor(async_cache.read_pool(), self._load_sections, indices)
+        if bodies is None:
+            # 문단 캐시가 인덱스보다 먼저 만료된 경우 문서를 다시 파싱합니다.
+            # 문서가 바뀌었으면 문단 번호도 바뀌므로 새 인덱스에서 문단을 다시 고릅니다.
+            index = await self._load_index(refresh=True)
+            if index is None:
+                return WebContent(page_content="", source=self.url, metadata={"source": self.url, "summary": None})
+            indices = select_sections(index["sections"], current_request(), Shared.namu_wiki.max_sections)
+            bodies = await loop.run_in_executor(async_cache.read_pool(), self._load_sections, indices)
+            if bodies is None:
+                return WebContent(page_content="", source=self.url, metadata={"source": self.url, "summary": None})
+        if len(indices) < len(index["sections"]):
+            logger.info(f"Selected {len(indices)} of {len(index['sections'])} sections from {self.url}")
 
-    async def _post_process(self, content) -> str:
-        return html_to_markdown(content, include_images=True, include_links=True)
+        metadata = {**index["metadata"], "source": self.url, "summary": None}
+        return WebContent(page_content=self._render(index, indices, bodies), source=self.url, metadata=metadata)
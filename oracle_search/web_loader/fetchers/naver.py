@@ -1,3 +1,7 @@
+import re
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
 from aiohttp import ClientSession
 
 from oracle_search.web_loader.fetchers.base import DefaultWebFetcher, html_to_markdown
@@ -5,14 +9,41 @@ from oracle_search.pretty_logger import setup_logger
 
 logger = setup_logger()
 
+POST_PATH_REGEX = re.compile(r"^/([\w-]+)/(\d+)")
+
+
+def parse_blog_post(url: str) -> Optional[Tuple[str, str]]:
+    """
+    네이버 블로그 URL 에서 (blogId, logNo) 를 추출합니다.
+    """
+    parsed_url = urlparse(url)
+    query = parse_qs(parsed_url.query)
+    if "blogId" in query and "logNo" in query:
+        return query["blogId"][0], query["logNo"][0]
+    if match := POST_PATH_REGEX.match(parsed_url.path):
+        return match.group(1), match.group(2)
+    return None
+
 
 class NaverBlogFetcher(DefaultWebFetcher):
-    def __init__(self, url: str, session: ClientSession):
-        if "/blog.naver.com/" in url:
+    hedge_delay = 1.5
+
+    def __init__(self, url: str, session: ClientSession, mobile: bool = True):
+        if mobile and "/blog.naver.com/" in url:
             # 네이버 블로그 URL을 모바일 버전으로 변경
             url = url.replace("/blog.naver.com/", "/m.blog.naver.com/")
         super().__init__(url, session)
 
+    def alternates(self) -> List[DefaultWebFetcher]:
+        """
+        모바일 페이지가 느리거나 막힌 경우를 대비해 데스크톱 PostView 페이지를 대체 경로로 사용합니다.
+        """
+        if "m.blog.naver.com" not in urlparse(self.url).netloc or not (post := parse_blog_post(self.url)):
+            return []
+        blog_id, log_no = post
+        desktop_url = f"https://blog.naver.com/PostView.naver?blogId={blog_id}&logNo={log_no}"
+        return [NaverBlogFetcher(desktop_url, self.session, mobile=False)]
+
     async def _fetch_content(self) -> str:
         if not self.soup:
             await self._fetch_html()
@@ -1,36 +1,61 @@
 import asyncio
-import traceback
-
-from htmldate import find_date
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
-from youtube_transcript_api import YouTubeTranscriptApi
+from hashlib import blake2b
+from typing import Optional
 
 from oracle_search.models.documents import YoutubeTranscript
-from oracle_search.web_loader.fetchers.base import WebContentFetcher, get_selenium_driver, logger, YOUTUBE_REGEX
+from oracle_search.web_loader.deadline import stage_timeout
+from oracle_search.web_loader.fetchers.base import (
+    WebContentFetcher,
+    aget_selenium_driver,
+    aquit_selenium_driver,
+    logger,
+    parse_video_id,
+)
+from oracle_search.web_loader.task_context import current_request
+from oracle_search.web_loader.youtube_transcript import afetch_transcript, render_transcript
 
 
 class YouTubeFetcher(WebContentFetcher[YoutubeTranscript]):
+    """
+    자막은 youtube_transcript 에서 영상 ID 단위로 따로 캐시하고, 현재 요청(task_context)과 관련 있는 시간 구간만 반환합니다.
+    """
+
     output_type = YoutubeTranscript
+    timeout = 30.0
 
     def __init__(self, url: str):
         super().__init__(url)
+        self.video_id = parse_video_id(url)
         self.driver = None
+        self.transcript = None
+
+    @property
+    def cache_key(self) -> str:
+        # 같은 영상을 가리키는 URL(youtu.be, 재생목록, 시작 시각 등)이 같은 캐시 항목을 쓰도록 영상 ID 를 키로 사용합니다.
+        key = f"{self.__class__.__name__}:{self.video_id or self.url}"
+        request = current_request()
+        if not request:
+            return key
+        return f"{key}:{blake2b(request.encode('utf-8'), digest_size=8).hexdigest()}"
 
     async def _fetch_html(self):
-        self.driver = get_selenium_driver()
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.wait import WebDriverWait
+
+        self.driver = await aget_selenium_driver(owner=self.url)
+        self.driver.set_page_load_timeout(stage_timeout(30))
         await asyncio.get_event_loop().run_in_executor(None, self.driver.get, self.url)
 
         try:
             expand_button = await asyncio.get_event_loop().run_in_executor(
                 None,
-                lambda: WebDriverWait(self.driver, 10).until(
+                lambda: WebDriverWait(self.driver, stage_timeout(10)).until(
                     EC.element_to_be_clickable((By.CSS_SELECTOR, "div#snippet"))
                 ),
             )
             expand_button.click()
-            await asyncio.sleep(2)
+            await asyncio.sleep(stage_timeout(2))
         except Exception as e:
             logger.error(f"Failed to expand YouTube description: {e}")
 
@@ -40,25 +65,24 @@ class YouTubeFetcher(WebContentFetcher[YoutubeTranscript]):
         return content
 
     async def _fetch_content(self) -> str:
-        match = YOUTUBE_REGEX.search(self.url)
-        if match:
-            video_id = match.group(1)
-            try:
-                transcript = await asyncio.get_event_loop().run_in_executor(
-                    None, YouTubeTranscriptApi.get_transcript, video_id, ["ko", "en", "ja"]
-                )
-                return " ".join([line["text"] for line in transcript])
-            except Exception as e:
-                logger.error(f"Failed to fetch transcript for {self.url}: {e}")
-                return ""
-        return ""
+        if not self.video_id:
+            return ""
+        transcript = await afetch_transcript(self.video_id, refresh=self.refresh)
+        if transcript is None or not transcript.segments:
+            return ""
+        return render_transcript(transcript, current_request())
 
     async def _fetch_metadata(self) -> dict:
+        from htmldate import find_date
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.wait import WebDriverWait
+
         try:
             # Wait for the title element to be present
             title_element = await asyncio.get_event_loop().run_in_executor(
                 None,
-                WebDriverWait(self.driver, 10).until,
+                WebDriverWait(self.driver, stage_timeout(10)).until,
                 EC.presence_of_element_located((By.CSS_SELECTOR, "div#title h1 yt-formatted-string")),
             )
             title = title_element.text
@@ -87,23 +111,33 @@ class YouTubeFetcher(WebContentFetcher[YoutubeTranscript]):
                 "source": self.url,
             }
         except Exception as e:
-            trace = traceback.format_exc()
-            logger.error(f"Failed to extract YouTube metadata for {self.url}: {e}\n{trace}")
+            logger.error(f"Failed to extract YouTube metadata for {self.url}: {e}", exception=True)
             metadata = {"error": "Failed to extract metadata"}
         finally:
-            if self.driver:
-                await asyncio.get_event_loop().run_in_executor(None, self.driver.quit)
+            await self._finalize()
 
         return metadata
 
     async def _finalize(self):
         if self.driver:
-            self.driver.quit()
+            driver, self.driver = self.driver, None
+            await aquit_selenium_driver(driver)
+
+    def _partial_result(self) -> Optional[YoutubeTranscript]:
+        """
+        브라우저 단계가 시간 안에 끝나지 않아도 자막을 가져왔다면 메타데이터 없이 반환합니다.
+        """
+        if not self.transcript:
+            return None
+        metadata = {"title": None, "description": None, "source": self.url, "summary": None}
+        return YoutubeTranscript(page_content=self.transcript, source=self.url, metadata=metadata)
 
     async def _fetch(self) -> YoutubeTranscript:
+        # 자막은 브라우저 없이 가져올 수 있으므로 먼저 가져와서 시간 초과 시 부분 결과로 사용합니다.
+        self.transcript = await self._fetch_content()
         if not self.html:
             await self._fetch_html()
-        content = await self._fetch_content()
+        content = self.transcript
         metadata = await self._fetch_metadata()
         metadata["summary"] = None
         return YoutubeTranscript(page_content=content, source=self.url, metadata=metadata)
@@ -0,0 +1,68 @@
+import asyncio
+from typing import Awaitable, Callable, Optional, Sequence, TypeVar
+
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+R = TypeVar("R")
+
+
+async def hedged_race(
+    attempts: Sequence[Callable[[], Awaitable[R]]],
+    delay: float,
+    is_good: Callable[[R], bool],
+) -> Optional[R]:
+    """
+    attempts 를 순서대로 실행하되, 앞선 시도가 delay 초 안에 좋은 결과를 내지 못하면 다음 시도를 추가로 시작합니다.
+    실행 중인 시도가 실패하면 delay 를 기다리지 않고 바로 다음 시도를 시작합니다.
+    가장 먼저 is_good 을 만족한 결과를 반환하고 나머지 시도는 취소합니다.
+
+    Args:
+        attempts: 인자 없이 코루틴을 만드는 함수들. 첫 번째가 기본 시도입니다.
+        delay (float): 다음 시도를 시작하기 전까지 기다리는 시간(초).
+        is_good: 결과를 채택할지 판단하는 함수.
+
+    Returns:
+        채택된 결과. 좋은 결과가 없으면 마지막으로 완료된 결과를 반환하고,
+        모든 시도가 예외로 끝났다면 첫 번째 예외를 다시 발생시킵니다.
+    """
+    pending = set()
+    launched = 0
+    fallback = None
+    first_error = None
+
+    def launch_next():
+        nonlocal launched
+        pending.add(asyncio.ensure_future(attempts[launched]()))
+        launched += 1
+
+    launch_next()
+    try:
+        while pending:
+            timeout = delay if launched < len(attempts) else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch_next()
+                continue
+
+            for task in done:
+                pending.remove(task)
+                if error := task.exception():
+                    first_error = first_error or error
+                    logger.warning(f"Hedged attempt failed: {error!r}")
+                    continue
+                if is_good(task.result()):
+                    return task.result()
+                fallback = task.result()
+
+            if launched < len(attempts):
+                launch_next()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if fallback is None and first_error is not None:
+        raise first_error
+    return fallback
@@ -0,0 +1,39 @@
+"""
+여러 요청이 하나의 aiohttp ClientSession(연결 풀)을 함께 쓰도록 합니다.
+
+HTTP 서비스(oracle_search.server)처럼 오래 실행되는 프로세스는 시작할 때 만든 세션을 shared_session_scope 로 지정하고,
+검색과 fetch 는 client_session() 으로 세션을 얻습니다. 지정된 세션이 없거나 다른 이벤트 루프의 세션이면
+기존처럼 호출마다 새 세션을 만들고 닫습니다.
+"""
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+from aiohttp import ClientSession
+
+_shared: ContextVar[Optional[Tuple[asyncio.AbstractEventLoop, ClientSession]]] = ContextVar(
+    "shared_session", default=None
+)
+
+
+@contextmanager
+def shared_session_scope(session: ClientSession) -> Iterator[ClientSession]:
+    token = _shared.set((asyncio.get_running_loop(), session))
+    try:
+        yield session
+    finally:
+        _shared.reset(token)
+
+
+@asynccontextmanager
+async def client_session() -> AsyncIterator[ClientSession]:
+    """
+    공유 세션이 있으면 닫지 않고 그대로 주고, 없으면 새 세션을 만들어 블록이 끝날 때 닫습니다.
+    """
+    shared = _shared.get()
+    if shared is not None and shared[0] is asyncio.get_running_loop() and not shared[1].closed:
+        yield shared[1]
+        return
+    async with ClientSession() as session:
+        yield session
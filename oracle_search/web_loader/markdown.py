@@ -0,0 +1,269 @@
+"""
+lxml 트리를 한 번 순회하며 HTML 을 마크다운으로 바꾸는 변환기입니다.
+
+html2text 설정(skip_internal_links, mark_code, escape_snob, bypass_tables=False, body_width=0)과 같은 규칙으로 출력하고,
+기존 html_to_markdown 처럼 각 줄의 앞뒤 공백을 제거합니다. 연속된 빈 줄은 하나로 합칩니다.
+출력은 완성된 줄 단위로 내보내므로 큰 문서도 변환이 끝나기 전에 앞부분부터 사용할 수 있습니다.
+"""
+import re
+from typing import Callable, Iterator, List, Optional
+
+from lxml import etree, html as lxml_html
+
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+# html2text 의 escape_md_section(snob=True), escape_md 와 같은 규칙입니다.
+MD_BACKSLASH_REGEX = re.compile(r"(\\)(?=[\\`*_{}\[\]()#+\-.!])")
+MD_CHARS_TABLE = str.maketrans({char: "\\" + char for char in "`*_{}[]()#!"})
+# 줄 맨 앞의 "1.", "+", "-" 앞에 넣을 위치. 공백이 합쳐진 텍스트에는 줄바꿈이 없으므로 텍스트 조각의 시작만 봅니다.
+MD_LINE_START_REGEX = re.compile(r"\s*(?:\d+(?=\.\s)|(?=\+\s)|(?=-[\s-]))")
+MD_LINK_CHARS_REGEX = re.compile(r"([\\\[\]()])")
+
+SKIP_TAGS = {"script", "style", "head", "noscript", "template", "svg", "math", "iframe", "object", "canvas"}
+BLOCK_TAGS = {
+    "address", "article", "aside", "details", "dialog", "div", "dl", "dt", "dd", "fieldset", "figcaption",
+    "figure", "footer", "form", "header", "main", "nav", "p", "section", "summary", "caption",
+}
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+EMPHASIS_TAGS = {"b": "**", "strong": "**", "i": "_", "em": "_", "del": "~~", "s": "~~", "strike": "~~"}
+CODE_TAGS = {"code", "tt", "kbd", "samp"}
+
+
+def escape_text(text: str) -> str:
+    """
+    본문 텍스트의 마크다운 문자를 escape 합니다. 맨 앞의 "1.", "+", "-" 는 목록으로 읽히지 않도록 escape 합니다.
+    """
+    if "\\" in text:
+        text = MD_BACKSLASH_REGEX.sub(r"\\\1", text)
+    text = text.translate(MD_CHARS_TABLE)
+    if match := MD_LINE_START_REGEX.match(text):
+        text = text[:match.end()] + "\\" + text[match.end():]
+    return text
+
+
+def escape_link(text: str) -> str:
+    return MD_LINK_CHARS_REGEX.sub(r"\\\1", text)
+
+
+class _MarkdownWriter:
+    def __init__(self):
+        self.line: List[str] = []
+        self.blank = True
+        self.quote_depth = 0
+        self.pre_depth = 0
+        self.code_depth = 0
+        self.buffers: List[List[str]] = []
+
+    def write(self, text: str):
+        if not text:
+            return
+        if self.buffers:
+            self.buffers[-1].append(text)
+        else:
+            self.line.append(text)
+
+    def text(self, text: Optional[str]):
+        if not text:
+            return
+        if self.pre_depth:
+            lines = text.split("\n")
+            for index, line in enumerate(lines):
+                if index:
+                    yield from self.end_line()
+                self.write(line)
+            return
+        collapsed = WHITESPACE_REGEX.sub(" ", text)
+        target = self.buffers[-1] if self.buffers else self.line
+        # 앞 조각이 공백으로 끝나면 이어지는 공백은 버립니다.
+        if collapsed.startswith(" ") and (not target or target[-1].endswith(" ")):
+            collapsed = collapsed[1:]
+        self.write(collapsed if self.code_depth else escape_text(collapsed))
+
+    def end_line(self) -> Iterator[str]:
+        if self.buffers:
+            self.write(" ")
+            return
+        line = "".join(self.line).strip()
+        self.line = []
+        if line or self.pre_depth:
+            self.blank = not line
+            if not line:
+                yield "\n"
+                return
+            yield "> " * self.quote_depth + line + "\n"
+
+    def end_block(self) -> Iterator[str]:
+        yield from self.end_line()
+        if not self.blank and not self.buffers:
+            self.blank = True
+            yield "\n"
+
+    def flush(self) -> Iterator[str]:
+        yield from self.end_line()
+
+
+def iter_markdown(html: str, include_images: bool = False, include_links: bool = False) -> Iterator[str]:
+    """
+    HTML 을 마크다운으로 변환하며 완성된 줄을 차례로 내보냅니다.
+
+    Args:
+        html (str): 변환할 HTML 문자열.
+        include_images (bool): 이미지를 ![alt](src) 로 포함할지 여부.
+        include_links (bool): 링크를 [text](href) 로 포함할지 여부. '#' 으로 시작하는 내부 링크는 텍스트만 남깁니다.
+    """
+    if not html or not html.strip():
+        return
+    try:
+        root = lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return
+    yield from iter_element_markdown(root, include_images=include_images, include_links=include_links)
+
+
+def iter_element_markdown(
+    root: etree.ElementBase, include_images: bool = False, include_links: bool = False
+) -> Iterator[str]:
+    """
+    이미 파싱한 lxml 요소를 마크다운으로 변환합니다. 요소 안의 주석은 제거됩니다.
+    """
+    # 주석과 처리 지시문은 iterwalk 에 나타나지 않으므로 미리 지워 뒤따르는 텍스트가 앞 요소에 붙도록 합니다.
+    etree.strip_tags(root, etree.Comment, etree.ProcessingInstruction)
+
+    writer = _MarkdownWriter()
+    closers: List[Optional[Callable[[], Iterator[str]]]] = []
+    lists: List[List] = []
+    tables: List[dict] = []
+
+    def nothing() -> Iterator[str]:
+        return iter(())
+
+    walker = etree.iterwalk(root, events=("start", "end"))
+    for event, element in walker:
+        tag = element.tag if isinstance(element.tag, str) else ""
+        tag = tag.lower()
+
+        if event == "end":
+            closer = closers.pop()
+            yield from closer()
+            if element is not root:
+                yield from writer.text(element.tail)
+            continue
+
+        if tag in SKIP_TAGS:
+            walker.skip_subtree()
+            closers.append(nothing)
+            continue
+
+        closer = nothing
+        if tag in HEADING_TAGS:
+            yield from writer.end_block()
+            writer.write("#" * HEADING_TAGS[tag] + " ")
+            closer = writer.end_block
+        elif tag in BLOCK_TAGS:
+            yield from writer.end_block()
+            closer = writer.end_block
+        elif tag == "br":
+            yield from writer.end_line()
+        elif tag == "hr":
+            yield from writer.end_block()
+            writer.write("* * *")
+            yield from writer.end_block()
+        elif tag == "blockquote":
+            yield from writer.end_block()
+            writer.quote_depth += 1
+
+            def closer():
+                yield from writer.end_block()
+                writer.quote_depth -= 1
+        elif tag == "pre":
+            yield from writer.end_block()
+            writer.write("[code]")
+            yield from writer.end_line()
+            writer.pre_depth += 1
+
+            def closer():
+                yield from writer.end_line()
+                writer.pre_depth -= 1
+                writer.write("[/code]")
+                yield from writer.end_block()
+        elif tag in ("ul", "ol"):
+            # 목록 안의 목록은 빈 줄 없이 이어 씁니다.
+            end = writer.end_line if lists else writer.end_block
+            yield from end()
+            start = element.get("start", "1").strip()
+            lists.append([tag, int(start) if start.isdigit() else 1])
+
+            def closer(end=end):
+                lists.pop()
+                yield from end()
+        elif tag == "li":
+            yield from writer.end_line()
+            if lists and lists[-1][0] == "ol":
+                writer.write(f"{lists[-1][1]}. ")
+                lists[-1][1] += 1
+            else:
+                writer.write("* ")
+            closer = writer.end_line
+        elif tag == "tr":
+            yield from writer.end_line()
+            if tables:
+                tables[-1]["cells"] = 0
+
+            def closer(table=tables[-1] if tables else None):
+                if table is not None and not table["header_done"]:
+                    table["header_done"] = True
+                    columns = max(table["cells"], 1)
+                    yield from writer.end_line()
+                    writer.write("|".join(["---"] * columns))
+                yield from writer.end_line()
+        elif tag in ("td", "th"):
+            if tables:
+                if tables[-1]["cells"]:
+                    writer.write(" | ")
+                tables[-1]["cells"] += 1
+        elif tag == "table":
+            yield from writer.end_block()
+            tables.append({"cells": 0, "header_done": False})
+
+            def closer():
+                tables.pop()
+                yield from writer.end_block()
+        elif tag in EMPHASIS_TAGS and not writer.pre_depth:
+            mark = EMPHASIS_TAGS[tag]
+            writer.write(mark)
+
+            def closer(mark=mark):
+                writer.write(mark)
+                return nothing()
+        elif tag in CODE_TAGS and not writer.pre_depth:
+            writer.write("`")
+            writer.code_depth += 1
+
+            def closer():
+                writer.code_depth -= 1
+                writer.write("`")
+                return nothing()
+        elif tag == "a":
+            href = (element.get("href") or "").strip()
+            if include_links and href and not href.startswith("#") and not href.lower().startswith("javascript:"):
+                writer.buffers.append([])
+
+                def closer(href=href):
+                    text = WHITESPACE_REGEX.sub(" ", "".join(writer.buffers.pop())).strip()
+                    if text:
+                        writer.write(f"[{text}]({escape_link(href)})")
+                    return nothing()
+        elif tag == "img":
+            src = (element.get("src") or "").strip()
+            if include_images and src:
+                alt = WHITESPACE_REGEX.sub(" ", element.get("alt") or "").strip()
+                writer.write(f"![{escape_link(alt)}]({escape_link(src)})")
+
+        closers.append(closer)
+        yield from writer.text(element.text)
+
+    yield from writer.flush()
+
+
+def convert(html: str, include_images: bool = False, include_links: bool = False) -> str:
+    return "".join(iter_markdown(html, include_images=include_images, include_links=include_links)).strip("\n")
@@ -0,0 +1,190 @@
+import math
+import re
+from collections import Counter, defaultdict
+from hashlib import blake2b
+from typing import Dict, Generic, Iterable, List, Mapping, Optional, Tuple, TypeVar, Union
+
+from oracle_search import Shared
+from oracle_search.models.documents import WebContent, YoutubeTranscript
+from oracle_search.pretty_logger import setup_logger
+
+logger = setup_logger()
+
+D = TypeVar("D", bound=Union[WebContent, YoutubeTranscript])
+
+WORD_REGEX = re.compile(r"\w+")
+CJK_REGEX = re.compile(r"[぀-ヿ㐀-鿿가-힯]")
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SHINGLE_SIZE = 3
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    영문 등은 단어 단위로, 한글/한자/가나가 포함된 단어는 띄어쓰기와 조사에 덜 민감하도록 글자 bigram 으로 나눕니다.
+    """
+    tokens = []
+    for word in WORD_REGEX.findall(text.lower()):
+        if len(word) > 1 and CJK_REGEX.search(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word)
+    return tokens
+
+
+def simhash(tokens: List[str]) -> int:
+    """
+    SHINGLE_SIZE 개 토큰 shingle 의 64bit SimHash 를 계산합니다.
+    """
+    shingles = [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))]
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in Counter(shingles).items():
+        value = int.from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def bm25_score(
+    query_tokens: Iterable[str],
+    terms: Mapping[str, int],
+    length: int,
+    average_length: float,
+    document_frequency: Mapping[str, int],
+    count: int,
+) -> float:
+    """
+    문서 하나의 BM25 점수를 계산합니다. terms 는 문서의 토큰별 빈도, document_frequency 는 토큰별 문서 수입니다.
+    """
+    score = 0.0
+    for token in query_tokens:
+        frequency = terms.get(token, 0)
+        if not frequency:
+            continue
+        df = document_frequency.get(token, 0)
+        idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+        score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+    return score
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    return [(band, fingerprint >> (band * width) & ((1 << width) - 1)) for band in range(SIMHASH_BANDS)]
+
+
+def _document_text(document: Union[WebContent, YoutubeTranscript]) -> str:
+    metadata = document.metadata
+    return " ".join(filter(None, [metadata.get("title"), metadata.get("description"), document.page_content]))
+
+
+class DocumentReranker(Generic[D]):
+    """
+    가져온 문서를 하나씩 추가하면서 SimHash 로 거의 같은 문서를 걸러내고,
+    요청과의 BM25 점수로 순위를 매깁니다.
+    거리 max_distance 이하인 문서는 밴드 인덱스로 찾으므로, max_distance 는 SIMHASH_BANDS 보다 작아야 합니다.
+    """
+
+    def __init__(self, request: str, max_distance: int = 3):
+        self.query_tokens = set(tokenize(request))
+        self.max_distance = max_distance
+        self.documents: List[D] = []
+        self.term_counts: List[Counter] = []
+        self.lengths: List[int] = []
+        # 본문 글자 수. 문서가 offload 된 뒤에도 본문을 다시 읽지 않고 중복 문서 중 긴 쪽을 고를 수 있게 따로 둡니다.
+        self.sizes: List[int] = []
+        self.fingerprints: List[int] = []
+        self.document_frequency: Counter = Counter()
+        self.band_index: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        self.duplicates: Dict[str, str] = {}
+
+    def _find_duplicate(self, fingerprint: int) -> Optional[int]:
+        for band in _bands(fingerprint):
+            for index in self.band_index.get(band, []):
+                if hamming_distance(fingerprint, self.fingerprints[index]) <= self.max_distance:
+                    return index
+        return None
+
+    def score(self, index: int) -> float:
+        count = len(self.documents)
+        return bm25_score(
+            self.query_tokens,
+            self.term_counts[index],
+            self.lengths[index],
+            sum(self.lengths) / count,
+            self.document_frequency,
+            count,
+        )
+
+    def add(self, document: D) -> bool:
+        """
+        문서를 추가합니다. 이미 추가된 문서와 거의 같으면 더 긴 쪽을 남기고 False 를 반환합니다.
+        """
+        tokens = tokenize(_document_text(document))
+        fingerprint = simhash(tokens)
+        duplicate = self._find_duplicate(fingerprint)
+        if duplicate is not None:
+            kept = self.documents[duplicate]
+            if len(document.page_content) <= self.sizes[duplicate]:
+                self.duplicates[document.source] = kept.source
+                return False
+            self.duplicates[kept.source] = document.source
+            self._remove_terms(duplicate)
+            self._store(duplicate, document, tokens, fingerprint)
+            return False
+
+        self.documents.append(document)
+        self.term_counts.append(Counter())
+        self.lengths.append(0)
+        self.sizes.append(0)
+        self.fingerprints.append(fingerprint)
+        self._store(len(self.documents) - 1, document, tokens, fingerprint)
+        return True
+
+    def _remove_terms(self, index: int):
+        self.document_frequency.subtract(self.term_counts[index].keys())
+
+    def _store(self, index: int, document: D, tokens: List[str], fingerprint: int):
+        terms = Counter(tokens)
+        self.documents[index] = document
+        self.term_counts[index] = terms
+        self.lengths[index] = max(1, len(tokens))
+        self.sizes[index] = len(document.page_content)
+        self.fingerprints[index] = fingerprint
+        self.document_frequency.update(terms.keys())
+        for band in _bands(fingerprint):
+            if index not in self.band_index[band]:
+                self.band_index[band].append(index)
+
+    def top(self, n: Optional[int] = None) -> List[D]:
+        """
+        중복이 제거된 문서들을 점수 순으로 최대 n 개 반환합니다.
+        """
+        if not self.documents:
+            return []
+        ranked = sorted(range(len(self.documents)), key=self.score, reverse=True)
+        return [self.documents[index] for index in ranked[:n]]
+
+
+def rerank_contents(contents: List[D], request: str) -> List[D]:
+    """
+    설정(rerank.max_distance, rerank.top_n)에 따라 거의 같은 문서를 제거하고 요청과 관련 높은 순으로 상위 문서만 남깁니다.
+    """
+    conf = Shared.rerank
+    if not conf.enabled:
+        return contents
+
+    reranker = DocumentReranker(request, max_distance=conf.max_distance)
+    for content in contents:
+        reranker.add(content)
+    selected = reranker.top(conf.top_n)
+    logger.info(
+        f"Reranked {len(contents)} documents: {len(reranker.duplicates)} near-duplicates, {len(selected)} selected"
+    )
+    return selected
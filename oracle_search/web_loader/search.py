@@ -1,20 +1,29 @@
 import asyncio
-from typing import List, Dict, Union, Literal
+import time
+from typing import List, Dict, Union, Literal, Optional, AsyncIterator, Any, Set
 
-from aiohttp import ClientSession
 
 from oracle_search.models.documents import WebContent, YoutubeTranscript
 from oracle_search.models.base import SearchQuery
 from oracle_search.pretty_logger import setup_logger
 from oracle_search.conf.conf import Shared
+from oracle_search.web_loader.deadline import deadline_scope, remaining
+from oracle_search.web_loader.fan_out import FanOutController
+from oracle_search.web_loader.http_session import client_session
+from oracle_search.web_loader.search_providers import search_router
+from oracle_search.web_loader.task_context import request_scope
 from oracle_search.web_loader.web_loader import WebContentExtractor
 
 logger = setup_logger()
 
+SearchEvent = Dict[str, Any]
 
-async def afetch_results(query: SearchQuery) -> List[Dict[Literal["snippet", "title", "link"], str]]:
-    search_params = {"dateRestrict": f"d{query.recent_days}"} if query.recent_days > 0 else {}
-    return Shared.google_search.search_engine.results(query.query, num_results=3, search_params=search_params)
+
+async def afetch_results(query: SearchQuery, num_results: int = 3) -> List[Dict[Literal["snippet", "title", "link"], str]]:
+    """
+    search.providers 에 설정된 제공자들로 검색합니다. 느리거나 실패한 제공자는 다음 제공자로 넘어갑니다. (search_providers.SearchRouter)
+    """
+    return await search_router.search(query, num_results)
 
 
 async def aget_search_results(queries: List[SearchQuery]) -> List[Dict[Literal["snippet", "title", "link"], str]]:
@@ -24,11 +33,142 @@ async def aget_search_results(queries: List[SearchQuery]) -> List[Dict[Literal["
     return list({result["link"]: result for result in all_results}.values())
 
 
-async def aget_search_full_contents(queries: list[SearchQuery]) -> List[Union[WebContent, YoutubeTranscript]]:
-    all_results = await aget_search_results(queries)
+async def astream_search_full_contents(
+    queries: list[SearchQuery], timeout: Optional[float] = None, request: Optional[str] = None
+) -> AsyncIterator[SearchEvent]:
+    """
+    검색 결과와 각 URL 의 콘텐츠를 준비되는 대로 이벤트로 내보냅니다.
+    검색은 FanOutController 가 정한 wave 단위로 실행하되 앞 wave 의 fetch 가 진행되는 동안 다음 wave 를 검색하며,
+    관련 문서가 충분히 모이면 남은 쿼리는 검색하지 않고 진행 중인 fetch 도 취소합니다.
+
+    이벤트 종류:
+        {"event": "search_results", "results": [...]}: wave 마다 새로 찾은 검색 결과.
+        {"event": "document", "content": WebContent | YoutubeTranscript}: fetch 가 하나 끝날 때마다.
+        {"event": "timeout", "unfinished": int}: 마감 시각이 지나 남은 fetch 를 취소했을 때.
+
+    작업은 별도 Task 에서 deadline_scope 안에서 실행되므로, 소비하는 쪽이 매 단계를 다른 Task 에서 진행해도
+    마감 시각이 유지됩니다. 소비를 중단하면 진행 중인 fetch 도 취소됩니다.
+
+    Args:
+        queries (list[SearchQuery]): 검색 쿼리 목록.
+        timeout (Optional[float]): 검색과 fetch 전체에 허용할 시간(초).
+        request (Optional[str]): 관련 문서 수를 셀 때 기준이 되는 요청. 없으면 쿼리들을 이어 붙여 사용합니다.
+    """
+    queue: asyncio.Queue[Optional[SearchEvent]] = asyncio.Queue()
+    controller = FanOutController(queries, request)
+
+    async def produce():
+        """
+        검색 Task 하나와 fetch Task 들을 함께 기다립니다. 검색 결과가 오면 fetch 를 시작하고 곧바로 다음 wave 를 검색하므로
+        앞 wave 의 fetch 와 다음 wave 의 검색이 겹쳐 진행됩니다. 관련 문서가 target_documents 개 모이면 남은 검색과 fetch 를 취소합니다.
+        fetcher 는 마감 시각에 부분 결과를 반환하므로, 마감 뒤에도 web_fetch.deadline_grace 초 동안은 기다려 그 결과를 받습니다.
+        마감 뒤에는 새 wave 의 검색과 fetch 를 시작하지 않으며, 모든 대기는 마감 시각 + deadline_grace 에서 끝납니다.
+        """
+        fetches: Set[asyncio.Future] = set()
+        search: Optional[asyncio.Future] = None
+
+        async def fetch_loaded(link: str, session):
+            # 캐시에서 온 문서는 본문을 body_ref 로만 들고 있으므로, 재순위화가 page_content 를 읽기 전에
+            # fetch Task 안에서 읽기 스레드 풀로 본문을 읽어 둡니다.
+            content = await WebContentExtractor(link, session).afetch()
+            return await content.aload() if content else content
+
+        def start_search():
+            nonlocal search
+            if remaining() == 0:
+                search = None
+                return
+            wave = controller.next_wave()
+            search = asyncio.ensure_future(
+                asyncio.gather(*(afetch_results(query, num_results) for query, num_results in wave))
+            ) if wave else None
+
+        with deadline_scope(timeout), request_scope(request):
+            left = remaining()
+            cutoff = None if left is None else time.monotonic() + left + Shared.web_fetch.deadline_grace
+            async with client_session() as session:
+                start_search()
+                try:
+                    while search is not None or fetches:
+                        done, _ = await asyncio.wait(
+                            fetches | {search} - {None},
+                            timeout=None if cutoff is None else max(0.0, cutoff - time.monotonic()),
+                            return_when=asyncio.FIRST_COMPLETED,
+                        )
+                        if not done:
+                            logger.warning(
+                                f"Deadline reached with {len(fetches)} fetches unfinished"
+                                + (" while searching" if search is not None else "")
+                            )
+                            queue.put_nowait({"event": "timeout", "unfinished": len(fetches)})
+                            return
+
+                        if search in done:
+                            results = controller.accept_results(search.result())
+                            queue.put_nowait({"event": "search_results", "results": results})
+                            # 마감 뒤에 끝난 검색의 결과는 알리기만 하고 fetch 하지 않습니다.
+                            if remaining() != 0:
+                                fetches.update(
+                                    asyncio.ensure_future(fetch_loaded(result["link"], session)) for result in results
+                                )
+                            start_search()
+
+                        for task in done & fetches:
+                            fetches.discard(task)
+                            if task.cancelled():
+                                continue
+                            if e := task.exception():
+                                logger.error(f"Fetch task failed: {e!r}")
+                            elif content := task.result():
+                                controller.add_document(content)
+                                queue.put_nowait({"event": "document", "content": content})
+
+                        if controller.satisfied:
+                            logger.info(
+                                f"Stopped searching after {controller.waves} waves with "
+                                f"{controller.relevant_documents} relevant documents, cancelling {len(fetches)} fetches"
+                            )
+                            return
+                finally:
+                    unfinished = fetches | {search} - {None}
+                    for task in unfinished:
+                        task.cancel()
+                    await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def run():
+        try:
+            await produce()
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.ensure_future(run())
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+
+async def aget_search_full_contents(
+    queries: list[SearchQuery], timeout: Optional[float] = None, request: Optional[str] = None
+) -> List[Union[WebContent, YoutubeTranscript]]:
+    """
+    검색 결과의 모든 URL 콘텐츠를 가져옵니다.
+
+    Args:
+        queries (list[SearchQuery]): 검색 쿼리 목록.
+        timeout (Optional[float]): 검색과 fetch 전체에 허용할 시간(초). 각 fetcher 의 대기 시간도 이 마감 시각을 넘지 않으며,
+            시간이 지나면 끝나지 않은 fetch 를 취소하고 그때까지 가져온 콘텐츠만 반환합니다.
+        request (Optional[str]): 검색을 일찍 멈출지 판단할 때 관련도의 기준이 되는 요청.
 
-    sources = list(set([result["link"] for result in all_results]))
-    async with ClientSession() as session:
-        tasks = [WebContentExtractor(url, session).afetch() for url in sources]
-        contents = await asyncio.gather(*tasks)
-    return [content for content in contents if content]
+    Returns:
+        List[Union[WebContent, YoutubeTranscript]]: 가져온 콘텐츠 목록.
+    """
+    return [
+        event["content"]
+        async for event in astream_search_full_contents(queries, timeout=timeout, request=request)
+        if event["event"] == "document"
+    ]
@@ -0,0 +1,369 @@
+"""
+검색 제공자(provider)와 이들 사이에서 쿼리를 나누는 SearchRouter 입니다.
+
+- search.providers 순서대로 제공자를 시도하며, 앞선 제공자가 search.hedge_delay 초 안에 결과를 내지 못하거나 실패하면
+  다음 제공자를 함께 실행하고 먼저 결과를 낸 쪽을 사용합니다. (hedging.hedged_race)
+- 하루 쿼터(search.daily_quotas)는 공유 디스크 캐시의 카운터로 워커 전체에서 셉니다. 쿼터를 다 쓰거나 제공자가 쿼터 초과 오류를
+  반환하면 그날은 해당 제공자를 건너뛰고, 그 밖의 오류가 나면 search.cooldown 초 동안 건너뜁니다.
+- 모든 제공자의 결과는 {"snippet", "title", "link"} 형식으로 맞춥니다.
+- 제공자별 응답 시간은 oracle_search_search_provider_seconds 메트릭과 SearchRouter.stats() 로 확인할 수 있습니다.
+
+새 제공자는 SearchProvider 를 상속하여 search_router.register(provider) 로 등록합니다. (e.g. 테스트용 가짜 제공자)
+"""
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from datetime import date, timedelta
+from typing import Deque, Dict, List, Literal, Optional
+
+from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.metrics import SEARCH_REQUESTS, SEARCH_RESULTS, SEARCH_SECONDS, registry
+from oracle_search.models.base import SearchQuery
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.hedging import hedged_race
+from oracle_search.web_loader.rerank import bm25_score, tokenize
+
+logger = setup_logger()
+
+SearchResult = Dict[Literal["snippet", "title", "link"], str]
+
+QUOTA_KEY_PREFIX = "search_quota:"
+DISKCACHE_MODE_RAW = 1
+DISKCACHE_MODE_BINARY = 2
+LATENCY_WINDOW = 200
+
+PROVIDER_SECONDS = registry.histogram(
+    "oracle_search_search_provider_seconds", "검색 제공자별 응답 시간", ("provider", "outcome")
+)
+PROVIDER_SKIPS = registry.counter(
+    "oracle_search_search_provider_skips", "쿼터나 오류로 건너뛴 검색 제공자 수", ("provider", "reason")
+)
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+def normalize_results(results: List[dict]) -> List[SearchResult]:
+    """
+    제공자의 결과를 {"snippet", "title", "link"} 형식으로 맞춥니다. 링크가 없는 결과는 버립니다.
+    """
+    normalized = []
+    for result in results:
+        link = result.get("link") or result.get("url")
+        if not link:
+            continue
+        normalized.append(
+            {
+                "snippet": (result.get("snippet") or result.get("content") or "").strip(),
+                "title": (result.get("title") or "").strip(),
+                "link": link.strip(),
+            }
+        )
+    return normalized
+
+
+def is_quota_error(error: BaseException) -> bool:
+    """
+    Google API 의 HttpError 등에서 쿼터 초과(429, 403 quota/rateLimit) 여부를 판단합니다.
+    """
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "resp", None), "status", None)
+    message = str(error).lower()
+    return status == 429 or (status == 403 and ("quota" in message or "ratelimit" in message))
+
+
+class SearchProvider(ABC):
+    name: str
+
+    @abstractmethod
+    async def search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        """
+        검색 결과를 반환합니다. 쿼터 초과는 QuotaExceededError 로 알립니다.
+        """
+        pass
+
+
+class GoogleSearchProvider(SearchProvider):
+    name = "google"
+
+    async def search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        search_params = {"dateRestrict": f"d{query.recent_days}"} if query.recent_days > 0 else {}
+        started = time.perf_counter()
+        try:
+            # 동기 API 호출이 이벤트 루프를 막지 않고 마감 시각에 맞춰 취소될 수 있도록 executor 에서 실행합니다.
+            results = await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: Shared.google_search.search_engine.results(
+                    query.query, num_results=num_results, search_params=search_params
+                ),
+            )
+        except BaseException as e:
+            SEARCH_REQUESTS.inc(outcome="error")
+            if is_quota_error(e):
+                raise QuotaExceededError(str(e)) from e
+            raise
+        SEARCH_REQUESTS.inc(outcome="ok")
+        SEARCH_RESULTS.inc(sum(1 for result in results if "link" in result))
+        SEARCH_SECONDS.observe(time.perf_counter() - started)
+        return results
+
+
+class SearxngSearchProvider(SearchProvider):
+    """
+    SearXNG 인스턴스의 JSON API(search.searxng_url)로 검색합니다.
+    """
+
+    name = "searxng"
+
+    @staticmethod
+    def _time_range(recent_days: int) -> Optional[str]:
+        if recent_days <= 0:
+            return None
+        for days, time_range in ((1, "day"), (7, "week"), (31, "month")):
+            if recent_days <= days:
+                return time_range
+        return "year"
+
+    async def search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        from aiohttp import ClientSession, ClientTimeout
+
+        params = {"q": query.query, "format": "json", "language": query.language}
+        if time_range := self._time_range(query.recent_days):
+            params["time_range"] = time_range
+        async with ClientSession(timeout=ClientTimeout(total=Shared.search.provider_timeout)) as session:
+            async with session.get(f"{Shared.search.searxng_url.rstrip('/')}/search", params=params) as response:
+                if response.status == 429:
+                    raise QuotaExceededError(f"SearXNG returned 429 for {query.query!r}")
+                response.raise_for_status()
+                data = await response.json()
+        return data.get("results", [])[:num_results]
+
+
+class LocalCacheSearchProvider(SearchProvider):
+    """
+    디스크 캐시에 있는 fetch 결과의 제목, 설명, 키워드, URL 로 만든 BM25 인덱스에서 검색합니다.
+    인덱스는 search.local_refresh_interval 초마다 executor 에서 다시 만듭니다. 외부 요청이 없으므로 쿼터가 없습니다.
+    """
+
+    name = "local_cache"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents: List[dict] = []
+        self._document_frequency: Counter = Counter()
+        self._average_length = 1.0
+        self._built_at: Optional[float] = None
+
+    def _iter_cached(self):
+        """
+        fetch 결과 항목을 (key, value bytes) 로 읽습니다.
+        web_cache.get 은 eviction policy 에 따라 접근 시각/횟수를 갱신하므로 SQLite 를 읽기 전용으로 직접 읽습니다.
+        """
+        import os
+        import sqlite3
+
+        directory = Shared.disk_cache.web_cache.directory
+        connection = sqlite3.connect(f"file:{os.path.join(directory, 'cache.db')}?mode=ro", uri=True)
+        try:
+            rows = connection.execute(
+                "SELECT key, mode, value, filename FROM Cache WHERE raw = 1 AND key LIKE '%Fetcher:%' "
+                "AND (expire_time IS NULL OR expire_time > ?)",
+                (time.time(),),
+            )
+            for key, mode, value, filename in rows:
+                # diskcache 는 작은 bytes 를 DB 에(MODE_RAW), 큰 bytes 를 파일에(MODE_BINARY) 저장합니다.
+                if mode == DISKCACHE_MODE_RAW and isinstance(value, bytes):
+                    yield key, value
+                elif mode == DISKCACHE_MODE_BINARY and filename:
+                    try:
+                        with open(os.path.join(directory, filename), "rb") as f:
+                            yield key, f.read()
+                    except OSError:
+                        continue
+        finally:
+            connection.close()
+
+    def _build(self):
+        import orjson
+
+        documents = {}
+        for key, value in self._iter_cached():
+            if not key.split(":", 1)[0].endswith("Fetcher") or ":index:" in key or ":section:" in key:
+                continue
+            try:
+                cached = orjson.loads(value)
+            except orjson.JSONDecodeError:
+                continue
+            if not isinstance(cached, dict):
+                continue
+            metadata = cached.get("metadata") or {}
+            source = cached.get("source")
+            if not source or source in documents or "error" in metadata:
+                continue
+            title = metadata.get("title") or ""
+            snippet = metadata.get("description") or ""
+            tokens = tokenize(f"{title} {snippet} {metadata.get('keywords') or ''} {source}")
+            documents[source] = {
+                "link": source,
+                "title": title,
+                "snippet": snippet,
+                "published_date": metadata.get("published_date"),
+                "terms": Counter(tokens),
+                "length": len(tokens),
+            }
+        self._documents = list(documents.values())
+        self._document_frequency = Counter(token for document in self._documents for token in document["terms"])
+        self._average_length = sum(document["length"] for document in self._documents) / max(len(self._documents), 1)
+        self._built_at = time.monotonic()
+        logger.info(f"Indexed {len(self._documents)} cached documents for local search")
+
+    def _search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        conf = Shared.search
+        with self._lock:
+            if self._built_at is None or time.monotonic() - self._built_at > conf.local_refresh_interval:
+                self._build()
+            documents = self._documents
+        earliest = (date.today() - timedelta(days=query.recent_days)).isoformat() if query.recent_days > 0 else None
+        query_tokens = set(tokenize(query.query))
+        scored = []
+        for document in documents:
+            if earliest and (not document["published_date"] or document["published_date"] < earliest):
+                continue
+            score = bm25_score(
+                query_tokens,
+                document["terms"],
+                document["length"],
+                self._average_length,
+                self._document_frequency,
+                len(documents),
+            )
+            if score >= conf.local_min_score:
+                scored.append((score, document))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [document for _, document in scored[:num_results]]
+
+    async def search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        return await asyncio.get_running_loop().run_in_executor(None, self._search, query, num_results)
+
+
+PROVIDER_CLASSES = {
+    GoogleSearchProvider.name: GoogleSearchProvider,
+    SearxngSearchProvider.name: SearxngSearchProvider,
+    LocalCacheSearchProvider.name: LocalCacheSearchProvider,
+}
+
+
+class SearchRouter:
+    def __init__(self):
+        self._providers: Dict[str, SearchProvider] = {}
+        self._cooldown_until: Dict[str, float] = {}
+        self._exhausted_on: Dict[str, str] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._outcomes: Dict[str, Counter] = {}
+
+    def register(self, provider: SearchProvider):
+        """
+        제공자를 등록합니다. 같은 이름의 기본 제공자를 대신하며, search.providers 에 이름이 있어야 사용됩니다.
+        """
+        self._providers[provider.name] = provider
+
+    def provider(self, name: str) -> SearchProvider:
+        if name not in self._providers:
+            self._providers[name] = PROVIDER_CLASSES[name]()
+        return self._providers[name]
+
+    def _quota_key(self, name: str) -> str:
+        return f"{QUOTA_KEY_PREFIX}{name}:{date.today().isoformat()}"
+
+    def _available(self, name: str) -> bool:
+        if self._exhausted_on.get(name) == date.today().isoformat():
+            PROVIDER_SKIPS.inc(provider=name, reason="quota")
+            return False
+        if self._cooldown_until.get(name, 0) > time.monotonic():
+            PROVIDER_SKIPS.inc(provider=name, reason="cooldown")
+            return False
+        return True
+
+    def _consume_quota(self, name: str, quota: int):
+        """
+        오늘 쓴 쿼터를 하나 늘립니다. SQLite 에 쓰므로 async_cache 의 읽기 스레드에서 실행합니다.
+        """
+        # 여러 워커가 함께 세도록 공유 디스크 캐시의 원자적 카운터를 사용합니다.
+        web_cache = Shared.disk_cache.web_cache
+        key = self._quota_key(name)
+        # incr 은 만료 시간을 받지 않으므로 날짜별 키를 먼저 만료 시간과 함께 만듭니다.
+        web_cache.add(key, 0, expire=2 * 24 * 60 * 60)
+        used = web_cache.incr(key)
+        if used > quota:
+            web_cache.decr(key)
+            self._exhausted_on[name] = date.today().isoformat()
+            raise QuotaExceededError(f"Daily quota of {quota} searches for {name} is used up")
+
+    def _record(self, name: str, outcome: str, seconds: float):
+        PROVIDER_SECONDS.observe(seconds, provider=name, outcome=outcome)
+        self._outcomes.setdefault(name, Counter())[outcome] += 1
+        if outcome == "ok":
+            self._latencies.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    async def _attempt(self, name: str, query: SearchQuery, num_results: int) -> List[SearchResult]:
+        if (quota := Shared.search.daily_quotas.get(name)) is not None:
+            await asyncio.get_running_loop().run_in_executor(async_cache.read_pool(), self._consume_quota, name, quota)
+        started = time.perf_counter()
+        try:
+            results = normalize_results(await self.provider(name).search(query, num_results))
+        except QuotaExceededError:
+            self._exhausted_on[name] = date.today().isoformat()
+            self._record(name, "quota", time.perf_counter() - started)
+            logger.warning(f"Search provider {name} is out of quota for today")
+            raise
+        except asyncio.CancelledError:
+            self._record(name, "cancelled", time.perf_counter() - started)
+            raise
+        except Exception:
+            self._cooldown_until[name] = time.monotonic() + Shared.search.cooldown
+            self._record(name, "error", time.perf_counter() - started)
+            raise
+        self._record(name, "ok" if results else "empty", time.perf_counter() - started)
+        return results
+
+    async def search(self, query: SearchQuery, num_results: int = 3) -> List[SearchResult]:
+        """
+        사용할 수 있는 제공자들을 hedge_delay 간격으로 경쟁시켜 처음으로 결과가 있는 응답을 반환합니다.
+        모든 제공자의 결과가 비어 있으면 빈 목록을, 모두 실패하면 첫 번째 예외를 발생시킵니다.
+        """
+        conf = Shared.search
+        names = [name for name in conf.providers if self._available(name)]
+        if not names:
+            # 모두 쉬는 중이면 설정의 첫 번째 제공자를 그대로 시도합니다.
+            names = conf.providers[:1]
+        attempts = [lambda name=name: self._attempt(name, query, num_results) for name in names]
+        results = await hedged_race(attempts, conf.hedge_delay, is_good=bool)
+        return results or []
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        제공자별 결과 수와 최근 LATENCY_WINDOW 번 성공한 응답 시간의 p50 / p95, 오늘 사용한 쿼터를 반환합니다.
+        """
+        stats = {}
+        for name in Shared.search.providers:
+            latencies = sorted(self._latencies.get(name, ()))
+            used = Shared.disk_cache.web_cache.get(self._quota_key(name), 0)
+            stats[name] = {
+                "outcomes": dict(self._outcomes.get(name, {})),
+                "p50": latencies[len(latencies) // 2] if latencies else None,
+                "p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                "quota_used": used,
+                "quota": Shared.search.daily_quotas.get(name),
+            }
+        return stats
+
+    def reset(self, old=None, new=None):
+        self._cooldown_until.clear()
+        self._exhausted_on.clear()
+
+
+search_router = SearchRouter()
+Shared.subscribe("search", search_router.reset)
@@ -0,0 +1,109 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from oracle_search import Shared
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.worker_stats import worker_stats
+
+logger = setup_logger()
+
+R = TypeVar("R")
+
+LEASE_KEY_PREFIX = "lease:"
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+_in_flight: Dict[Tuple[asyncio.AbstractEventLoop, str], _Flight] = {}
+
+
+def acquire_lease(key: str) -> Optional[str]:
+    """
+    공유 디스크 캐시에 key 의 lease 를 원자적으로 추가합니다. 다른 워커가 이미 가지고 있으면 None 을 반환합니다.
+    lease 는 lease_ttl 초 뒤 만료되므로 lease 를 가진 워커가 죽어도 다른 워커가 이어받을 수 있습니다.
+    """
+    token = uuid.uuid4().hex
+    if Shared.disk_cache.web_cache.add(f"{LEASE_KEY_PREFIX}{key}", token, expire=Shared.worker.lease_ttl):
+        return token
+    return None
+
+
+def release_lease(key: str, token: str):
+    cache = Shared.disk_cache.web_cache
+    with cache.transact():
+        if cache.get(f"{LEASE_KEY_PREFIX}{key}") == token:
+            cache.delete(f"{LEASE_KEY_PREFIX}{key}")
+
+
+def lease_held(key: str) -> bool:
+    return f"{LEASE_KEY_PREFIX}{key}" in Shared.disk_cache.web_cache
+
+
+async def _coordinated(key: str, compute: Callable[[], Awaitable[R]], lookup: Callable[[], Optional[R]]) -> R:
+    """
+    다른 워커가 같은 key 를 계산 중이면 그 결과가 캐시에 기록될 때까지 기다리고, 아니면 lease 를 얻어 직접 계산합니다.
+    """
+    conf = Shared.worker
+    deadline = time.monotonic() + conf.wait_timeout
+    loop = asyncio.get_running_loop()
+    waited = False
+    while True:
+        token = await loop.run_in_executor(None, acquire_lease, key)
+        if token is not None:
+            break
+        if not waited:
+            waited = True
+            worker_stats.record("coalesced_remote")
+        await asyncio.sleep(conf.poll_interval)
+        if (result := await loop.run_in_executor(None, lookup)) is not None:
+            return result
+        if time.monotonic() > deadline:
+            logger.warning(f"Gave up waiting for another worker to fetch {key}")
+            worker_stats.record("lease_timeouts")
+            return await compute()
+
+    try:
+        # lease 를 얻는 사이에 다른 워커가 결과를 기록했을 수 있습니다.
+        if waited and (result := await loop.run_in_executor(None, lookup)) is not None:
+            return result
+        return await compute()
+    finally:
+        await loop.run_in_executor(None, release_lease, key, token)
+
+
+async def single_flight(key: str, compute: Callable[[], Awaitable[R]], lookup: Callable[[], Optional[R]]) -> R:
+    """
+    같은 key 의 작업이 동시에 여러 번 실행되지 않도록 합니다.
+    같은 이벤트 루프 안에서는 진행 중인 작업의 결과를 함께 기다리고,
+    worker.mode 가 multi 이면 공유 디스크 캐시의 lease 로 다른 프로세스와도 조율합니다.
+
+    Args:
+        key (str): 작업을 식별하는 캐시 키.
+        compute: 결과를 계산하는 코루틴 함수. 결과를 캐시에 기록하는 것까지 포함해야 합니다.
+        lookup: 캐시에 기록된 결과를 읽는 함수. 결과가 없으면 None 을 반환합니다.
+    """
+    loop = asyncio.get_running_loop()
+    if (flight := _in_flight.get((loop, key))) is not None:
+        worker_stats.record("coalesced_local")
+    else:
+        if Shared.worker.is_multi:
+            task = asyncio.ensure_future(_coordinated(key, compute, lookup))
+        else:
+            task = asyncio.ensure_future(compute())
+        flight = _in_flight[(loop, key)] = _Flight(task)
+        task.add_done_callback(lambda _: _in_flight.pop((loop, key), None))
+
+    # 기다리는 호출자가 모두 취소되면 작업도 취소하여 마감 시각이 지난 fetch 가 계속 실행되지 않도록 합니다.
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+_request: ContextVar[Optional[str]] = ContextVar("oracle_search_request", default=None)
+
+
+@contextmanager
+def request_scope(request: Optional[str]):
+    """
+    현재 컨텍스트에 사용자의 요청을 설정합니다. fetcher 는 이 값을 보고 요청과 관련 있는 부분만 추출할 수 있습니다.
+    deadline_scope 와 마찬가지로 이 블록 안에서 만든 Task 들은 같은 요청을 봅니다.
+
+    Args:
+        request (Optional[str]): 요청. None 이면 바꾸지 않습니다.
+    """
+    if request is None:
+        yield
+        return
+
+    token = _request.set(request)
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+
+def current_request() -> Optional[str]:
+    return _request.get()
+
+
+_client: ContextVar[Optional[str]] = ContextVar("oracle_search_client", default=None)
+
+
+@contextmanager
+def client_scope(client: Optional[str]):
+    """
+    현재 컨텍스트에 호출한 사용자(client)의 ID 를 설정합니다. LLM 스케줄러는 이 값으로 사용자별로 돌아가며 호출을 허가합니다.
+    request_scope 와 마찬가지로 이 블록 안에서 만든 Task 들은 같은 client 를 봅니다.
+
+    Args:
+        client (Optional[str]): client ID. None 이면 바꾸지 않습니다.
+    """
+    if client is None:
+        yield
+        return
+
+    token = _client.set(client)
+    try:
+        yield
+    finally:
+        _client.reset(token)
+
+
+def current_client() -> Optional[str]:
+    return _client.get()
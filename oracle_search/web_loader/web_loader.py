@@ -5,8 +5,10 @@ from urllib.parse import urlparse
 
 from aiohttp import ClientSession
 
+from oracle_search.metrics import FETCHERS_CREATED
 from oracle_search.models.documents import YoutubeTranscript, WebContent
 from oracle_search.web_loader.fetchers.base import YOUTUBE_REGEX, DefaultWebFetcher
+from oracle_search.web_loader.fetchers.document import DocumentFetcher, document_kind_from_url
 from oracle_search.web_loader.fetchers.github import (
     GitHubJupyterNotebookFetcher,
     GitHubMarkdownFetcher,
@@ -15,25 +17,34 @@ from oracle_search.web_loader.fetchers.github import (
 from oracle_search.web_loader.fetchers.namu_wiki import NamuWikiFetcher
 from oracle_search.web_loader.fetchers.naver import NaverBlogFetcher
 from oracle_search.web_loader.fetchers.youtube import YouTubeFetcher
+from oracle_search.web_loader.http_session import client_session
 
 
 class ContentFetcherFactory:
     @staticmethod
     def create_fetcher(url: str, session: Optional[ClientSession] = None):
+        fetcher = ContentFetcherFactory._create_fetcher(url, session)
+        FETCHERS_CREATED.inc(fetcher=fetcher.__class__.__name__)
+        return fetcher
+
+    @staticmethod
+    def _create_fetcher(url: str, session: Optional[ClientSession] = None):
         parsed_url = urlparse(url)
         if YOUTUBE_REGEX.search(url):
             return YouTubeFetcher(url)
         elif "github.com" in parsed_url.netloc and "blob" in parsed_url.path:
             if parsed_url.path.endswith(".ipynb"):
-                return GitHubJupyterNotebookFetcher(url)
+                return GitHubJupyterNotebookFetcher(url, session)
             elif parsed_url.path.endswith(".md"):
-                return GitHubMarkdownFetcher(url)
+                return GitHubMarkdownFetcher(url, session)
             else:
-                return GitHubCodeBlobFetcher(url)
+                return GitHubCodeBlobFetcher(url, session)
         elif "namu.wiki" in parsed_url.netloc:
             return NamuWikiFetcher(url, session)
         elif "blog.naver.com" in parsed_url.netloc:
             return NaverBlogFetcher(url, session)
+        elif document_kind_from_url(url):
+            return DocumentFetcher(url, session)
         return DefaultWebFetcher(url, session)
 
 
@@ -44,7 +55,6 @@ class WebContentExtractor:
 
     def __init__(self, url: str, session: ClientSession):
         self.fetcher = ContentFetcherFactory.create_fetcher(url, session)
-        self.loop = asyncio.new_event_loop()
 
     async def afetch(self, refresh=False) -> Union[WebContent, YoutubeTranscript]:
         return await self.fetcher.fetch(refresh=refresh)
@@ -55,5 +65,12 @@ class WebContentExtractor:
             return future.result()
 
     def _run_in_executor(self):
-        asyncio.set_event_loop(self.loop)
-        return self.loop.run_until_complete(self.afetch())
+        # 이벤트 루프는 동기 fetch 를 쓸 때만 만듭니다. afetch 만 쓰는 서비스에서 요청마다 루프가 새지 않게 합니다.
+        return asyncio.run(self.afetch())
+
+
+async def fetch_url_content(url: str) -> Union[WebContent, YoutubeTranscript]:
+    async with client_session() as session:
+        extractor = WebContentExtractor(url, session)
+        content = await extractor.afetch()
+        return content
@@ -0,0 +1,83 @@
+import atexit
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Tuple
+
+from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.metrics import WORKER_EVENTS
+
+STATS_KEY_PREFIX = "worker_stats:"
+
+
+class WorkerStats:
+    """
+    프로세스 안에서 카운터를 모았다가 stats_interval 초마다 공유 디스크 캐시에 기록합니다.
+    이벤트마다 SQLite 에 쓰지 않도록 record 는 stats_interval 마다 한 번 스냅샷을 write-behind 버퍼(async_cache)에 넣고,
+    실제 기록은 writer 스레드가 하므로 이벤트 루프에서 호출해도 막히지 않습니다.
+    같은 이벤트는 메트릭 레지스트리의 oracle_search_worker_events 에도 기록됩니다.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.counters: Counter = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        atexit.register(self._flush_at_exit)
+
+    def record(self, name: str, value: int = 1):
+        WORKER_EVENTS.inc(value, event=name)
+        with self._lock:
+            self.counters[name] += value
+            due = time.monotonic() - self._last_flush >= Shared.worker.stats_interval
+        if due and Shared.worker.is_multi:
+            async_cache.set(*self._snapshot())
+
+    def _flush_at_exit(self):
+        if self.counters and Shared.worker is not None and Shared.worker.is_multi:
+            self.flush()
+
+    def _snapshot(self) -> Tuple[str, Dict[str, Any], float]:
+        with self._lock:
+            snapshot = dict(self.counters)
+            self._last_flush = time.monotonic()
+        expire = Shared.worker.stats_interval * 6
+        return f"{STATS_KEY_PREFIX}{self.worker_id}", {"updated_at": time.time(), "counters": snapshot}, expire
+
+    def flush(self):
+        """
+        현재 카운터를 기록하고 버퍼의 쓰기가 모두 기록될 때까지 기다립니다. 집계 직전과 프로세스 종료 시에 사용합니다.
+        같은 키의 이전 스냅샷이 버퍼에 남아 있을 수 있으므로 바로 쓰지 않고 버퍼를 거쳐 순서를 지킵니다.
+        """
+        async_cache.set(*self._snapshot())
+        async_cache.flush(Shared.cache_writer.shutdown_timeout)
+
+
+worker_stats = WorkerStats()
+
+
+def aggregate_worker_stats() -> Dict[str, Dict[str, int]]:
+    """
+    공유 캐시에 기록된 모든 워커의 카운터를 모아 {"total": {...}, "<worker_id>": {...}} 형태로 반환합니다.
+    최근 stats_interval * 6 초 안에 기록하지 않은 워커는 만료되어 빠집니다.
+    """
+    if Shared.worker.is_multi:
+        worker_stats.flush()
+    cache = Shared.disk_cache.web_cache
+    total = Counter()
+    per_worker = {}
+    for key in cache.iterkeys():
+        if not isinstance(key, str) or not key.startswith(STATS_KEY_PREFIX):
+            continue
+        entry = cache.get(key)
+        if entry is None:
+            continue
+        per_worker[key[len(STATS_KEY_PREFIX):]] = entry["counters"]
+        total.update(entry["counters"])
+    if not per_worker:
+        per_worker[worker_stats.worker_id] = dict(worker_stats.counters)
+        total.update(worker_stats.counters)
+    return {"total": dict(total), **per_worker}
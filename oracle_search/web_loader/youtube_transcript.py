@@ -0,0 +1,238 @@
+"""
+YouTube 자막을 영상 ID 단위로 가져오고 캐시합니다.
+
+- 자막은 시작 시각이 있는 구간(segment) 목록으로 보관하여 시간 단위 chunk 로 나누어 쓸 수 있습니다.
+- 자막 요청은 youtube.max_workers 크기의 스레드 풀에서만 실행되므로 한 wave 의 YouTube fetcher 들이 동시에 요청해도 동시 요청 수가 제한됩니다.
+- 자막은 페이지 메타데이터와 별도로 YouTubeTranscript:<video_id> 키에 orjson 으로 캐시됩니다.
+"""
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+import orjson
+
+from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.pretty_logger import setup_logger
+from oracle_search.web_loader.rerank import bm25_score, tokenize
+from oracle_search.web_loader.single_flight import single_flight
+
+logger = setup_logger()
+
+CACHE_KEY_PREFIX = "YouTubeTranscript:"
+
+_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=Shared.youtube.max_workers, thread_name_prefix="youtube-transcript")
+    return _thread_pool
+
+
+def _resize_thread_pool(old, new):
+    """
+    youtube.max_workers 가 바뀌면 다음 요청부터 새 크기의 풀을 사용합니다. 진행 중인 요청은 기존 풀에서 끝납니다.
+    """
+    global _thread_pool
+    if _thread_pool is not None and (old is None or old.max_workers != new.max_workers):
+        _thread_pool.shutdown(wait=False)
+        _thread_pool = None
+
+
+Shared.subscribe("youtube", _resize_thread_pool)
+
+
+@dataclass
+class TranscriptSegment:
+    start: float
+    duration: float
+    text: str
+
+
+@dataclass
+class TranscriptChunk:
+    start: float
+    end: float
+    text: str
+
+    def render(self) -> str:
+        return f"[{format_timestamp(self.start)} - {format_timestamp(self.end)}] {self.text}"
+
+
+@dataclass
+class Transcript:
+    video_id: str
+    language: Optional[str] = None
+    is_generated: bool = False
+    translated: bool = False
+    segments: List[TranscriptSegment] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Transcript":
+        segments = [TranscriptSegment(**segment) for segment in data.pop("segments", [])]
+        return cls(**data, segments=segments)
+
+
+def format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def _negotiate(video_id: str, languages: List[str]):
+    """
+    사람이 만든 자막, 자동 생성 자막 순으로 선호 언어의 자막을 찾습니다.
+    둘 다 없으면 번역 가능한 아무 자막이나 첫 번째 선호 언어로 번역하고, 그것도 안 되면 첫 번째 자막을 사용합니다.
+    """
+    from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
+
+    transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+    for find in (transcripts.find_manually_created_transcript, transcripts.find_generated_transcript):
+        try:
+            return find(languages), False
+        except NoTranscriptFound:
+            continue
+
+    available = list(transcripts)
+    if not available:
+        return None, False
+    for transcript in available:
+        if transcript.is_translatable and any(
+            language["language_code"] == languages[0] for language in transcript.translation_languages
+        ):
+            return transcript.translate(languages[0]), True
+    return available[0], False
+
+
+def fetch_transcript(video_id: str) -> Transcript:
+    """
+    자막을 가져옵니다. 스레드 풀에서 실행됩니다.
+    자막이 없거나 비활성화된 영상은 구간이 없는 Transcript 를 반환합니다.
+    """
+    from youtube_transcript_api import CouldNotRetrieveTranscript, TooManyRequests, YouTubeRequestFailed
+
+    try:
+        transcript, translated = _negotiate(video_id, Shared.youtube.languages)
+    except (TooManyRequests, YouTubeRequestFailed):
+        # 일시적인 오류이므로 빈 결과로 캐시하지 않도록 호출자에게 넘깁니다.
+        raise
+    except CouldNotRetrieveTranscript as e:
+        logger.info(f"No transcript for {video_id}: {e.__class__.__name__}")
+        return Transcript(video_id=video_id)
+    if transcript is None:
+        return Transcript(video_id=video_id)
+
+    segments = [
+        TranscriptSegment(start=line["start"], duration=line.get("duration", 0.0), text=line["text"].strip())
+        for line in transcript.fetch()
+        if line["text"].strip()
+    ]
+    return Transcript(
+        video_id=video_id,
+        language=transcript.language_code,
+        is_generated=transcript.is_generated,
+        translated=translated,
+        segments=segments,
+    )
+
+
+def _decode(cached: Optional[bytes]) -> Optional[Transcript]:
+    return Transcript.from_dict(orjson.loads(cached)) if cached is not None else None
+
+
+def _lookup(video_id: str) -> Optional[Transcript]:
+    return _decode(async_cache.get(f"{CACHE_KEY_PREFIX}{video_id}"))
+
+
+async def afetch_transcript(video_id: str, refresh: bool = False) -> Optional[Transcript]:
+    """
+    영상 하나의 자막을 캐시에서 읽거나 스레드 풀에서 가져옵니다.
+    자막이 없는 영상도 youtube.missing_ttl 동안 캐시하고, 요청 제한 등 일시적인 오류는 캐시하지 않고 None 을 반환합니다.
+    """
+    if not refresh and (cached := _decode(await async_cache.aget(f"{CACHE_KEY_PREFIX}{video_id}"))) is not None:
+        return cached
+
+    async def compute() -> Optional[Transcript]:
+        loop = asyncio.get_running_loop()
+        try:
+            transcript = await loop.run_in_executor(get_thread_pool(), fetch_transcript, video_id)
+        except Exception as e:
+            logger.error(f"Failed to fetch transcript for {video_id}: {e}")
+            return None
+        conf = Shared.youtube
+        await async_cache.aset(
+            f"{CACHE_KEY_PREFIX}{video_id}",
+            orjson.dumps(asdict(transcript)),
+            expire=conf.transcript_ttl if transcript.segments else conf.missing_ttl,
+        )
+        return transcript
+
+    if refresh:
+        return await compute()
+    return await single_flight(f"{CACHE_KEY_PREFIX}{video_id}", compute, lambda: _lookup(video_id))
+
+
+def chunk_segments(segments: List[TranscriptSegment], chunk_seconds: float, max_chars: int) -> List[TranscriptChunk]:
+    """
+    연속된 구간을 chunk_seconds 초 또는 max_chars 글자를 넘지 않도록 묶습니다.
+    """
+    chunks = []
+    current: List[TranscriptSegment] = []
+    length = 0
+
+    def close():
+        if current:
+            end = current[-1].start + current[-1].duration
+            chunks.append(TranscriptChunk(current[0].start, end, " ".join(segment.text for segment in current)))
+
+    for segment in segments:
+        if current and (
+            segment.start - current[0].start >= chunk_seconds or length + len(segment.text) + 1 > max_chars
+        ):
+            close()
+            current, length = [], 0
+        current.append(segment)
+        length += len(segment.text) + 1
+    close()
+    return chunks
+
+
+def select_chunks(chunks: List[TranscriptChunk], request: Optional[str], max_chunks: int) -> List[TranscriptChunk]:
+    """
+    chunk 가 max_chunks 개보다 많으면 요청과 BM25 점수가 높은 chunk 를 고릅니다. 첫 chunk(보통 영상 소개)는 항상 포함합니다.
+    request 가 없거나 chunk 가 충분히 적으면 모두 반환합니다. 반환 순서는 영상 순서입니다.
+    """
+    if not request or len(chunks) <= max_chunks:
+        return chunks
+
+    query_tokens = set(tokenize(request))
+    chunk_tokens = [tokenize(chunk.text) for chunk in chunks]
+    terms = [Counter(tokens) for tokens in chunk_tokens]
+    document_frequency = Counter(token for counts in terms for token in counts)
+    average_length = sum(len(tokens) for tokens in chunk_tokens) / len(chunks) or 1
+    scores = [
+        bm25_score(query_tokens, counts, len(tokens), average_length, document_frequency, len(chunks))
+        for counts, tokens in zip(terms, chunk_tokens)
+    ]
+    selected = {0}
+    for index in sorted(range(len(chunks)), key=scores.__getitem__, reverse=True):
+        if len(selected) >= max_chunks or scores[index] <= 0:
+            break
+        selected.add(index)
+    return [chunks[index] for index in sorted(selected)]
+
+
+def render_transcript(transcript: Transcript, request: Optional[str] = None) -> str:
+    """
+    자막을 시간 구간이 붙은 chunk 로 나누고, 요청이 있으면 관련 있는 chunk 만 남겨 문자열로 만듭니다.
+    """
+    conf = Shared.youtube
+    chunks = chunk_segments(transcript.segments, conf.chunk_seconds, conf.chunk_chars)
+    selected = select_chunks(chunks, request, conf.max_chunks)
+    if len(selected) < len(chunks):
+        logger.info(f"Selected {len(selected)} of {len(chunks)} transcript chunks from {transcript.video_id}")
+    return "\n\n".join(chunk.render() for chunk in selected)
@@ -0,0 +1,84 @@
+"""
+테스트 세션 전체에서 쓸 설정과 가짜 서버를 준비합니다.
+
+설정 파일과 디스크 캐시는 임시 디렉터리에 load_test.write_config 로 만들고, LLM 은 load_test.fake_chat_app 에 연결합니다.
+fake_llm.fail 로 다음 응답들을 429, 5xx 같은 오류로 바꾸고, fake_llm.latency 로 응답을 늦출 수 있습니다.
+"""
+import asyncio
+import os
+from collections import deque
+from types import SimpleNamespace
+from typing import Deque, Dict, Optional, Tuple
+
+import pytest
+from aiohttp import web
+
+from oracle_search.devtools.load_test import BackgroundServers, fake_chat_app, write_config
+
+
+class FakeLLM:
+    def __init__(self):
+        self.failures: Deque[Tuple[int, Dict[str, str]]] = deque()
+        self.requests = 0
+        self.latency = 0.0
+        self.app = fake_chat_app(latency=0.0, completion_tokens=8, queries=2)
+        self.app.middlewares.append(self._middleware)
+
+    def fail(self, status: int, times: int = 1, headers: Optional[Dict[str, str]] = None):
+        self.failures.extend([(status, headers or {})] * times)
+
+    def reset(self):
+        self.failures.clear()
+        self.requests = 0
+        self.latency = 0.0
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            status, headers = self.failures.popleft()
+            return web.json_response(
+                {"error": {"message": f"injected {status}", "type": "test", "code": None}}, status=status, headers=headers
+            )
+        return await handler(request)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fake_llm_server(tmp_path_factory):
+    llm = FakeLLM()
+    servers = BackgroundServers()
+    (llm_port,) = servers.start([llm.app])
+    args = SimpleNamespace(log_level="WARNING", search_timeout=10, respect_llm_limits=True, http=False)
+    os.environ["EX_MACHINA_CONFIG"] = write_config(str(tmp_path_factory.mktemp("oracle")), args)
+    os.environ["EX_MACHINA_ENV"] = "dev"
+    os.environ["OPENAI_API_BASE"] = os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{llm_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    os.environ.setdefault("TMDB_ACCESS_TOKEN", "test")
+
+    from oracle_search import ExMachina, Shared
+
+    ExMachina.bootstrap()
+    yield llm
+    Shared.disk_cache.close()
+    servers.stop()
+
+
+@pytest.fixture
+def fake_llm(fake_llm_server) -> FakeLLM:
+    fake_llm_server.reset()
+    yield fake_llm_server
+    fake_llm_server.reset()
+
+
+@pytest.fixture
+def configure():
+    """
+    테스트 안에서 설정 일부를 덮어쓰고, 테스트가 끝나면 설정 파일의 값으로 되돌립니다.
+    """
+    from oracle_search.conf.env import Environment
+
+    environment = Environment()
+    yield environment.override
+    environment.overrides = {}
+    environment.reload(force=True)
@@ -0,0 +1,89 @@
+import threading
+
+from oracle_search import Shared
+from oracle_search.async_cache import async_cache
+from oracle_search.models.documents import WebContent
+from oracle_search.web_loader.fetchers.base import WebContentFetcher
+from oracle_search.web_loader.rerank import DocumentReranker
+
+
+class CountingFetcher(WebContentFetcher[WebContent]):
+    output_type = WebContent
+    calls = 0
+
+    async def _fetch(self) -> WebContent:
+        CountingFetcher.calls += 1
+        return WebContent(page_content=f"body of {self.url}", source=self.url, metadata={"title": "counted"})
+
+    async def _fetch_html(self):
+        pass
+
+    async def _fetch_content(self) -> str:
+        return ""
+
+    async def _fetch_metadata(self) -> dict:
+        return {}
+
+    async def _finalize(self):
+        pass
+
+
+async def test_cache_hit_keeps_the_body_readable():
+    url = "https://example.com/hit"
+    calls = CountingFetcher.calls
+    await CountingFetcher(url).fetch()
+    await async_cache.aflush()
+
+    cached = await CountingFetcher(url).fetch()
+    assert CountingFetcher.calls == calls + 1
+    assert cached.body_ref is not None and not cached.is_loaded
+    assert cached.page_content == f"body of {url}"
+
+
+async def test_missing_body_is_a_cache_miss():
+    url = "https://example.com/evicted"
+    calls = CountingFetcher.calls
+    first = await CountingFetcher(url).fetch()
+    await async_cache.aflush()
+    # 본문만 용량 제한이나 만료로 사라진 경우입니다.
+    assert Shared.disk_cache.web_cache.delete(first.body_ref)
+
+    refetched = await CountingFetcher(url).fetch()
+    assert CountingFetcher.calls == calls + 2
+    assert refetched.page_content == f"body of {url}"
+
+
+async def test_document_body_is_read_and_written_off_the_loop(monkeypatch):
+    document = WebContent(page_content="offloaded body", source="https://example.com/offload", metadata={})
+    await document.aoffload()
+    await async_cache.aflush()
+    assert not document.is_loaded
+
+    loop_thread = threading.current_thread()
+    cache = Shared.disk_cache.web_cache
+    calls = []
+    for name in ("get", "touch", "set"):
+
+        def record(*args, _name=name, _original=getattr(cache, name), **kwargs):
+            calls.append((_name, threading.current_thread() is loop_thread))
+            return _original(*args, **kwargs)
+
+        monkeypatch.setattr(cache, name, record)
+
+    assert (await document.aload()).page_content == "offloaded body"
+    await document.aoffload()
+    await document.apersist()
+    assert calls and not any(on_loop for _, on_loop in calls)
+
+
+def test_reranker_does_not_reload_offloaded_duplicates():
+    text = " ".join(f"word{index}" for index in range(200))
+    kept = WebContent(page_content=text, source="https://example.com/a", metadata={})
+    reranker = DocumentReranker("word1")
+    assert reranker.add(kept)
+    # 본문을 내린 뒤 캐시에서도 사라졌다면 page_content 를 다시 읽을 수 없습니다.
+    assert Shared.disk_cache.web_cache.delete(kept.offload().body_ref)
+
+    duplicate = WebContent(page_content=text + " extra", source="https://example.com/b", metadata={})
+    assert not reranker.add(duplicate)
+    assert reranker.duplicates == {kept.source: duplicate.source}
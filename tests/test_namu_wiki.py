@@ -0,0 +1,44 @@
+import orjson
+import pytest
+from aiohttp import ClientSession
+
+from oracle_search.async_cache import async_cache
+from oracle_search.devtools.load_test import BackgroundServers, replay_app
+from oracle_search.web_loader.fetchers.namu_wiki import NamuWikiFetcher
+from oracle_search.web_loader.task_context import request_scope
+
+ARTICLE = """<html><head><title>Asyncio - namu</title></head><body><div><div><div>
+<h1>Asyncio</h1>
+<h2>1. 개요</h2><p>asyncio is the python event loop library.</p>
+<h2>2. 역사</h2><p>tulip became asyncio in python 3.4.</p>
+<h2>3. 코루틴</h2><p>coroutine scheduling with await and tasks.</p>
+</div></div></div></body></html>"""
+
+
+@pytest.fixture(scope="module")
+def article_url():
+    servers = BackgroundServers()
+    (port,) = servers.start([replay_app([ARTICLE], latency=0.0)])
+    yield f"http://127.0.0.1:{port}/page/0"
+    servers.stop()
+
+
+async def test_reselects_sections_after_reparsing_an_expired_article(article_url):
+    async with ClientSession() as session:
+        fetcher = NamuWikiFetcher(article_url, session)
+        # 문단 캐시는 만료되고 예전 판의 인덱스만 남은 경우입니다. 예전 판에는 문단이 하나 더 있었습니다.
+        stale_sections = [
+            {"number": "", "title": "Asyncio", "level": 1, "length": 0, "terms": {}},
+            {"number": "1", "title": "개요", "level": 2, "length": 1, "terms": {"asyncio": 1}},
+            {"number": "2", "title": "역사", "level": 2, "length": 1, "terms": {"tulip": 1}},
+            {"number": "3", "title": "코루틴", "level": 2, "length": 1, "terms": {"coroutine": 1}},
+            {"number": "4", "title": "삭제됨", "level": 2, "length": 1, "terms": {"coroutine": 5}},
+        ]
+        stale = {"title": "Asyncio", "metadata": {}, "footnotes": {}, "sections": stale_sections}
+        await async_cache.aset(fetcher._index_key, orjson.dumps(stale))
+
+        with request_scope("coroutine"):
+            content = await fetcher.fetch()
+
+    assert "coroutine scheduling" in content.page_content
+    assert "삭제됨" not in content.page_content
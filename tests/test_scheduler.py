@@ -0,0 +1,189 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_openai import ChatOpenAI
+
+from oracle_search.chain.scheduler import (
+    BULK,
+    INTERACTIVE,
+    RATE_LIMITED,
+    TRANSIENT_ERRORS,
+    RequestScheduler,
+    llm_scheduler,
+    scheduled,
+)
+from oracle_search.web_loader.task_context import client_scope, request_scope
+
+# rpm 600, burst 0.1 초이면 bucket 에 요청 1개만 담기고 0.1 초마다 하나씩 허가됩니다.
+ONE_PER_TENTH = {"rpm": 600, "tpm": 10 ** 9}
+
+
+@pytest.fixture
+def scheduler(configure):
+    configure({"llm_scheduler": {"limits": {"m": ONE_PER_TENTH}, "burst_seconds": 0.1}})
+    return RequestScheduler()
+
+
+async def grant_order(scheduler: RequestScheduler, calls):
+    """
+    bucket 을 비운 뒤 calls 의 (이름, 우선순위, client) 를 순서대로 대기열에 넣고, 허가된 순서대로 이름을 반환합니다.
+    """
+    scheduler.acquire("m", 1)
+    order = []
+
+    async def call(name, priority, client):
+        await scheduler.aacquire("m", 1, priority, client)
+        order.append(name)
+
+    await asyncio.gather(*(call(*c) for c in calls))
+    return order
+
+
+async def test_interactive_before_bulk(scheduler):
+    order = await grant_order(
+        scheduler, [("b1", BULK, "a"), ("b2", BULK, "a"), ("i1", INTERACTIVE, "a"), ("i2", INTERACTIVE, "a")]
+    )
+    assert order == ["i1", "i2", "b1", "b2"]
+
+
+async def test_bulk_promoted_after_max_wait(scheduler, configure):
+    configure({"llm_scheduler": {"bulk_max_wait": 0.25}})
+    order = await grant_order(scheduler, [("b", BULK, "a")] + [(f"i{n}", INTERACTIVE, "a") for n in range(6)])
+    assert 0 < order.index("b") < len(order) - 1
+
+
+async def test_round_robin_between_clients(scheduler):
+    order = await grant_order(
+        scheduler, [(f"a{n}", INTERACTIVE, "a") for n in range(3)] + [(f"b{n}", INTERACTIVE, "b") for n in range(3)]
+    )
+    assert order == ["a0", "b0", "a1", "b1", "a2", "b2"]
+
+
+async def test_client_comes_from_client_scope_not_request(scheduler):
+    async def call(name, client):
+        # 두 client 가 같은 요청을 보내도 서로 다른 client 로 돌아가며 허가받습니다.
+        with client_scope(client), request_scope("same question"):
+            await scheduler.aacquire("m", 1)
+        order.append(name)
+
+    scheduler.acquire("m", 1)
+    order = []
+    await asyncio.gather(*(call(f"{client}{n}", client) for client in "ab" for n in range(2)))
+    assert order == ["a0", "b0", "a1", "b1"]
+
+    with request_scope("same question"):
+        assert scheduler._ticket("m", 1, INTERACTIVE, None).client == "default"
+
+
+def test_reset_keeps_backoff_state(scheduler):
+    scheduler.report_rate_limit("m", 60)
+    scheduler.report_success("m", 1.5)
+    scheduler.report_rate_limit("m", 60)
+    blocked_until = scheduler._queues["m"].blocked_until
+
+    scheduler.reset()
+    queue = scheduler._queues["m"]
+    assert queue.blocked_until == blocked_until
+    assert queue.failures == 1
+    assert queue.call_seconds == 1.5
+
+
+def test_rpm_bucket_waits(scheduler):
+    started = time.monotonic()
+    for _ in range(4):
+        scheduler.acquire("m", 1)
+    assert time.monotonic() - started >= 0.25
+
+
+def test_tpm_bucket_waits(configure):
+    # 초당 100 토큰, burst 0.1 초이면 bucket 에 10 토큰이 담깁니다.
+    configure({"llm_scheduler": {"limits": {"m": {"rpm": 10 ** 9, "tpm": 6000}}, "burst_seconds": 0.1}})
+    scheduler = RequestScheduler()
+    started = time.monotonic()
+    scheduler.acquire("m", 10)
+    assert time.monotonic() - started < 0.05
+    # capacity 보다 큰 호출은 bucket 이 가득 찰 때까지 기다립니다.
+    scheduler.acquire("m", 50)
+    assert time.monotonic() - started >= 0.08
+    # 실제 사용량이 추정보다 많으면 차이만큼 다음 허가가 늦어집니다.
+    scheduler.acquire("m", 1).settle(30)
+    before = time.monotonic()
+    scheduler.acquire("m", 1)
+    assert time.monotonic() - before >= 0.25
+
+
+def test_refund_when_granted_ticket_is_cancelled(scheduler):
+    ticket = scheduler.acquire("m", 1)
+    scheduler._cancel(ticket)
+    started = time.monotonic()
+    scheduler.acquire("m", 1)
+    assert time.monotonic() - started < 0.05
+
+
+async def test_cancelled_waiter_is_skipped(scheduler):
+    scheduler.acquire("m", 1)
+    waiter = asyncio.create_task(scheduler.aacquire("m", 1))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    started = time.monotonic()
+    await scheduler.aacquire("m", 1)
+    assert time.monotonic() - started < 0.15
+    assert scheduler._queues["m"].depth(INTERACTIVE) == 0
+
+
+def chain(model: str):
+    return ChatPromptTemplate.from_template("{question}") | ChatOpenAI(model=model, max_retries=0)
+
+
+@pytest.fixture
+def fast_backoff(configure):
+    configure({"llm_scheduler": {"base_backoff": 0.05, "max_backoff": 0.1, "max_retries": 2}})
+
+
+async def test_rate_limit_pauses_and_requeues(fake_llm, fast_backoff):
+    model = "fake-rate-limited"
+    fake_llm.fail(429, headers={"retry-after": "0.3"})
+    started = time.monotonic()
+    results = await asyncio.gather(
+        scheduled(chain(model), model).ainvoke({"question": "one"}),
+        scheduled(chain(model), model).ainvoke({"question": "two"}),
+    )
+    assert all(result.content for result in results)
+    assert time.monotonic() - started >= 0.3
+    assert fake_llm.requests == 3
+    assert RATE_LIMITED.value(model=model) == 1
+    assert llm_scheduler._queues[model].failures == 0
+
+
+async def test_transient_error_is_retried(fake_llm, fast_backoff):
+    model = "fake-transient"
+    fake_llm.fail(503)
+    result = await scheduled(chain(model), model).ainvoke({"question": "q"})
+    assert result.content
+    assert fake_llm.requests == 2
+    assert TRANSIENT_ERRORS.value(model=model) == 1
+    # 일시적인 오류는 모델 전체의 허가를 멈추지 않습니다.
+    assert llm_scheduler._queues[model].blocked_until == 0.0
+
+
+def test_transient_retries_are_bounded(fake_llm, fast_backoff):
+    model = "fake-always-failing"
+    fake_llm.fail(500, times=5)
+    with pytest.raises(Exception) as error:
+        scheduled(chain(model), model).invoke({"question": "q"})
+    assert error.value.status_code == 500
+    assert fake_llm.requests == 3
+
+
+async def test_client_error_is_not_retried(fake_llm, fast_backoff):
+    model = "fake-bad-request"
+    fake_llm.fail(400)
+    with pytest.raises(Exception) as error:
+        await scheduled(chain(model), model).ainvoke({"question": "q"})
+    assert error.value.status_code == 400
+    assert fake_llm.requests == 1
+
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from oracle_search import Shared
+from oracle_search.devtools.load_test import (
+    BackgroundServers,
+    FakeGoogleSearch,
+    FakeSearchEngine,
+    replay_app,
+    synthetic_page,
+)
+from oracle_search.models.base import SearchQuery
+from oracle_search.web_loader.search import astream_search_full_contents
+
+QUERIES = [
+    SearchQuery(language="en", query=query, recent_days=-1)
+    for query in ("python asyncio", "event loop internals", "coroutine scheduling", "uvloop benchmark", "trio nursery")
+]
+
+
+class CountingSearchEngine(FakeSearchEngine):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.calls = []
+
+    def results(self, query, num_results, search_params=None):
+        self.calls.append(time.monotonic())
+        return super().results(query, num_results, search_params)
+
+
+@pytest.fixture(scope="module")
+def slow_pages():
+    servers = BackgroundServers()
+    (port,) = servers.start([replay_app([synthetic_page(index) for index in range(5)], latency=2.0)])
+    yield f"http://127.0.0.1:{port}"
+    servers.stop()
+
+
+async def test_stops_at_deadline_plus_grace(configure, monkeypatch, slow_pages):
+    # 언어가 하나이면 wave 마다 쿼리 하나씩 검색하므로 마감 전후로 여러 wave 가 남습니다.
+    configure({"web_fetch": {"deadline_grace": 0.2}, "search": {"providers": ["google"]}, "fan_out": {"target_documents": 100}})
+    engine = CountingSearchEngine(slow_pages, 0.3, 10 ** 9)
+    monkeypatch.setattr(Shared, "google_search", FakeGoogleSearch(engine))
+
+    started = time.monotonic()
+    [event async for event in astream_search_full_contents(QUERIES, timeout=0.5, request="python asyncio")]
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.5 + 0.2 + 0.3
+    assert all(called - started < 0.5 for called in engine.calls)
+    assert len(engine.calls) < len(QUERIES)
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import List, Optional
+
+import pytest
+
+from oracle_search import Shared
+from oracle_search.models.base import SearchQuery
+from oracle_search.web_loader.search_providers import (
+    PROVIDER_SKIPS,
+    QuotaExceededError,
+    SearchProvider,
+    normalize_results,
+    search_router,
+)
+
+QUERY = SearchQuery(language="en", query="python asyncio", recent_days=-1)
+
+
+def result(name: str, index: int = 0) -> dict:
+    return {"link": f"https://{name}.example/{index}", "title": f"{name} {index}", "snippet": "python asyncio"}
+
+
+class FakeProvider(SearchProvider):
+    def __init__(
+        self, name: str, results: Optional[List[dict]] = None, error: Optional[Exception] = None, delay: float = 0.0
+    ):
+        self.name = name
+        self.results = [result(name)] if results is None else results
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def search(self, query: SearchQuery, num_results: int) -> List[dict]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.results[:num_results]
+
+
+@pytest.fixture
+def providers(configure):
+    """
+    가짜 제공자들을 등록하고 그 순서대로 search.providers 를 설정합니다.
+    """
+    registered = []
+
+    def use(*fakes: FakeProvider, **search):
+        for fake in fakes:
+            search_router.register(fake)
+            registered.append(fake.name)
+        configure({"search": {"providers": [fake.name for fake in fakes], "hedge_delay": 5.0, **search}})
+        return fakes
+
+    yield use
+    for name in registered:
+        search_router._providers.pop(name, None)
+        Shared.disk_cache.web_cache.delete(search_router._quota_key(name))
+
+
+async def test_hedges_to_the_next_provider_when_slow(providers):
+    slow, fast = providers(FakeProvider("slow", delay=1.0), FakeProvider("fast"), hedge_delay=0.05)
+    started = time.monotonic()
+    assert await search_router.search(QUERY) == [result("fast")]
+    assert time.monotonic() - started < 0.5
+    assert slow.calls == fast.calls == 1
+
+
+async def test_fails_over_without_waiting_for_the_hedge_delay(providers):
+    providers(FakeProvider("broken", error=RuntimeError("boom")), FakeProvider("backup"))
+    started = time.monotonic()
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert time.monotonic() - started < 0.5
+
+
+async def test_empty_results_move_on_to_the_next_provider(providers):
+    empty, backup = providers(FakeProvider("empty", results=[]), FakeProvider("backup"))
+    started = time.monotonic()
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert time.monotonic() - started < 0.5
+    assert empty.calls == backup.calls == 1
+
+
+async def test_all_empty_and_all_failed(providers):
+    providers(FakeProvider("empty", results=[]), FakeProvider("also_empty", results=[]))
+    assert await search_router.search(QUERY) == []
+
+    providers(FakeProvider("first", error=RuntimeError("first")), FakeProvider("second", error=RuntimeError("second")))
+    with pytest.raises(RuntimeError, match="first"):
+        await search_router.search(QUERY)
+
+
+async def test_daily_quota_skips_provider_for_the_rest_of_the_day(providers):
+    metered, backup = providers(FakeProvider("metered"), FakeProvider("backup"), daily_quotas={"metered": 1})
+    skipped = PROVIDER_SKIPS.value(provider="metered", reason="quota")
+
+    assert await search_router.search(QUERY) == [result("metered")]
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert metered.calls == 1
+    assert Shared.disk_cache.web_cache.get(search_router._quota_key("metered")) == 1
+    assert PROVIDER_SKIPS.value(provider="metered", reason="quota") == skipped + 1
+
+
+async def test_quota_error_from_provider_skips_it_for_the_day(providers):
+    limited, backup = providers(FakeProvider("limited", error=QuotaExceededError("429")), FakeProvider("backup"))
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert limited.calls == 1
+    assert backup.calls == 2
+
+
+async def test_cooldown_after_error(providers):
+    flaky, backup = providers(FakeProvider("flaky", error=RuntimeError("boom")), FakeProvider("backup"), cooldown=0.2)
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert await search_router.search(QUERY) == [result("backup")]
+    assert flaky.calls == 1
+
+    await asyncio.sleep(0.25)
+    flaky.error = None
+    assert await search_router.search(QUERY) == [result("flaky")]
+    assert flaky.calls == 2
+
+
+async def test_normalizes_provider_results(providers):
+    providers(
+        FakeProvider(
+            "raw",
+            results=[
+                {"url": " https://raw.example/a ", "content": " body ", "title": " Title "},
+                {"title": "no link"},
+                {"link": "https://raw.example/b"},
+            ],
+        )
+    )
+    assert await search_router.search(QUERY) == [
+        {"snippet": "body", "title": "Title", "link": "https://raw.example/a"},
+        {"snippet": "", "title": "", "link": "https://raw.example/b"},
+    ]
+    assert normalize_results([]) == []
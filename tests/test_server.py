@@ -0,0 +1,268 @@
+import asyncio
+import json
+import socket
+import time
+from typing import List, Tuple
+
+import pytest
+
+from oracle_search import Shared
+from oracle_search.devtools.load_test import (
+    BackgroundServers,
+    FakeGoogleSearch,
+    FakeSearchEngine,
+    replay_app,
+    synthetic_page,
+)
+from oracle_search.server import RUNTIME, create_app
+
+
+@pytest.fixture(scope="module")
+def replay_url():
+    servers = BackgroundServers()
+    (port,) = servers.start([replay_app([synthetic_page(index) for index in range(5)], latency=0.0)])
+    yield f"http://127.0.0.1:{port}"
+    servers.stop()
+
+
+@pytest.fixture
+def server(configure, monkeypatch, replay_url, fake_llm):
+    """
+    server 설정을 덮어쓰고 검색을 재생 서버에 연결한 뒤 TestClient 를 만드는 함수를 돌려줍니다.
+    """
+    monkeypatch.setattr(Shared, "google_search", FakeGoogleSearch(FakeSearchEngine(replay_url, 0.0, 5)))
+
+    async def start(aiohttp_client, **server):
+        configure({"server": server, "search": {"providers": ["google"]}})
+        return await aiohttp_client(create_app())
+
+    return start
+
+
+def retry_after(response) -> int:
+    return int(response.headers["Retry-After"])
+
+
+async def post(client, path: str = "/v1/web-content", body=None, client_id: str = "tester"):
+    # /v1/web-content 에 빈 본문을 보내면 admission 을 통과한 뒤 400 으로 끝나므로 admission 결과만 확인할 수 있습니다.
+    return await client.post(path, json=body or {}, headers={"X-Client-Id": client_id})
+
+
+def parse_sse(text: str) -> Tuple[List[Tuple[str, dict]], int]:
+    """
+    SSE 본문을 (이벤트 이름, data) 목록과 heartbeat 주석 수로 나눕니다.
+    """
+    events, heartbeats = [], 0
+    for frame in text.split("\n\n"):
+        if not frame:
+            continue
+        if frame.startswith(":"):
+            heartbeats += 1
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events, heartbeats
+
+
+async def test_healthz_and_readyz(server, aiohttp_client):
+    client = await server(aiohttp_client)
+    response = await client.get("/healthz")
+    assert response.status == 200
+    assert (await response.json())["status"] == "ok"
+
+    response = await client.get("/readyz")
+    body = await response.json()
+    assert response.status == 200
+    assert body["ready"] is True and body["disk_cache"] is True
+
+
+async def test_queue_full_is_503_with_retry_after(server, aiohttp_client):
+    client = await server(aiohttp_client, max_concurrency=1, max_queue=0)
+    runtime = client.server.app[RUNTIME]
+    await runtime.admission.acquire()
+
+    response = await post(client)
+    assert response.status == 503
+    assert (await response.json())["error"] == "Rejected: queue_full"
+    assert retry_after(response) >= 1
+    assert (await client.get("/readyz")).status == 503
+
+    runtime.admission.release()
+    assert (await post(client)).status == 400
+
+
+async def test_queue_timeout_is_503_with_retry_after(server, aiohttp_client):
+    client = await server(aiohttp_client, max_concurrency=1, max_queue=1, queue_timeout=0.1)
+    runtime = client.server.app[RUNTIME]
+    await runtime.admission.acquire()
+
+    response = await post(client)
+    assert response.status == 503
+    assert (await response.json())["error"] == "Rejected: queue_timeout"
+    assert retry_after(response) >= 1
+    assert not runtime.admission.waiting
+
+
+async def test_draining_is_503_with_retry_after(server, aiohttp_client):
+    client = await server(aiohttp_client)
+    runtime = client.server.app[RUNTIME]
+    await runtime.drain(client.server.app)
+
+    response = await post(client)
+    assert response.status == 503
+    assert (await response.json())["error"] == "Rejected: draining"
+    assert retry_after(response) >= 1
+
+    response = await client.get("/readyz")
+    assert response.status == 503
+    assert (await response.json())["draining"] is True
+
+
+async def test_client_rate_is_429_per_client(server, aiohttp_client):
+    client = await server(aiohttp_client, client_rate=1, client_burst=1)
+    assert (await post(client, client_id="a")).status == 400
+
+    response = await post(client, client_id="a")
+    assert response.status == 429
+    assert (await response.json())["error"] == "Rejected: client_rate"
+    assert retry_after(response) >= 59
+
+    assert (await post(client, client_id="b")).status == 400
+
+
+async def test_client_concurrency_is_429(server, aiohttp_client):
+    client = await server(aiohttp_client, client_concurrency=1)
+    runtime = client.server.app[RUNTIME]
+    runtime.quotas.acquire("a")
+
+    response = await post(client, client_id="a")
+    assert response.status == 429
+    assert (await response.json())["error"] == "Rejected: client_concurrency"
+    assert retry_after(response) >= 1
+
+    runtime.quotas.release("a")
+    assert (await post(client, client_id="a")).status == 400
+
+
+async def test_rejected_request_does_not_use_client_quota(server, aiohttp_client):
+    client = await server(aiohttp_client, client_rate=1, client_burst=1, max_concurrency=1, max_queue=0)
+    runtime = client.server.app[RUNTIME]
+    await runtime.admission.acquire()
+    assert (await post(client, client_id="a")).status == 503
+
+    runtime.admission.release()
+    assert (await post(client, client_id="a")).status == 400
+    assert runtime.quotas.clients["a"].active == 0
+
+
+async def test_oracle_streams_run_to_done(server, aiohttp_client):
+    client = await server(aiohttp_client)
+    response = await post(client, "/v1/oracle", {"task_description": "python asyncio event loop"})
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("text/event-stream")
+
+    events, _ = parse_sse(await response.text())
+    names = [name for name, _ in events]
+    assert names[0] == "run" and names[-1] == "done"
+    assert "node_end" in names
+    thread_id = events[0][1]["thread_id"]
+    assert events[-1][1]["thread_id"] == thread_id
+    assert events[-1][1]["documents"] == names.count("document")
+
+
+async def test_oracle_reports_failures_as_error_event(server, aiohttp_client, fake_llm):
+    client = await server(aiohttp_client)
+    fake_llm.fail(400, times=100)
+    response = await post(client, "/v1/oracle", {"task_description": "python asyncio"})
+    assert response.status == 200
+
+    events, _ = parse_sse(await response.text())
+    assert events[0][0] == "run"
+    assert events[-1][0] == "error"
+    assert "done" not in [name for name, _ in events]
+
+
+async def test_oracle_sends_heartbeats_while_waiting(server, aiohttp_client, fake_llm):
+    client = await server(aiohttp_client, sse_heartbeat=0.05)
+    fake_llm.latency = 0.3
+    response = await post(client, "/v1/oracle", {"task_description": "python asyncio"})
+
+    events, heartbeats = parse_sse(await response.text())
+    assert heartbeats > 0
+    assert events[-1][0] == "done"
+
+
+@pytest.fixture
+def checkpointed(server, configure, tmp_path):
+    async def start(aiohttp_client, **server_conf):
+        configure({"checkpoint": {"path": str(tmp_path / "checkpoints.sqlite")}})
+        return await server(aiohttp_client, checkpoint=True, **server_conf)
+
+    return start
+
+
+async def test_resume_continues_a_failed_run_from_its_checkpoint(checkpointed, aiohttp_client, fake_llm):
+    client = await checkpointed(aiohttp_client)
+    # Begin 은 LLM 을 부르지 않으므로 저장되고, Query 의 LLM 호출이 실패하여 실행이 멈춥니다.
+    fake_llm.fail(400)
+    response = await post(client, "/v1/oracle", {"task_description": "python asyncio", "thread_id": "t1"})
+    events, _ = parse_sse(await response.text())
+    assert events[-1][0] == "error"
+
+    response = await post(client, "/v1/oracle/t1/resume")
+    assert response.status == 200
+    state = await response.json()
+    assert state["thread_id"] == "t1"
+    assert state["task_description"] == "python asyncio"
+    assert state["search_queries"]
+    assert all("source" in document and "page_content" not in document for document in state["search_results"])
+
+    # 이미 끝난 실행은 저장된 상태를 그대로 돌려주며 LLM 을 다시 부르지 않습니다.
+    requests = fake_llm.requests
+    assert (await (await post(client, "/v1/oracle/t1/resume")).json()) == state
+    assert fake_llm.requests == requests
+
+
+async def test_replay_reruns_nodes_from_the_first_checkpoint(checkpointed, aiohttp_client):
+    client = await checkpointed(aiohttp_client)
+    response = await post(client, "/v1/oracle", {"task_description": "python asyncio", "thread_id": "t2"})
+    assert parse_sse(await response.text())[0][-1][0] == "done"
+
+    response = await post(client, "/v1/oracle/t2/replay")
+    assert response.status == 200
+    assert [timing["node"] for timing in (await response.json())["timings"]] == ["Begin", "Query", "Search"]
+
+
+async def test_resume_unknown_thread_and_disabled_checkpointing(checkpointed, server, aiohttp_client):
+    client = await checkpointed(aiohttp_client)
+    assert (await post(client, "/v1/oracle/missing/resume")).status == 404
+    assert (await post(client, "/v1/oracle/missing/replay")).status == 404
+
+    client = await server(aiohttp_client, checkpoint=False)
+    response = await post(client, "/v1/oracle/t1/resume")
+    assert response.status == 404
+    assert "disabled" in (await response.json())["error"]
+
+
+async def test_metrics_do_not_block_on_a_stuck_browser_pool(server, configure, aiohttp_client, tmp_path):
+    # 연결은 받지만 응답하지 않는 브라우저 풀 서비스입니다.
+    path = str(tmp_path / "pool.sock")
+    stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stuck.bind(path)
+    stuck.listen()
+    try:
+        configure({"worker": {"browser_pool_socket": path}})
+        client = await server(aiohttp_client)
+        started = time.monotonic()
+        scrape = asyncio.ensure_future(client.get("/metrics"))
+        await asyncio.sleep(0.1)
+        assert (await client.get("/healthz")).status == 200
+        assert time.monotonic() - started < 1
+
+        response = await scrape
+        assert response.status == 200
+        text = await response.text()
+        assert "oracle_search_http_admission" in text
+        assert 'oracle_search_browser_pool_slots{state="free"}' not in text
+    finally:
+        stuck.close()